@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分桶统计工具
+提供回测debug快照使用的单遍分桶累加器
+
+所有累加器都可序列化 (to_dict/from_dict) 并满足结合律的合并 (merge)，
+多进程/多机器按mint分片回测后，把各分片的部分结果归约即可得到与顺序执行完全一致的报告。
+浮点累加使用 ExactSum 精确求和，合并顺序不影响结果的任何一位。
+QuantileSketch 单遍估计特征分位数，用于自动生成等人数分桶边界。
+PairwiseCrossTab 单遍累加所有特征对的二维分桶交叉表，用于选出两个条件的联合区间。
+bootstrap_confidence_intervals 按mint重采样给出胜率、平均盈利率、总盈利的置信区间。
+"""
+import itertools
+import math
+import random
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# JSON不支持Infinity，最后一个分桶的上界用该值代替
+INF_REPLACEMENT = 1e9
+
+
+class ExactSum:
+    """精确浮点累加器 (Shewchuk 部分和算法，与 math.fsum 相同)
+
+    内部保存互不重叠的部分和，value 为真实和的正确舍入值，
+    因此任意顺序的 add/merge 得到的结果完全相同。
+    """
+    __slots__ = ('partials',)
+
+    def __init__(self, partials: Optional[Iterable[float]] = None):
+        self.partials = list(partials) if partials else []
+
+    def add(self, x: float):
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def merge(self, other: 'ExactSum'):
+        for p in other.partials:
+            self.add(p)
+
+    @property
+    def value(self) -> float:
+        return math.fsum(self.partials)
+
+    def to_dict(self) -> List[float]:
+        return list(self.partials)
+
+    @classmethod
+    def from_dict(cls, data: List[float]) -> 'ExactSum':
+        return cls(data)
+
+
+def merge_sell_signal_stats(target: Dict[str, Dict], other: Dict[str, Dict]) -> Dict[str, Dict]:
+    """合并卖出原因统计 {原因: {'count', 'profit', 'loss'}}，结果写回 target"""
+    for reason, stats in other.items():
+        merged = target.setdefault(reason, {key: 0 for key in stats})
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return target
+
+
+class BucketHistogram:
+    """固定分桶直方图累加器
+
+    每条记录通过 bisect 定位分桶，只累加 (命中数, 盈利数, 盈利率之和)，不保留原始值。
+    分桶为 [edges[i], edges[i+1])，最后一个分桶为 [edges[-1], upper)，upper 为 None 表示 +∞。
+    小于 edges[0] 或不小于 upper 的值只计入总数，不计入任何分桶。
+    """
+
+    def __init__(self, edges: List[float], upper: Optional[float] = None):
+        self.edges = list(edges)
+        self.upper = upper
+        n = len(self.edges)
+        self.counts = [0] * n
+        self.profitable = [0] * n
+        self.profit_sums = [ExactSum() for _ in range(n)]
+        self.total = 0  # 所有非空记录数（含落在分桶范围外的）
+        self.total_profitable = 0
+        self.total_profit_sum = ExactSum()
+
+    def bucket_index(self, value: float) -> int:
+        """返回值所在的分桶下标，不在任何分桶内返回 -1"""
+        i = bisect_right(self.edges, value) - 1
+        if i < 0:
+            return -1
+        if self.upper is not None and value >= self.upper:
+            return -1
+        return i
+
+    def add(self, value: Optional[float], is_profitable: bool = False, profit_rate: float = 0.0):
+        """累加一条记录，value 为 None 或 NaN 时忽略"""
+        if value is None or value != value:
+            return
+        self.total += 1
+        if is_profitable:
+            self.total_profitable += 1
+        self.total_profit_sum.add(profit_rate)
+        i = self.bucket_index(value)
+        if i < 0:
+            return
+        self.counts[i] += 1
+        if is_profitable:
+            self.profitable[i] += 1
+        self.profit_sums[i].add(profit_rate)
+
+    def avg_profit_rate(self, i: int) -> float:
+        """第 i 个分桶的平均盈利率，空桶为 0"""
+        count = self.counts[i]
+        return self.profit_sums[i].value / count if count > 0 else 0.0
+
+    def merge(self, other: 'BucketHistogram') -> 'BucketHistogram':
+        """合并另一个分桶边界相同的直方图，返回 self"""
+        if self.edges != other.edges or self.upper != other.upper:
+            raise ValueError(f"分桶边界不一致，无法合并: {self.edges}/{self.upper} vs {other.edges}/{other.upper}")
+        for i in range(len(self.edges)):
+            self.counts[i] += other.counts[i]
+            self.profitable[i] += other.profitable[i]
+            self.profit_sums[i].merge(other.profit_sums[i])
+        self.total += other.total
+        self.total_profitable += other.total_profitable
+        self.total_profit_sum.merge(other.total_profit_sum)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'edges': list(self.edges),
+            'upper': self.upper,
+            'counts': list(self.counts),
+            'profitable': list(self.profitable),
+            'profit_sums': [ps.to_dict() for ps in self.profit_sums],
+            'total': self.total,
+            'total_profitable': self.total_profitable,
+            'total_profit_sum': self.total_profit_sum.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BucketHistogram':
+        hist = cls(data['edges'], data.get('upper'))
+        hist.counts = list(data['counts'])
+        hist.profitable = list(data['profitable'])
+        hist.profit_sums = [ExactSum.from_dict(ps) for ps in data['profit_sums']]
+        hist.total = data['total']
+        hist.total_profitable = data['total_profitable']
+        hist.total_profit_sum = ExactSum.from_dict(data['total_profit_sum'])
+        return hist
+
+    def bucket_bounds(self, i: int) -> Tuple[float, Optional[float]]:
+        """返回第 i 个分桶的 (下界, 上界)，上界为 None 表示 +∞"""
+        high = self.edges[i + 1] if i + 1 < len(self.edges) else self.upper
+        return self.edges[i], high
+
+    def to_bucket_stats(self, inf_value: float = INF_REPLACEMENT) -> List[Dict]:
+        """转换为debug快照/rule.json使用的分桶统计列表"""
+        bucket_stats = []
+        for i in range(len(self.edges)):
+            low, high = self.bucket_bounds(i)
+            if high is None:
+                high = inf_value
+            bucket_name = f"[{low}, {high})" if high != inf_value else f"[{low}, +∞)"
+            count = self.counts[i]
+            if count == 0:
+                bucket_stats.append({'name': bucket_name, 'low': low, 'high': high,
+                    'count': 0, 'profitable': 0, 'avg_profit_rate': 0.0, 'win_rate': 0.0})
+                continue
+            bucket_stats.append({'name': bucket_name, 'low': low, 'high': high,
+                'count': count, 'profitable': self.profitable[i],
+                'avg_profit_rate': self.avg_profit_rate(i),
+                'win_rate': self.profitable[i] / count})
+        return bucket_stats
+
+
+class QuantileSketch:
+    """可合并的流式分位数草图 (DDSketch 风格的对数分箱)
+
+    正数 x 落入第 k = floor(log_gamma(x)) 个分箱 [gamma^k, gamma^(k+1))，
+    负数按 |x| 取 k = ceil(log_gamma(|x|))，对应 [-gamma^k, -gamma^(k-1))，
+    |x| < min_value 的值计入零分箱。每个分箱内的相对误差不超过 relative_accuracy，
+    分箱只保存计数，合并即逐分箱相加，与数据顺序和分片方式无关。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}  # k -> 计数
+        self.negative = {}  # k -> 计数（按 |x| 的分箱）
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value: Optional[float]):
+        """累加一个值，None / NaN / inf 忽略"""
+        if value is None or value != value or value in (float('inf'), float('-inf')):
+            return
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value >= self.min_value:
+            k = math.floor(math.log(value) / self._log_gamma)
+            self.positive[k] = self.positive.get(k, 0) + 1
+        elif value <= -self.min_value:
+            k = math.ceil(math.log(-value) / self._log_gamma)
+            self.negative[k] = self.negative.get(k, 0) + 1
+        else:
+            self.zero_count += 1
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """合并另一个参数相同的草图，返回 self"""
+        if self.relative_accuracy != other.relative_accuracy or self.min_value != other.min_value:
+            raise ValueError("草图参数不一致，无法合并")
+        for k, c in other.positive.items():
+            self.positive[k] = self.positive.get(k, 0) + c
+        for k, c in other.negative.items():
+            self.negative[k] = self.negative.get(k, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def _sorted_bins(self) -> List[Tuple[float, int]]:
+        """按值从小到大返回 (分箱下界, 计数)"""
+        bins = [(-self.gamma ** k, c) for k, c in sorted(self.negative.items(), reverse=True)]
+        if self.zero_count:
+            bins.append((0.0, self.zero_count))
+        bins.extend((self.gamma ** k, c) for k, c in sorted(self.positive.items()))
+        return bins
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估计 q 分位数（0 <= q <= 1），空草图返回 None"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for low, c in self._sorted_bins():
+            cumulative += c
+            if cumulative > rank:
+                if low == 0.0:
+                    return 0.0
+                # 分箱代表值: 区间 [low, low*gamma) 的中点（按相对误差对称）
+                value = low * 2 * self.gamma / (self.gamma + 1) if low > 0 else low * 2 / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def equal_population_edges(self, bucket_count: int) -> List[float]:
+        """生成约 bucket_count 个等人数分桶的边界（分桶为 [edges[i], edges[i+1])）
+
+        边界取在分箱下界上，第一个边界为精确最小值；大量相同值集中在一个分箱时
+        相邻边界会重合并被去重，实际分桶数可能少于 bucket_count。
+        """
+        if self.count == 0 or bucket_count <= 0:
+            return []
+        edges = [self.min]
+        bins = self._sorted_bins()
+        cumulative = 0
+        j = 1
+        for low, c in bins:
+            # 目标分位点落在该分箱内时，在分箱下界切一刀
+            while j < bucket_count and cumulative + c > self.count * j / bucket_count:
+                if cumulative > 0 and low > edges[-1]:
+                    edges.append(low)
+                j += 1
+            cumulative += c
+        return edges
+
+    def to_dict(self) -> Dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'positive': [[k, c] for k, c in sorted(self.positive.items())],
+            'negative': [[k, c] for k, c in sorted(self.negative.items())],
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data['min_value'])
+        sketch.positive = {k: c for k, c in data['positive']}
+        sketch.negative = {k: c for k, c in data['negative']}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
+
+
+class PairwiseCrossTab:
+    """所有特征两两组合的二维分桶交叉表
+
+    每条记录先把各特征值映射为整数分桶编码（每个特征只 bisect 一次），再对每个特征对
+    在展平的 (code_a * nb + code_b) 单元上累加 (命中数, 盈利数, 盈利率之和)。
+    单遍扫描记录即可得到全部特征对的交叉表，不需要为每个特征对重新回测。
+    某个特征值为 None 或不在任何分桶内时，该记录不计入含该特征的交叉表。
+    单元盈利率之和为普通浮点累加（交叉表用于选区间，最终统计由调用方在原始记录上重算）。
+    """
+
+    def __init__(self, edges_by_field: Dict[str, List[float]], upper: Optional[float] = None):
+        self.fields = list(edges_by_field)
+        self.histograms = {field: BucketHistogram(edges, upper) for field, edges in edges_by_field.items()}
+        self.upper = upper
+        self.pairs = list(itertools.combinations(self.fields, 2))
+        self.tables = {}
+        for field_a, field_b in self.pairs:
+            size = len(self.histograms[field_a].edges) * len(self.histograms[field_b].edges)
+            self.tables[(field_a, field_b)] = {'counts': [0] * size, 'profitable': [0] * size,
+                                               'profit_sums': [0.0] * size}
+        self.total = 0
+
+    def add(self, values: Dict[str, Optional[float]], is_profitable: bool = False, profit_rate: float = 0.0):
+        """累加一条记录; values 为 {特征名: 值}"""
+        self.total += 1
+        codes = {}
+        for field, hist in self.histograms.items():
+            value = values.get(field)
+            if value is None or value != value:
+                continue
+            code = hist.bucket_index(value)
+            if code >= 0:
+                codes[field] = code
+        win = 1 if is_profitable else 0
+        for pair in self.pairs:
+            code_a = codes.get(pair[0])
+            if code_a is None:
+                continue
+            code_b = codes.get(pair[1])
+            if code_b is None:
+                continue
+            table = self.tables[pair]
+            cell = code_a * len(self.histograms[pair[1]].edges) + code_b
+            table['counts'][cell] += 1
+            table['profitable'][cell] += win
+            table['profit_sums'][cell] += profit_rate
+
+    def merge(self, other: 'PairwiseCrossTab') -> 'PairwiseCrossTab':
+        """合并另一个特征与分桶边界相同的交叉表，返回 self"""
+        if self.to_edges() != other.to_edges() or self.upper != other.upper:
+            raise ValueError("交叉表的特征或分桶边界不一致，无法合并")
+        for pair, table in other.tables.items():
+            target = self.tables[pair]
+            for key in ('counts', 'profitable', 'profit_sums'):
+                target[key] = [x + y for x, y in zip(target[key], table[key])]
+        self.total += other.total
+        return self
+
+    def to_edges(self) -> Dict[str, List[float]]:
+        return {field: list(self.histograms[field].edges) for field in self.fields}
+
+    def to_dict(self) -> Dict:
+        return {
+            'edges': self.to_edges(),
+            'upper': self.upper,
+            'tables': [[a, b, {k: list(v) for k, v in table.items()}] for (a, b), table in self.tables.items()],
+            'total': self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PairwiseCrossTab':
+        crosstab = cls(data['edges'], data.get('upper'))
+        for a, b, table in data['tables']:
+            crosstab.tables[(a, b)] = {k: list(v) for k, v in table.items()}
+        crosstab.total = data['total']
+        return crosstab
+
+    def table(self, field_a: str, field_b: str) -> List[List[Dict]]:
+        """field_a × field_b 的二维统计: [a分桶][b分桶] -> {count, profitable, win_rate, avg_profit_rate}"""
+        transposed = (field_a, field_b) not in self.tables
+        table = self.tables[(field_b, field_a) if transposed else (field_a, field_b)]
+        na = len(self.histograms[field_a].edges)
+        nb = len(self.histograms[field_b].edges)
+        rows = []
+        for i in range(na):
+            row = []
+            for j in range(nb):
+                cell = j * na + i if transposed else i * nb + j
+                count = table['counts'][cell]
+                row.append({
+                    'count': count,
+                    'profitable': table['profitable'][cell],
+                    'win_rate': table['profitable'][cell] / count if count else 0.0,
+                    'avg_profit_rate': table['profit_sums'][cell] / count if count else 0.0,
+                })
+            rows.append(row)
+        return rows
+
+    def select_best_rectangle(self, field_a: str, field_b: str, min_count: int = 300, min_win_rate: float = 0.38,
+                              anchor_a: Optional[str] = None, anchor_b: Optional[str] = None) -> Optional[Dict]:
+        """在 field_a × field_b 交叉表上选出平均盈利率最高的矩形（两个连续分桶区间的乘积）
+
+        约束与 anchor 的含义同 select_best_bucket_range；用二维前缀和，每个矩形 O(1)。
+        返回 {'a': {start, end, low, high}, 'b': {...}, count, profitable, win_rate, avg_profit_rate} 或 None。
+        """
+        grid = self.table(field_a, field_b)
+        na = len(grid)
+        nb = len(grid[0]) if grid else 0
+        count_prefix = [[0] * (nb + 1) for _ in range(na + 1)]
+        win_prefix = [[0] * (nb + 1) for _ in range(na + 1)]
+        profit_prefix = [[0.0] * (nb + 1) for _ in range(na + 1)]
+        for i in range(na):
+            for j in range(nb):
+                cell = grid[i][j]
+                count_prefix[i + 1][j + 1] = count_prefix[i][j + 1] + count_prefix[i + 1][j] - count_prefix[i][j] + cell['count']
+                win_prefix[i + 1][j + 1] = win_prefix[i][j + 1] + win_prefix[i + 1][j] - win_prefix[i][j] + cell['profitable']
+                profit_prefix[i + 1][j + 1] = (profit_prefix[i][j + 1] + profit_prefix[i + 1][j] - profit_prefix[i][j]
+                                               + cell['avg_profit_rate'] * cell['count'])
+
+        def spans(n, anchor):
+            starts = [0] if anchor == 'low' else range(n)
+            return [(start, end) for start in starts
+                    for end in ([n - 1] if anchor == 'high' else range(start, n)) if end >= start]
+
+        def rect(prefix, a0, a1, b0, b1):
+            return prefix[a1 + 1][b1 + 1] - prefix[a0][b1 + 1] - prefix[a1 + 1][b0] + prefix[a0][b0]
+
+        def bounds(field, start, end):
+            hist = self.histograms[field]
+            high = hist.bucket_bounds(end)[1]
+            return {'start': start, 'end': end, 'low': hist.edges[start],
+                    'high': INF_REPLACEMENT if high is None else high}
+
+        best = None
+        best_key = None
+        b_spans = spans(nb, anchor_b)
+        for a0, a1 in spans(na, anchor_a):
+            for b0, b1 in b_spans:
+                count = rect(count_prefix, a0, a1, b0, b1)
+                if count < min_count or count == 0:
+                    continue
+                wins = rect(win_prefix, a0, a1, b0, b1)
+                if wins / count < min_win_rate:
+                    continue
+                avg_profit_rate = rect(profit_prefix, a0, a1, b0, b1) / count
+                key = (avg_profit_rate, count)
+                if best_key is None or key > best_key:
+                    best_key = key
+                    best = {'a': bounds(field_a, a0, a1), 'b': bounds(field_b, b0, b1), 'count': count,
+                            'profitable': wins, 'win_rate': wins / count, 'avg_profit_rate': avg_profit_rate}
+        return best
+
+
+def select_best_bucket_range(bucket_stats: List[Dict], min_count: int = 300, min_win_rate: float = 0.38,
+                             anchor: Optional[str] = None) -> Optional[Dict]:
+    """在分桶统计上选出平均盈利率最高的连续分桶区间
+
+    用 (命中数, 盈利数, 盈利率之和) 的前缀和在 O(B²) 内枚举所有连续区间 [start, end]，
+    约束: 命中数 >= min_count 且胜率 >= min_win_rate；平均盈利率相同时取命中数多的区间。
+    anchor='low' 要求区间从第一个分桶开始（对应 <= MAX 型条件），
+    anchor='high' 要求区间到最后一个分桶结束（对应 >= MIN 型条件）。
+    没有满足约束的区间返回 None。
+    """
+    n = len(bucket_stats)
+    count_prefix = [0] * (n + 1)
+    win_prefix = [0] * (n + 1)
+    profit_prefix = [0.0] * (n + 1)
+    for i, bs in enumerate(bucket_stats):
+        count_prefix[i + 1] = count_prefix[i] + bs['count']
+        win_prefix[i + 1] = win_prefix[i] + bs['profitable']
+        profit_prefix[i + 1] = profit_prefix[i] + bs['avg_profit_rate'] * bs['count']
+
+    starts = [0] if anchor == 'low' else range(n)
+    best = None
+    best_key = None
+    for start in starts:
+        ends = [n - 1] if anchor == 'high' else range(start, n)
+        for end in ends:
+            if end < start:
+                continue
+            count = count_prefix[end + 1] - count_prefix[start]
+            if count < min_count or count == 0:
+                continue
+            wins = win_prefix[end + 1] - win_prefix[start]
+            win_rate = wins / count
+            if win_rate < min_win_rate:
+                continue
+            avg_profit_rate = (profit_prefix[end + 1] - profit_prefix[start]) / count
+            key = (avg_profit_rate, count)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = {
+                    'start': start,
+                    'end': end,
+                    'low': bucket_stats[start]['low'],
+                    'high': bucket_stats[end]['high'],
+                    'count': count,
+                    'profitable': wins,
+                    'win_rate': win_rate,
+                    'avg_profit_rate': avg_profit_rate,
+                }
+    return best
+
+
+def bootstrap_confidence_intervals(mint_stats: List[Tuple[int, int, float, int, float]],
+                                   n_resamples: int = 1000, confidence: float = 0.95,
+                                   seed: Optional[int] = 0) -> Dict[str, Tuple[float, float]]:
+    """按mint重采样的 bootstrap 百分位置信区间
+
+    同一mint内的交易高度相关，因此以mint为单位有放回抽样。mint_stats 每项为一个mint的聚合:
+        (交易数, 盈利交易数, profit_rate之和, 参与平均盈利率的交易数, profit_sol之和)
+    预先把每个mint压成 (计数打包整数, profit_rate之和, profit_sol之和) 三元组，三个计数按位段打包进一个整数
+    （位宽足以容纳一次重采样的总和，不会进位串段），每次重采样直接抽三元组按列求和，代价 O(mint数)。
+    返回 {'win_rate': (下界, 上界), 'avg_profit_rate': (...), 'total_profit_sol': (...)}，无数据时返回 {}。
+    """
+    if not mint_stats or n_resamples <= 0:
+        return {}
+    n_mints = len(mint_stats)
+    shift = (n_mints * int(max(max(n, wins, n_rates) for n, wins, _, n_rates, _ in mint_stats))).bit_length()
+    mask = (1 << shift) - 1
+    rows = [((int(n) << (2 * shift)) | (int(n_rates) << shift) | int(wins), rate_sum, sol_sum)
+            for n, wins, rate_sum, n_rates, sol_sum in mint_stats]
+    rng = random.Random(seed)
+    samples = {'win_rate': [], 'avg_profit_rate': [], 'total_profit_sol': []}
+    for _ in range(n_resamples):
+        packed, rate_sum, sol_sum = map(sum, zip(*rng.choices(rows, k=n_mints)))
+        n_trades = packed >> (2 * shift)
+        n_rates = (packed >> shift) & mask
+        samples['win_rate'].append((packed & mask) / n_trades if n_trades else 0.0)
+        samples['avg_profit_rate'].append(rate_sum / n_rates if n_rates else 0.0)
+        samples['total_profit_sol'].append(sol_sum)
+
+    alpha = (1.0 - confidence) / 2.0
+    intervals = {}
+    for name, values in samples.items():
+        values.sort()
+        lo = values[int(math.floor(alpha * (n_resamples - 1)))]
+        hi = values[int(math.ceil((1.0 - alpha) * (n_resamples - 1)))]
+        intervals[name] = (lo, hi)
+    return intervals
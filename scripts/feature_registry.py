@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多策略共享的特征计算
+同一交易流上同时运行多个策略（pump_quant_demo、amm_quant_rule2 的各个变体、rule.json 的各条 rule1 规则），
+它们大量使用相同的特征（如前15笔的买卖单数）。策略在 FeatureRegistry 上登记所需的特征，
+登记表按 (特征函数, 参数) 去重，每笔事件（或每个mint的特征矩阵）每个唯一的 (特征函数, 参数) 只计算一次。
+新增一个只复用已有特征的策略，每笔事件只多一次策略自身的判断。
+
+登记项 FieldSpec(field, kernel, params, component):
+    field     → 策略看到的字段名（与 rule1_optimize debug 字段、rule_compiler 的特征字段一致）
+    kernel    → FEATURE_KERNELS 中的特征函数名
+    params    → 位置参数元组（参与去重）
+    component → 特征函数返回元组时取第几项，None 为整个返回值
+例如 price_volatility / time_volatility / amount_volatility 来自同一个 ('volatility', (15, 0.1))，只算一次。
+config_feature_fields(config) 按 BUY_CONDITIONS_CONFIG 的键名（三个策略脚本与 rule1 通用）生成全部登记项。
+
+特征函数就是策略脚本使用的 trade_features 辅助函数（签名不同的 is_max_amount / volatility / price_ratio 包一层），
+trade_data 可以是列表或 ring_buffer.TradeRingBuffer。
+rule.json 规则缺省的特征参数、pump_quant_demo / amm_quant_rule2 的买入条件直接从脚本里的配置读取（只解析字面量，
+不导入脚本）；脚本策略按 variant_find_buy_signal 的 online 条件编译为门槛，只登记门槛用到的特征。
+
+用法:
+    registry = FeatureRegistry()
+    registry.register('amm_rule2', config_feature_fields(amm_config), evaluate_fn)  # evaluate_fn(特征dict) -> 结果或None
+    register_rule_set(registry, compiled_rule_set)    # rule.json 每条规则登记为 rule:<序号>
+    register_script_strategy(registry, 'pump_quant_demo')  # 按脚本当前的 BUY_CONDITIONS_CONFIG 登记
+    registry.evaluate(trade_data, index, creation_time)          # [(策略名, 结果), ...]
+    matrix = registry.compute_matrix(trade_data, creation_time)  # 单个mint的特征矩阵（按唯一特征成列）
+    python feature_registry.py [mint_log] [rule.json]   对比去重前后的特征计算量
+"""
+import ast
+import os
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from param_search import space_defaults
+from ring_buffer import history_start
+from rule_compiler import INF, Gate, passes_gates
+from trade_features import (get_avg_trade_interval, get_buy_sell_count, get_consecutive_buy_sell_count,
+                            get_filtered_trades_sum, get_large_small_trade_ratio, get_price_ratio_to_min,
+                            get_recent_trade_count, get_recent_trades_volatility, get_time_diff_from_last_trade,
+                            get_window_amount_sum, get_window_buy_sell_count, get_window_price_change_pct,
+                            is_max_amount_in_recent_trades)
+
+
+# =============================================================================
+# 特征函数（trade_features 的辅助函数；签名不同的三个包一层）
+# =============================================================================
+def is_max_amount(trade_data, current_index, min_threshold, lookback_count):
+    """当前交易金额是否为近T单最大，1.0/0.0（同 rule1_optimize 的 debug 字段）"""
+    current_amount = abs(float(trade_data[current_index].get('tradeamount', 0)))
+    return 1.0 if is_max_amount_in_recent_trades(trade_data, current_index, current_amount,
+                                                 min_threshold, lookback_count) else 0.0
+
+
+def volatility(trade_data, current_index, lookback_count, min_amount):
+    """(价格波动率, 时间间隔波动率, 金额波动率)"""
+    return get_recent_trades_volatility(trade_data, current_index, lookback_count, min_amount, 'all')
+
+
+def price_ratio(trade_data, current_index, lookback_count):
+    try:
+        current_price = float(trade_data[current_index].get('price', 0))
+    except (TypeError, ValueError):
+        return None
+    if current_price <= 0:
+        return None
+    return get_price_ratio_to_min(trade_data, current_index, current_price, lookback_count)
+
+
+# 特征函数名 → (函数, 参数名)；参数名用于推导环形缓冲区的回看需求
+FEATURE_KERNELS = {
+    'time_diff': (get_time_diff_from_last_trade, ()),
+    'filtered_sum': (get_filtered_trades_sum, ('min_amount', 'count')),
+    'is_max_amount': (is_max_amount, ('min_threshold', 'lookback_count')),
+    'volatility': (volatility, ('lookback_count', 'min_amount')),
+    'price_ratio': (price_ratio, ('lookback_count',)),
+    'buy_sell_count': (get_buy_sell_count, ('lookback_count',)),
+    'large_small_ratio': (get_large_small_trade_ratio, ('lookback_count', 'large_threshold', 'small_threshold')),
+    'consecutive_count': (get_consecutive_buy_sell_count, ('buy_threshold', 'sell_threshold')),
+    'recent_trade_count': (get_recent_trade_count, ('window_seconds',)),
+    'avg_trade_interval': (get_avg_trade_interval, ('lookback_count',)),
+    'window_amount_sum': (get_window_amount_sum, ('window_ms', 'min_amount')),
+    'window_buy_sell_count': (get_window_buy_sell_count, ('window_ms', 'min_amount')),
+    'window_price_change_pct': (get_window_price_change_pct, ('window_ms',)),
+}
+
+
+class FieldSpec(NamedTuple):
+    field: str
+    kernel: str
+    params: Tuple
+    component: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple:
+        return self.kernel, self.params
+
+
+# 字段 → (特征函数, 参数对应的配置键, 元组分量)；配置键为各策略 BUY_CONDITIONS_CONFIG 的通用键名
+CONFIG_FIELDS = {
+    'time_diff': ('time_diff', (), None),
+    'filtered_sum': ('filtered_sum', ('FILTERED_TRADES_MIN_AMOUNT', 'FILTERED_TRADES_COUNT'), None),
+    'is_max_amount': ('is_max_amount', ('MAX_AMOUNT_MIN_THRESHOLD', 'MAX_AMOUNT_LOOKBACK_COUNT'), None),
+    'price_volatility': ('volatility', ('VOLATILITY_LOOKBACK_COUNT', 'VOLATILITY_MIN_AMOUNT'), 0),
+    'time_volatility': ('volatility', ('VOLATILITY_LOOKBACK_COUNT', 'VOLATILITY_MIN_AMOUNT'), 1),
+    'amount_volatility': ('volatility', ('VOLATILITY_LOOKBACK_COUNT', 'VOLATILITY_MIN_AMOUNT'), 2),
+    'price_ratio': ('price_ratio', ('PRICE_RATIO_LOOKBACK_COUNT',), None),
+    'buy_count': ('buy_sell_count', ('BUY_COUNT_LOOKBACK_COUNT',), 0),
+    'sell_count': ('buy_sell_count', ('SELL_COUNT_LOOKBACK_COUNT',), 1),
+    'large_trade_ratio': ('large_small_ratio', ('LARGE_TRADE_RATIO_LOOKBACK', 'LARGE_TRADE_THRESHOLD',
+                                                'SMALL_TRADE_THRESHOLD'), 0),
+    'small_trade_ratio': ('large_small_ratio', ('SMALL_TRADE_RATIO_LOOKBACK', 'LARGE_TRADE_THRESHOLD',
+                                                'SMALL_TRADE_THRESHOLD'), 1),
+    'consecutive_buy': ('consecutive_count', ('CONSECUTIVE_BUY_THRESHOLD', 'CONSECUTIVE_SELL_THRESHOLD'), 0),
+    'consecutive_sell': ('consecutive_count', ('CONSECUTIVE_BUY_THRESHOLD', 'CONSECUTIVE_SELL_THRESHOLD'), 1),
+    'recent_trade_count': ('recent_trade_count', ('RECENT_TRADE_COUNT_WINDOW_SECONDS',), None),
+    'avg_trade_interval': ('avg_trade_interval', ('AVG_TRADE_INTERVAL_LOOKBACK_COUNT',), None),
+    'window_amount_sum': ('window_amount_sum', ('WINDOW_AMOUNT_SUM_WINDOW_MS', 'WINDOW_AMOUNT_SUM_MIN_AMOUNT'), None),
+    'window_buy_count': ('window_buy_sell_count', ('WINDOW_BUY_SELL_COUNT_WINDOW_MS',
+                                                   'WINDOW_BUY_SELL_COUNT_MIN_AMOUNT'), 0),
+    'window_sell_count': ('window_buy_sell_count', ('WINDOW_BUY_SELL_COUNT_WINDOW_MS',
+                                                    'WINDOW_BUY_SELL_COUNT_MIN_AMOUNT'), 1),
+    'window_rise_pct': ('window_price_change_pct', ('WINDOW_RISE_WINDOW_MS',), None),
+    'window_drop_pct': ('window_price_change_pct', ('WINDOW_DROP_WINDOW_MS',), None),
+}
+
+# 策略脚本的买入配置按字面量读取（脚本导入时会替换 pump 的函数、直接运行回测，不能在这里导入）
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RULE1_SCRIPT = os.path.join(SCRIPT_DIR, 'rules', 'rule1_optimize.py')
+
+
+def load_script_config(path: str, name: str = 'BUY_CONDITIONS_CONFIG'):
+    """读取策略脚本中模块级常量 name 的字面量值（不执行脚本）"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{path}: 没有 {name}")
+
+
+def rule_feature_defaults() -> Dict:
+    """rule.json 的 params 只含搜索过的键，特征参数缺省时取 rule1_optimize 的配置:
+    BASE_BUY_CONFIG 加上 PARAM_SEARCH_SPACE 各参数的基线取值（即 build_config(space_defaults(PARAM_SEARCH_SPACE))）"""
+    config = load_script_config(RULE1_SCRIPT, 'BASE_BUY_CONFIG')
+    config.update(space_defaults(load_script_config(RULE1_SCRIPT, 'PARAM_SEARCH_SPACE')))
+    return config
+
+
+# 由交易本身得到、不需要登记的字段
+BASIC_FIELDS = ('time_from_creation_minutes', 'nowsol', 'abs_amount', 'trade_side')
+
+
+def config_feature_fields(config: Dict, fields: Optional[Sequence[str]] = None) -> List[FieldSpec]:
+    """按配置生成登记项；fields 为空时生成配置中参数齐全的全部字段"""
+    specs = []
+    for field, (kernel, param_keys, component) in CONFIG_FIELDS.items():
+        if fields is not None and field not in fields:
+            continue
+        if not all(key in config for key in param_keys):
+            continue
+        specs.append(FieldSpec(field, kernel, tuple(config[key] for key in param_keys), component))
+    return specs
+
+
+def trade_basics(trade: Dict, creation_time: int) -> Dict:
+    amount = float(trade.get('tradeamount', 0))
+    return {
+        'time_from_creation_minutes': (int(trade['tradetime']) - creation_time) / 1000 / 60,
+        'nowsol': float(trade.get('nowsol', 0)),
+        'abs_amount': abs(amount),
+        'trade_side': 1 if amount > 0 else (-1 if amount < 0 else 0),
+    }
+
+
+class Strategy(NamedTuple):
+    name: str
+    fields: Tuple[FieldSpec, ...]
+    evaluate: Callable[[Dict], Optional[Dict]]
+
+
+class FeatureRegistry:
+    """按 (特征函数, 参数) 去重的特征登记表；登记项完全相同的策略共用同一份特征dict"""
+
+    def __init__(self):
+        self.strategies: Dict[str, Strategy] = {}
+        self._refcounts: Dict[Tuple, int] = {}
+        self._keys: Tuple[Tuple, ...] = ()
+        # 登记项完全相同的策略共用一份特征dict: [(登记项, [策略, ...])]
+        self._groups: List[Tuple[Tuple[FieldSpec, ...], List[Strategy]]] = []
+        # 登记变化时加一，引擎据此更新环形缓冲区容量
+        self.version = 0
+        self.stats = {'events': 0, 'kernel_calls': 0}
+
+    # ---------- 登记 ----------
+
+    def register(self, name: str, fields: Sequence[FieldSpec], evaluate: Callable[[Dict], Optional[Dict]]):
+        """登记策略（同名则替换）；evaluate(特征dict) 返回结果dict，无信号返回 None"""
+        for spec in fields:
+            if spec.kernel not in FEATURE_KERNELS:
+                raise ValueError(f"策略 {name}: 未知特征函数 {spec.kernel}")
+        if name in self.strategies:
+            self.unregister(name)
+        strategy = Strategy(name, tuple(fields), evaluate)
+        self.strategies[name] = strategy
+        for key in {spec.key for spec in strategy.fields}:
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+        self._changed()
+        return strategy
+
+    def unregister(self, name: str):
+        strategy = self.strategies.pop(name, None)
+        if strategy is None:
+            return
+        for key in {spec.key for spec in strategy.fields}:
+            self._refcounts[key] -= 1
+            if self._refcounts[key] == 0:
+                del self._refcounts[key]
+        self._changed()
+
+    def _changed(self):
+        self._keys = tuple(self._refcounts)
+        groups: Dict[Tuple[FieldSpec, ...], List[Strategy]] = {}
+        for strategy in self.strategies.values():
+            groups.setdefault(strategy.fields, []).append(strategy)
+        self._groups = list(groups.items())
+        self.version += 1
+
+    @property
+    def keys(self) -> Tuple[Tuple, ...]:
+        """去重后的 (特征函数, 参数)"""
+        return self._keys
+
+    def request_count(self) -> int:
+        """去重前各策略登记的 (特征函数, 参数) 总数"""
+        return sum(self._refcounts.values())
+
+    def history_config(self) -> Dict:
+        """登记的特征需要的回看笔数与时间窗口，键名按 ring_buffer.history_requirements 的后缀规则"""
+        count = 0
+        span_ms = 0
+        for kernel, params in self._keys:
+            for param_name, value in zip(FEATURE_KERNELS[kernel][1], params):
+                if param_name.endswith('count'):
+                    count = max(count, int(value))
+                elif param_name == 'window_ms':
+                    span_ms = max(span_ms, int(value))
+                elif param_name == 'window_seconds':
+                    span_ms = max(span_ms, int(value * 1000))
+        return {'FEATURE_LOOKBACK_COUNT': count, 'FEATURE_WINDOW_MS': span_ms}
+
+    # ---------- 计算 ----------
+
+    def compute(self, trade_data, index: int) -> Dict[Tuple, object]:
+        """一笔交易上计算全部唯一特征: {(特征函数, 参数): 值}"""
+        values = {}
+        for key in self._keys:
+            kernel, params = key
+            values[key] = FEATURE_KERNELS[kernel][0](trade_data, index, *params)
+        self.stats['kernel_calls'] += len(self._keys)
+        return values
+
+    @staticmethod
+    def strategy_features(fields: Sequence[FieldSpec], values: Dict[Tuple, object], basics: Dict) -> Dict:
+        features = dict(basics)
+        for spec in fields:
+            value = values[spec.key]
+            if spec.component is not None:
+                value = None if value is None else value[spec.component]
+            features[spec.field] = value
+        return features
+
+    def evaluate(self, trade_data, index: int, creation_time: int) -> List[Tuple[str, Dict]]:
+        """一笔交易上运行全部策略，返回有结果的 [(策略名, 结果)]"""
+        if not self.strategies:
+            return []
+        self.stats['events'] += 1
+        values = self.compute(trade_data, index)
+        basics = trade_basics(trade_data[index], creation_time)
+        results = []
+        for fields, strategies in self._groups:
+            features = self.strategy_features(fields, values, basics)
+            for strategy in strategies:
+                result = strategy.evaluate(features)
+                if result is not None:
+                    results.append((strategy.name, result))
+        return results
+
+    def compute_matrix(self, trade_data, creation_time: int, indices: Optional[Sequence[int]] = None) -> Dict:
+        """单个mint的特征矩阵: {'index': 行号列, 'basics': {字段: 列}, 'values': {(特征函数, 参数): 列}}"""
+        if indices is None:
+            indices = range(history_start(trade_data), len(trade_data))
+        indices = list(indices)
+        values = {}
+        for key in self._keys:
+            kernel, params = key
+            fn = FEATURE_KERNELS[kernel][0]
+            values[key] = [fn(trade_data, i, *params) for i in indices]
+        self.stats['kernel_calls'] += len(self._keys) * len(indices)
+        rows = [trade_basics(trade_data[i], creation_time) for i in indices]
+        basics = {field: [row[field] for row in rows] for field in BASIC_FIELDS}
+        return {'index': indices, 'basics': basics, 'values': values}
+
+    def strategy_matrix(self, name: str, matrix: Dict) -> Dict[str, List]:
+        """从特征矩阵中取出某个策略的 {字段: 列}（可直接传给 rule_compiler 的 score_matrix）"""
+        columns = dict(matrix['basics'])
+        for spec in self.strategies[name].fields:
+            column = matrix['values'][spec.key]
+            if spec.component is not None:
+                column = [None if value is None else value[spec.component] for value in column]
+            columns[spec.field] = column
+        return columns
+
+
+# =============================================================================
+# rule.json 规则（rule_compiler.CompiledRuleSet）登记为策略
+# =============================================================================
+RULE_STRATEGY_PREFIX = 'rule:'
+
+
+def rule_strategy_fields(rule, defaults: Optional[Dict] = None) -> List[FieldSpec]:
+    """一条编译后规则用到的特征登记项（特征参数取规则 params，缺省取 defaults）"""
+    config = dict(rule_feature_defaults() if defaults is None else defaults, **rule.params)
+    return config_feature_fields(config, rule.fields)
+
+
+def register_rule_set(registry: FeatureRegistry, rule_set, defaults: Optional[Dict] = None):
+    """把规则集的每条规则登记为 rule:<序号>，替换之前登记的规则；只在满足门槛时返回结果"""
+    for name in [name for name in registry.strategies if name.startswith(RULE_STRATEGY_PREFIX)]:
+        registry.unregister(name)
+    if defaults is None:
+        defaults = rule_feature_defaults()
+    for rule in rule_set.rules:
+        def evaluate(features, rule=rule):
+            result = rule_set.evaluate_rule(rule, features)
+            return result if result['can_buy'] else None
+        registry.register(f"{RULE_STRATEGY_PREFIX}{rule.index}", rule_strategy_fields(rule, defaults), evaluate)
+
+
+
+# =============================================================================
+# 策略脚本（pump_quant_demo、amm_quant_rule2）的买入条件登记为策略
+# =============================================================================
+# 脚本名 → 脚本文件与不看 CHECK_MODE、总是过滤的条件（pump_quant_demo 的条件1/2/3/5 没有模式开关）
+SCRIPT_STRATEGIES = {
+    'pump_quant_demo': {
+        'PATH': os.path.join(SCRIPT_DIR, 'pump_quant_demo.py'),
+        'ALWAYS_ONLINE': ('TIME_FROM_CREATION', 'NOWSOL', 'TRADE_AMOUNT', 'FILTERED_TRADES'),
+    },
+    'amm_quant_rule2': {
+        'PATH': os.path.join(SCRIPT_DIR, 'amm_quant_rule2.py'),
+        'ALWAYS_ONLINE': (),
+    },
+}
+
+# 条件名 → [(特征字段, 阈值形式, 阈值键, 缺失是否通过)]，语义同脚本 variant_find_buy_signal 的 online 判断
+#   range: 闭区间 (min, max)；pair: 两个键分别为下限、上限；min: 下限；flag: 必须为真
+#   negated: 脚本按跌幅（= -涨跌幅）判断，window_drop_pct 是涨跌幅原值，上下限取反
+SCRIPT_ONLINE_GATES = {
+    'MAX_AMOUNT': [('is_max_amount', 'flag', (), False)],
+    'PRICE_VOLATILITY': [('price_volatility', 'range', ('PRICE_VOLATILITY_RANGE',), False)],
+    'TIME_VOLATILITY': [('time_volatility', 'range', ('TIME_VOLATILITY_RANGE',), False)],
+    'AMOUNT_VOLATILITY': [('amount_volatility', 'range', ('AMOUNT_VOLATILITY_RANGE',), False)],
+    'PRICE_RATIO': [('price_ratio', 'range', ('PRICE_RATIO_RANGE',), True)],
+    'BUY_COUNT': [('buy_count', 'min', ('BUY_COUNT_MIN',), False)],
+    'SELL_COUNT': [('sell_count', 'min', ('SELL_COUNT_MIN',), False)],
+    'LARGE_TRADE_RATIO': [('large_trade_ratio', 'range', ('LARGE_TRADE_RATIO_RANGE',), False)],
+    'SMALL_TRADE_RATIO': [('small_trade_ratio', 'range', ('SMALL_TRADE_RATIO_RANGE',), False)],
+    'CONSECUTIVE_BUY': [('consecutive_buy', 'range', ('CONSECUTIVE_BUY_RANGE',), False)],
+    'CONSECUTIVE_SELL': [('consecutive_sell', 'range', ('CONSECUTIVE_SELL_RANGE',), False)],
+    'RECENT_TRADE_COUNT': [('recent_trade_count', 'range', ('RECENT_TRADE_COUNT_RANGE',), False)],
+    'AVG_TRADE_INTERVAL': [('avg_trade_interval', 'range', ('AVG_TRADE_INTERVAL_RANGE',), True)],
+    'WINDOW_AMOUNT_SUM': [('window_amount_sum', 'range', ('WINDOW_AMOUNT_SUM_RANGE',), True)],
+    'WINDOW_BUY_SELL_COUNT': [('window_buy_count', 'range', ('WINDOW_BUY_SELL_COUNT_BUY_RANGE',), True),
+                              ('window_sell_count', 'range', ('WINDOW_BUY_SELL_COUNT_SELL_RANGE',), True)],
+    'WINDOW_RISE': [('window_rise_pct', 'pair', ('WINDOW_RISE_MIN_PCT', 'WINDOW_RISE_MAX_PCT'), True)],
+    'WINDOW_DROP': [('window_drop_pct', 'negated', ('WINDOW_DROP_MIN_PCT', 'WINDOW_DROP_MAX_PCT'), True)],
+}
+
+
+def _gate_bounds(config: Dict, kind: str, keys: Tuple[str, ...]) -> Tuple[float, float]:
+    if kind == 'flag':
+        return 1.0, 1.0
+    if kind == 'min':
+        return float(config[keys[0]]), INF
+    if kind == 'range':
+        low, high = config[keys[0]]
+    else:
+        low, high = config[keys[0]], config[keys[1]]
+    if kind == 'negated':
+        return -float(high), -float(low)
+    return float(low), float(high)
+
+
+def script_gates(config: Dict, always_online: Sequence[str] = ()) -> Tuple[Gate, ...]:
+    """把策略脚本的 BUY_CONDITIONS_CONFIG 编译为门槛 (特征, 下限, 上限, 缺失是否通过)"""
+    def mode(cond):
+        return 'online' if cond in always_online else config.get(f'{cond}_CHECK_MODE', 'off')
+
+    gates = []
+    if 'TIME_FROM_CREATION' in always_online:
+        gates.append(('time_from_creation_minutes', float(config['TIME_FROM_CREATION_MINUTES']), INF, False))
+    elif mode('TIME_FROM_CREATION') == 'online':
+        gates.append(('time_from_creation_minutes',) + _gate_bounds(config, 'range', ('TIME_FROM_CREATION_RANGE',))
+                     + (False,))
+    if mode('NOWSOL') == 'online':
+        gates.append(('nowsol',) + _gate_bounds(config, 'range', ('NOWSOL_RANGE',)) + (False,))
+    if mode('TRADE_AMOUNT') == 'online':
+        gates.append(('abs_amount',) + _gate_bounds(config, 'range', ('TRADE_AMOUNT_RANGE',)) + (False,))
+    # 时间差需要前一笔交易，缺失时即使非online也不通过
+    if mode('TIME_DIFF') == 'online':
+        gates.append(('time_diff',) + _gate_bounds(config, 'range', ('TIME_DIFF_FROM_LAST_TRADE_RANGE',)) + (False,))
+    else:
+        gates.append(('time_diff', -INF, INF, False))
+    # 过滤后交易和: debug 模式下有效交易不足也不通过
+    filtered_mode = mode('FILTERED_TRADES')
+    if filtered_mode == 'online':
+        gates.append(('filtered_sum',) + _gate_bounds(config, 'range', ('FILTERED_TRADES_SUM_RANGE',)) + (False,))
+    elif filtered_mode == 'debug':
+        gates.append(('filtered_sum', -INF, INF, False))
+    trade_type = config.get('TRADE_TYPE')
+    if trade_type == 'buy':
+        gates.append(('trade_side', 1.0, 1.0, False))
+    elif trade_type == 'sell':
+        gates.append(('trade_side', -1.0, -1.0, False))
+    for cond, specs in SCRIPT_ONLINE_GATES.items():
+        if mode(cond) != 'online':
+            continue
+        for field, kind, keys, missing_ok in specs:
+            gates.append((field,) + _gate_bounds(config, kind, keys) + (missing_ok,))
+    return tuple(gates)
+
+
+def script_feature_config(config: Dict) -> Dict:
+    """脚本计算特征时实际使用的参数: 大单/小单占比任一启用时两者都按较大的回看笔数计算"""
+    active = ('online', 'debug')
+    if (config.get('LARGE_TRADE_RATIO_CHECK_MODE') in active
+            or config.get('SMALL_TRADE_RATIO_CHECK_MODE') in active):
+        lookback = max(config['LARGE_TRADE_RATIO_LOOKBACK'], config['SMALL_TRADE_RATIO_LOOKBACK'])
+        config = dict(config, LARGE_TRADE_RATIO_LOOKBACK=lookback, SMALL_TRADE_RATIO_LOOKBACK=lookback)
+    return config
+
+
+def register_script_strategy(registry: FeatureRegistry, name: str, config: Optional[Dict] = None):
+    """把策略脚本的买入条件登记为策略 name（SCRIPT_STRATEGIES 中的脚本名）；config 缺省时读取脚本的 BUY_CONDITIONS_CONFIG。
+    只登记 online 条件用到的特征，满足全部条件时返回 {'can_buy': True}"""
+    script = SCRIPT_STRATEGIES[name]
+    if config is None:
+        config = load_script_config(script['PATH'])
+    gates = script_gates(config, script['ALWAYS_ONLINE'])
+    fields = [gate[0] for gate in gates if gate[0] not in BASIC_FIELDS]
+    specs = config_feature_fields(script_feature_config(config), fields)
+
+    def evaluate(features):
+        return {'can_buy': True} if passes_gates(gates, features) else None
+    return registry.register(name, specs, evaluate)
+
+def main():
+    import pump
+    from rule_compiler import compile_rule_json
+    from rule_reload import RELOAD_CONFIG, read_rule_file, validate_rule_json
+    log_file = sys.argv[1] if len(sys.argv) > 1 else '/Users/xcold/Desktop/mint_temp.log'
+    rule_path = sys.argv[2] if len(sys.argv) > 2 else RELOAD_CONFIG['RULE_PATH']
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    registry = FeatureRegistry()
+    register_rule_set(registry, compile_rule_json(validate_rule_json(read_rule_file(rule_path))))
+    for name in SCRIPT_STRATEGIES:
+        register_script_strategy(registry, name)
+    print(f"策略 {len(registry.strategies)} 个, 特征登记 {registry.request_count()} 项, 去重后 {len(registry.keys)} 项")
+
+    started = time.perf_counter()
+    signals = 0
+    for mint_data in mint_info.values():
+        trade_data = mint_data['trade_data']
+        creation_time = trade_data[0]['tradetime'] if trade_data else 0
+        for index in range(len(trade_data)):
+            signals += len(registry.evaluate(trade_data, index, creation_time))
+    elapsed = time.perf_counter() - started
+    events = registry.stats['events']
+    print(f"交易 {events} 笔, 信号 {signals} 个, 耗时 {elapsed:.2f}秒, "
+          f"特征函数调用 {registry.stats['kernel_calls']} 次（不去重为 {registry.request_count() * events} 次）")
+
+
+if __name__ == "__main__":
+    main()
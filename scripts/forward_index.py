@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前向路径索引
+对单个mint的交易序列一次性构建价格区间最大/最小值的稀疏表 (sparse table)，
+之后任意入场点的"未来N秒最高/最低价"、"多久涨到+X%/跌到-X%"等前向统计
+都只需 bisect 定位时间窗口 + O(1) 区间查询或 O(log n) 首次穿越查询，无需再写前向扫描循环。
+
+要求 trade_data 的 tradetime 非递减。
+"""
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Union
+
+# 首次穿越的阈值: 数值（价格）或对价格单调的谓词
+Threshold = Union[float, Callable[[float], bool]]
+
+
+class ForwardIndex:
+    """单个mint的前向路径索引
+
+    max_table[k][i] = max(prices[i : i + 2^k])，min_table 同理；
+    区间查询取两个覆盖区间的最值，首次穿越用从大到小的 2^k 跳跃跳过整段未穿越的区间。
+    """
+
+    def __init__(self, trade_data: List[Dict]):
+        self.times = [trade['tradetime'] for trade in trade_data]
+        self.prices = [trade['price'] for trade in trade_data]
+        n = len(self.prices)
+        self.n = n
+        self.max_table = [list(self.prices)]
+        self.min_table = [list(self.prices)]
+        k = 1
+        while (1 << k) <= n:
+            half = 1 << (k - 1)
+            prev_max = self.max_table[k - 1]
+            prev_min = self.min_table[k - 1]
+            size = n - (1 << k) + 1
+            self.max_table.append([max(prev_max[i], prev_max[i + half]) for i in range(size)])
+            self.min_table.append([min(prev_min[i], prev_min[i + half]) for i in range(size)])
+            k += 1
+
+    # ------------------------------------------------------------------
+    # 时间窗口
+    # ------------------------------------------------------------------
+    def window_end(self, index: int, horizon_ms: int) -> int:
+        """成交时间 <= times[index] + horizon_ms 的最后一个索引"""
+        return bisect_right(self.times, self.times[index] + horizon_ms) - 1
+
+    def first_index_after(self, time_value: float, lo: int = 0) -> Optional[int]:
+        """索引 >= lo 中第一个成交时间 > time_value 的索引，没有返回 None"""
+        i = bisect_right(self.times, time_value, lo)
+        return i if i < self.n else None
+
+    def first_index_where(self, lo: int, predicate: Callable[[int], bool]) -> Optional[int]:
+        """在 [lo, n) 上对按索引单调（先False后True）的谓词二分，返回第一个True的索引"""
+        hi = self.n
+        if lo >= hi or not predicate(hi - 1):
+            return None
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if predicate(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    # ------------------------------------------------------------------
+    # 区间最值
+    # ------------------------------------------------------------------
+    def range_max(self, left: int, right: int) -> float:
+        """prices[left..right]（闭区间）的最大值"""
+        k = (right - left + 1).bit_length() - 1
+        table = self.max_table[k]
+        return max(table[left], table[right - (1 << k) + 1])
+
+    def range_min(self, left: int, right: int) -> float:
+        """prices[left..right]（闭区间）的最小值"""
+        k = (right - left + 1).bit_length() - 1
+        table = self.min_table[k]
+        return min(table[left], table[right - (1 << k) + 1])
+
+    def max_price_within(self, index: int, horizon_ms: int) -> Optional[float]:
+        """index 之后 horizon_ms 内（不含 index 本身）成交的最高价，窗口内无成交返回 None"""
+        end = self.window_end(index, horizon_ms)
+        return self.range_max(index + 1, end) if end > index else None
+
+    def min_price_within(self, index: int, horizon_ms: int) -> Optional[float]:
+        """index 之后 horizon_ms 内（不含 index 本身）成交的最低价，窗口内无成交返回 None"""
+        end = self.window_end(index, horizon_ms)
+        return self.range_min(index + 1, end) if end > index else None
+
+    # ------------------------------------------------------------------
+    # 首次穿越
+    # ------------------------------------------------------------------
+    def _first_passage(self, table: List[List[float]], start: int, predicate: Callable[[float], bool],
+                       end: Optional[int]) -> Optional[int]:
+        if end is None or end >= self.n:
+            end = self.n - 1
+        if start > end:
+            return None
+        pos = start
+        for k in range(len(table) - 1, -1, -1):
+            span = 1 << k
+            # 整段 [pos, pos + span) 都未穿越时跳过
+            if pos + span - 1 <= end and not predicate(table[k][pos]):
+                pos += span
+        return pos if pos <= end else None
+
+    def first_passage_up(self, start: int, threshold: Threshold, end: Optional[int] = None) -> Optional[int]:
+        """[start, end] 内第一个价格达到阈值的索引
+
+        threshold 为数值时判断 price >= threshold；也可传入对价格单调不减为True的谓词，
+        以便与回测中 (price - buy) / buy >= x 这类表达式逐位一致。
+        """
+        predicate = threshold if callable(threshold) else (lambda price: price >= threshold)
+        return self._first_passage(self.max_table, start, predicate, end)
+
+    def first_passage_down(self, start: int, threshold: Threshold, end: Optional[int] = None) -> Optional[int]:
+        """[start, end] 内第一个价格跌到阈值的索引（数值阈值判断 price <= threshold，或传入单调谓词）"""
+        predicate = threshold if callable(threshold) else (lambda price: price <= threshold)
+        return self._first_passage(self.min_table, start, predicate, end)
+
+    def time_to_return(self, index: int, target_return: float, horizon_ms: Optional[int] = None) -> Optional[int]:
+        """从 index 的成交价起，之后首次达到 target_return（正数为上涨，负数为下跌）所需的毫秒数
+
+        只看 index 之后的成交；horizon_ms 限定观察窗口，窗口内未达到返回 None。
+        """
+        base_price = self.prices[index]
+        end = self.window_end(index, horizon_ms) if horizon_ms is not None else None
+        if target_return >= 0:
+            j = self.first_passage_up(index + 1, lambda price: (price - base_price) / base_price >= target_return, end)
+        else:
+            j = self.first_passage_down(index + 1, lambda price: (price - base_price) / base_price <= target_return, end)
+        return None if j is None else self.times[j] - self.times[index]
+
+    def forward_stats(self, index: int, horizon_ms: int) -> Dict[str, Optional[float]]:
+        """index 之后 horizon_ms 内的前向收益统计: 最大涨幅、最大跌幅（相对 index 的成交价）"""
+        base_price = self.prices[index]
+        max_price = self.max_price_within(index, horizon_ms)
+        min_price = self.min_price_within(index, horizon_ms)
+        return {
+            'max_return': None if max_price is None else (max_price - base_price) / base_price,
+            'min_return': None if min_price is None else (min_price - base_price) / base_price,
+        }
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时交易事件接入服务 (asyncio)
+从 Unix socket 或持续追加的文件读取逐行JSON交易事件，分派到各mint的流式状态（stream_engine），
+把买卖决策逐行JSON写到输出流。
+
+事件格式: mint_temp.log 中 trade_data 的字段再加 mint，例如
+    {"mint": "xxxpump", "user": "...", "tradetime": 1769469250924, "tradeamount": 0.5, "nowsol": 8.1, "price": 1.8e-09}
+
+结构:
+    读取协程（每个socket连接一个 / 文件追加读取一个） → 有界输入队列 → 分派协程 → 有界输出队列 → 写出协程
+    队列满时 put 会挂起: socket 连接停止读取，压力经内核缓冲区传回生产者；文件追加读取暂停。
+    分派协程每个事件循环tick取出队列中已有的事件（最多 BATCH_SIZE 个）一次处理，
+    同一mint的事件保持到达顺序，不同mint的状态互相独立，活跃mint数只影响字典大小；
+    长时间没有交易的mint按 EVICTION 配置淘汰（stream_engine.EVICTION_CONFIG）。
+    延迟成交按事件时间推进（StreamEngine clock_fills）。
+    RULE_RELOAD 启用时 rule.json / sell_rules.json 变化后在后台线程加载，分派协程在事件之间换用新规则（rule_reload）。
+    SNAPSHOT 启用时定期写引擎状态快照（snapshot），启动时从快照恢复。tail 模式从文件开头读，
+    前 events_seen 个有效事件被跳过，只重放快照之后的事件；socket 输入不去重（多个连接交错，无法按序号对齐），
+    生产者应只发送快照之后的事件。停止时同步写最后一次快照。
+    PAPER 启用时决策同时驱动模拟盘（paper_trading），成交追加到 LEDGER_PATH 账本，启动时从账本恢复钱包。
+
+用法:
+    python live_service.py socket /tmp/pump_trades.sock
+    python live_service.py tail /path/to/trades.ndjson
+    python live_service.py demo [mint_log]    本地假生产者把mint日志按时间顺序写入socket
+"""
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, TextIO
+
+import pump
+from replay import merge_trade_streams
+from paper_trading import PAPER_CONFIG, PaperTrader
+from rule_reload import RELOAD_CONFIG, RuleReloader
+from snapshot import SNAPSHOT_CONFIG, EngineSnapshotter, load_snapshot, restore_into
+from stream_engine import EVICTION_CONFIG, StreamEngine
+
+LIVE_SERVICE_CONFIG = {
+    'INPUT_QUEUE_SIZE': 10000,  # 输入队列上限（事件数）
+    'OUTPUT_QUEUE_SIZE': 1000,  # 输出队列上限（决策数）
+    'BATCH_SIZE': 512,  # 每个tick最多处理的事件数
+    'TAIL_POLL_INTERVAL': 0.05,  # 文件无新数据时的轮询间隔(秒)
+    'STATS_INTERVAL': 10.0,  # 统计输出间隔(秒)，0 为不输出
+    'ERROR_LOG_LIMIT': 100,  # 处理出错的事件最多输出多少条错误日志，之后只计数
+    'EVICTION': dict(EVICTION_CONFIG, ENABLED=True),  # 不活跃mint的状态淘汰
+    'RULE_RELOAD': dict(RELOAD_CONFIG, ENABLED=False),  # 规则文件热更新
+    'SNAPSHOT': dict(SNAPSHOT_CONFIG, ENABLED=False),  # 状态快照与热重启，启用时需设置 DIR
+    'PAPER': dict(PAPER_CONFIG, ENABLED=False, LEDGER_PATH=None),  # 模拟盘
+}
+
+TRADE_FIELDS = ('tradetime', 'tradeamount', 'nowsol', 'price')
+
+
+def parse_event(line) -> Optional[Dict]:
+    """解析一行事件，字段缺失或格式错误返回 None（进入引擎、改动mint状态之前校验完整个事件）"""
+    try:
+        event = json.loads(line)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(event, dict) or not isinstance(event.get('mint'), str) or not event['mint']:
+        return None
+    for field in TRADE_FIELDS:
+        value = event.get(field)
+        # bool 是 int 的子类；NaN/inf 会让价格和盈亏比较失效
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+    return event
+
+
+class LiveService:
+    """
+    用法:
+        service = LiveService(output=sys.stdout)
+        await service.start()
+        await service.serve_unix_socket(path)   # 或 await service.tail_file(path)
+        await service.drain()                   # 等待已接收的事件全部处理完
+        await service.stop()
+    """
+
+    def __init__(self, engine: Optional[StreamEngine] = None, output: Optional[TextIO] = None,
+                 config: Optional[Dict] = None):
+        self.config = config or LIVE_SERVICE_CONFIG
+        self.rule_reloader = None
+        reload_config = self.config.get('RULE_RELOAD') or {}
+        if engine is None and reload_config.get('ENABLED'):
+            self.rule_reloader = RuleReloader(reload_config['RULE_PATH'], reload_config['SELL_RULE_PATH'],
+                                              reload_config['POLL_INTERVAL'])
+            self.rule_reloader.load_now()
+        self.engine = engine or StreamEngine(clock_fills=True, eviction=self.config.get('EVICTION'),
+                                             rule_reloader=self.rule_reloader)
+        self.snapshotter = None
+        # 从快照恢复时已处理过的事件数，只用于从头重读的文件（tail_file from_start）
+        self.resume_skip = 0
+        snapshot_config = self.config.get('SNAPSHOT') or {}
+        if snapshot_config.get('ENABLED'):
+            snapshot = load_snapshot(snapshot_config['DIR']) if engine is None else None
+            if snapshot is not None:
+                restore_into(self.engine, snapshot)
+                self.resume_skip = self.engine.events_seen
+            self.snapshotter = EngineSnapshotter(snapshot_config['DIR'], snapshot_config)
+            self.engine.snapshotter = self.snapshotter
+        self.paper = None
+        paper_config = self.config.get('PAPER') or {}
+        if paper_config.get('ENABLED'):
+            ledger_path = paper_config.get('LEDGER_PATH')
+            self.paper = (PaperTrader.from_ledger(ledger_path, paper_config) if ledger_path
+                          else PaperTrader(paper_config))
+        self.output = output or sys.stdout
+        self.input_queue: Optional[asyncio.Queue] = None
+        self.output_queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._server = None
+        self.stats = {
+            'received': 0,
+            'invalid': 0,
+            'processed': 0,
+            'batches': 0,
+            'max_batch': 0,
+            'decisions': 0,
+            'input_high_water': 0,
+            'skipped': 0,
+            'errors': 0,
+        }
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        # 队列需在事件循环内创建
+        self.input_queue = asyncio.Queue(self.config['INPUT_QUEUE_SIZE'])
+        self.output_queue = asyncio.Queue(self.config['OUTPUT_QUEUE_SIZE'])
+        self._tasks = [asyncio.create_task(self._dispatch()), asyncio.create_task(self._write_output())]
+        if self.config['STATS_INTERVAL'] > 0:
+            self._tasks.append(asyncio.create_task(self._report_stats()))
+        if self.rule_reloader is not None:
+            self.rule_reloader.start()
+
+    async def stop(self):
+        if self.rule_reloader is not None:
+            self.rule_reloader.stop()
+        if self.snapshotter is not None:
+            self.snapshotter.close(self.engine)
+            self.snapshotter = None
+        if self.paper is not None:
+            self.paper.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def drain(self):
+        await self.input_queue.join()
+        await self.output_queue.join()
+
+    # ---------- 输入 ----------
+
+    async def _enqueue(self, line, skip: bool = False) -> bool:
+        """解析并放入输入队列，skip 为 True 时只计数不处理；返回是否为有效事件"""
+        event = parse_event(line)
+        if event is None:
+            if line.strip():
+                self.stats['invalid'] += 1
+            return False
+        if skip:
+            self.stats['skipped'] += 1
+            return True
+        self.stats['received'] += 1
+        await self.input_queue.put(event)
+        self.stats['input_high_water'] = max(self.stats['input_high_water'], self.input_queue.qsize())
+        return True
+
+    async def serve_unix_socket(self, path: str):
+        """在 path 上监听，每个连接逐行读取事件（不跳过快照之前的事件）"""
+        if self.resume_skip > 0:
+            print(f"[warn] 已从快照恢复（已处理 {self.resume_skip} 个事件），socket 输入不去重，"
+                  f"生产者重发的快照之前的事件会被再次处理", file=sys.stderr)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self._enqueue(line)
+        finally:
+            writer.close()
+
+    async def tail_file(self, path: str, from_start: bool = False):
+        """持续读取 path 的新增行（类似 tail -f），不完整的末行等写完再处理
+
+        从快照恢复后 from_start=True 时，文件开头的 resume_skip 个有效事件视为已处理而跳过。
+        """
+        skip = self.resume_skip if from_start else 0
+        if self.resume_skip > 0 and not from_start:
+            print(f"[warn] 已从快照恢复（已处理 {self.resume_skip} 个事件），但从文件末尾开始读取，"
+                  f"快照之后、启动之前写入的事件不会被处理", file=sys.stderr)
+        with open(path, 'rb') as f:
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            partial = b''
+            while True:
+                chunk = f.readline()
+                if not chunk:
+                    await asyncio.sleep(self.config['TAIL_POLL_INTERVAL'])
+                    continue
+                partial += chunk
+                if not partial.endswith(b'\n'):
+                    continue
+                line, partial = partial, b''
+                if await self._enqueue(line, skip > 0) and skip > 0:
+                    skip -= 1
+
+    # ---------- 分派与输出 ----------
+
+    async def _dispatch(self):
+        queue = self.input_queue
+        batch_size = self.config['BATCH_SIZE']
+        engine = self.engine
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+            decisions = []
+            paper = self.paper
+            for event in batch:
+                # 单个事件出错只记录并跳过，不能让分派协程退出（否则输入队列不再被消费）；
+                # 引擎已丢弃该mint改了一半的状态，并把这个事件计入 events_seen（恢复时不重放）
+                try:
+                    events = engine.on_trade(event['mint'], event)
+                except Exception as e:
+                    self._record_error(event, e)
+                    continue
+                if events and paper is not None:
+                    try:
+                        paper.on_events(events, engine.events_seen)
+                    except Exception as e:
+                        self._record_error(event, e)
+                decisions.extend(events)
+            self.stats['processed'] += len(batch)
+            for decision in decisions:
+                await self.output_queue.put(decision)
+            for _ in batch:
+                queue.task_done()
+
+    def _record_error(self, event: Dict, error: Exception):
+        self.stats['errors'] += 1
+        self.last_error = f"{event.get('mint')}: {type(error).__name__}: {error}"
+        if self.stats['errors'] <= self.config.get('ERROR_LOG_LIMIT', 0):
+            print(f"[error] 事件处理失败 {self.last_error}", file=sys.stderr)
+
+    async def _write_output(self):
+        queue = self.output_queue
+        while True:
+            decision = await queue.get()
+            lines = [decision]
+            while not queue.empty():
+                lines.append(queue.get_nowait())
+            for item in lines:
+                self.output.write(json.dumps(item, ensure_ascii=False) + '\n')
+            self.output.flush()
+            self.stats['decisions'] += len(lines)
+            for _ in lines:
+                queue.task_done()
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self.config['STATS_INTERVAL'])
+            print(f"[stats] {self.format_stats()}", file=sys.stderr)
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (f"接收 {s['received']}, 处理 {s['processed']}, 无效 {s['invalid']}, "
+                f"批次 {s['batches']} (最大 {s['max_batch']}), 决策 {s['decisions']}, "
+                f"活跃mint {len(self.engine.mints)}, 淘汰 {self.engine.eviction_stats['evicted']}, "
+                f"恢复 {self.engine.eviction_stats['restored']}, 回看截断 {self.engine.truncated_lookbacks()}, "
+                f"输入队列峰值 {s['input_high_water']}, "
+                f"出错 {s['errors']}" + (f" (最近: {self.last_error})" if self.last_error else "")
+                + f", 出错丢弃mint状态 {self.engine.reset_stats['mints']} (含持仓 {self.engine.reset_stats['positions']})"
+                + self._format_rule_stats() + self._format_snapshot_stats() + self._format_paper_stats())
+
+    def _format_rule_stats(self) -> str:
+        reloader = self.rule_reloader
+        if reloader is None:
+            return ""
+        text = f", 规则版本 {self.engine.rule_book.version if self.engine.rule_book else '-'}"
+        if reloader.last_error:
+            text += f" (最近加载失败: {reloader.last_error})"
+        return text
+
+    def _format_paper_stats(self) -> str:
+        if self.paper is None:
+            return ""
+        summary = self.paper.summary()
+        return (f", 模拟盘余额 {summary['sol']:.4f} SOL, 已实现盈亏 {summary['realized_profit']:.4f}, "
+                f"持仓 {summary['open_positions']}, 拒绝 {summary['rejected']}")
+
+    def _format_snapshot_stats(self) -> str:
+        snapshotter = self.snapshotter
+        if snapshotter is None:
+            return ""
+        s = snapshotter.stats
+        text = f", 快照 {s['snapshots']} 次 (最近 seq {s['last_seq']}), 跳过已处理 {self.stats['skipped']}"
+        if snapshotter.last_error:
+            text += f" (最近写出失败: {snapshotter.last_error})"
+        return text
+
+
+async def fake_producer(path: str, mint_info: Dict, connections: int = 4):
+    """本地假生产者: 按全局时间顺序把mint日志的交易写入socket，mint按哈希分到多个连接（同一mint只走一个连接）"""
+    streams = [await asyncio.open_unix_connection(path) for _ in range(connections)]
+    slots = {}
+    for mint_name, trade in merge_trade_streams(mint_info):
+        slot = slots.setdefault(mint_name, len(slots) % connections)
+        writer = streams[slot][1]
+        writer.write((json.dumps(dict(trade, mint=mint_name)) + '\n').encode('utf-8'))
+        if writer.transport.get_write_buffer_size() > 65536:
+            await writer.drain()
+    for _, writer in streams:
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_demo(log_file: str):
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    socket_path = os.path.join(tempfile.gettempdir(), f"pump_live_{os.getpid()}.sock")
+    config = dict(LIVE_SERVICE_CONFIG, STATS_INTERVAL=0)
+    with open(os.devnull, 'w') as devnull:
+        service = LiveService(output=devnull, config=config)
+        await service.start()
+        await service.serve_unix_socket(socket_path)
+        started = time.perf_counter()
+        await fake_producer(socket_path, mint_info)
+        # 生产者写完后等待socket中剩余数据读入队列并处理完
+        while service.stats['received'] + service.stats['invalid'] < sum(
+                len(m.get('trade_data') or []) for m in mint_info.values()):
+            await asyncio.sleep(0.01)
+        await service.drain()
+        elapsed = time.perf_counter() - started
+        await service.stop()
+    os.unlink(socket_path)
+    print(service.format_stats())
+    print(f"耗时 {elapsed:.2f}秒, {service.stats['processed'] / elapsed:.0f} 笔/秒")
+
+
+async def run_source(mode: str, path: str):
+    service = LiveService()
+    await service.start()
+    try:
+        if mode == 'socket':
+            await service.serve_unix_socket(path)
+            await asyncio.Event().wait()
+        else:
+            await service.tail_file(path, from_start=service.engine.events_seen > 0)
+    finally:
+        await service.stop()
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'demo'
+    if mode == 'demo':
+        log_file = sys.argv[2] if len(sys.argv) > 2 else '/Users/xcold/Desktop/mint_temp.log'
+        asyncio.run(run_demo(log_file))
+    elif mode in ('socket', 'tail') and len(sys.argv) > 2:
+        try:
+            asyncio.run(run_source(mode, sys.argv[2]))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print("用法: python live_service.py socket <路径> | tail <文件> | demo [mint_log]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟盘（paper trading）
+由流式引擎（回放或实时）的决策事件驱动: 维护模拟钱包与持仓，成交写入只追加的账本，
+结果可与同一份数据上的批量回测（pump.backtest_mint）逐笔对比。
+
+成交模型:
+    延迟成交由引擎按回放时钟决定（StreamEngine clock_fills）: buy_fill 事件即买入成交，
+    trade 事件即卖出成交，成交价、成交时间与批量回测 get_price_at_time 的口径相同。
+    金额与手续费用 pump.calculate_entry_cost / calculate_exit_proceeds（与 calculate_exit_pnl 同一套计算），
+    买入时从钱包扣除买入金额，卖出时加回扣除手续费后的SOL，单笔盈亏与批量回测逐位相同。
+    钱包余额不足或持仓数达到上限时拒绝该笔买入，该持仓之后的成交一并忽略（批量回测不限资金）。
+
+账本:
+    每行一个JSON成交 {seq, event_seq, type(buy/sell), mint, ...}，只追加；同一笔事件产生的成交一次写入。
+    event_seq 为产生成交时引擎已处理的事件数（StreamEngine.events_seen）。
+    从账本恢复（PaperTrader.from_ledger）时重建余额与持仓；配合 snapshot 热重启时，
+    event_seq 不超过账本最后一条的事件会被跳过，重放不会重复记账。
+
+用法:
+    trader = PaperTrader(ledger_path='paper_ledger.ndjson')
+    for mint, trade in 事件流:
+        trader.on_events(engine.on_trade(mint, trade), engine.events_seen)
+    trader.on_events(engine.finish_all(), engine.events_seen + 1)
+    trader.close()
+    python paper_trading.py [mint_log] [账本路径]   回放整个日志做模拟盘，并与批量回测对比
+"""
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pump
+from replay import merge_trade_streams
+from stream_engine import StreamEngine
+
+PAPER_CONFIG = {
+    'INITIAL_SOL': 100.0,  # 初始SOL余额
+    'MAX_OPEN_POSITIONS': None,  # 同时持仓数上限，None 为不限
+    'FSYNC': False,  # 每次写账本后 fsync（实时模式建议开启）
+}
+
+
+class PaperTrader:
+    """模拟钱包与持仓簿，on_events 接收 StreamEngine 的决策事件"""
+
+    def __init__(self, config: Optional[Dict] = None, ledger_path: Optional[str] = None):
+        self.config = dict(PAPER_CONFIG, **(config or {}))
+        self.sol = self.config['INITIAL_SOL']
+        # mint -> {buy_trigger_index, actual_buy_index, buy_price, buy_amount_sol, buy_fee, tokens, fill_time}
+        self.positions: Dict[str, Dict] = {}
+        # 已出现买入信号、等待买入成交的mint -> 信号索引
+        self.pending: Dict[str, int] = {}
+        # 被拒绝的持仓（余额不足/持仓数上限），之后的成交忽略
+        self.rejected = set()
+        self.closed: List[Dict] = []
+        self.realized_profit = 0.0
+        self.fees_paid = 0.0
+        self.stats = {'buys': 0, 'sells': 0, 'wins': 0, 'rejected': 0, 'skipped_events': 0}
+        self.seq = 0
+        # 账本中最后一条成交的 event_seq，不超过它的事件已记账
+        self.ledger_event_seq = 0
+        self.ledger_path = ledger_path
+        self._ledger = open(ledger_path, 'a', encoding='utf-8') if ledger_path else None
+
+    # ---------- 事件 ----------
+
+    def on_events(self, events: Iterable[Dict], event_seq: int) -> List[Dict]:
+        """处理一笔交易产生的决策事件，返回本次的成交记录"""
+        if event_seq <= self.ledger_event_seq:
+            self.stats['skipped_events'] += 1
+            return []
+        fills = []
+        for event in events:
+            kind = event['type']
+            if kind == 'buy_signal':
+                self.pending[event['mint']] = event['index']
+            elif kind == 'buy_fill':
+                fill = self._buy(event)
+                if fill is not None:
+                    fills.append(fill)
+            elif kind == 'trade':
+                fill = self._sell(event['record'], event['tradetime'])
+                if fill is not None:
+                    fills.append(fill)
+        if fills:
+            for fill in fills:
+                fill['event_seq'] = event_seq
+            self._append(fills)
+        return fills
+
+    def _buy(self, event: Dict) -> Optional[Dict]:
+        mint_name = event['mint']
+        signal_index = self.pending.pop(mint_name, None)
+        buy_amount_sol, buy_fee, tokens = pump.calculate_entry_cost(event['nowsol'], event['price'])
+        max_open = self.config['MAX_OPEN_POSITIONS']
+        if buy_amount_sol > self.sol or (max_open is not None and len(self.positions) >= max_open):
+            self.rejected.add(mint_name)
+            self.stats['rejected'] += 1
+            return None
+        self.sol -= buy_amount_sol
+        self.fees_paid += buy_fee
+        self.positions[mint_name] = {
+            'buy_trigger_index': signal_index,
+            'actual_buy_index': event['index'],
+            'buy_price': event['price'],
+            'buy_amount_sol': buy_amount_sol,
+            'buy_fee': buy_fee,
+            'tokens': tokens,
+            'fill_time': event['tradetime'],
+        }
+        self.stats['buys'] += 1
+        return self._fill('buy', mint_name, event['index'], event['tradetime'], event['price'],
+                          sol=buy_amount_sol, fee=buy_fee, tokens=tokens, buy_trigger_index=signal_index)
+
+    def _sell(self, record: Dict, fill_time: int) -> Optional[Dict]:
+        mint_name = record['mint_name']
+        position = self.positions.pop(mint_name, None)
+        if position is None:
+            self.rejected.discard(mint_name)
+            return None
+        sell_amount_sol, sell_fee, final_sol = pump.calculate_exit_proceeds(position['tokens'],
+                                                                            record['sell_price'])
+        profit = final_sol - position['buy_amount_sol']
+        self.sol += final_sol
+        self.fees_paid += sell_fee
+        self.realized_profit += profit
+        self.stats['sells'] += 1
+        if profit > 0:
+            self.stats['wins'] += 1
+        self.closed.append({
+            'mint_name': mint_name,
+            'buy_trigger_index': position['buy_trigger_index'],
+            'buy_price': position['buy_price'],
+            'sell_price': record['sell_price'],
+            'profit_sol': profit,
+            'profit_rate': profit / position['buy_amount_sol'],
+        })
+        return self._fill('sell', mint_name, record['actual_sell_index'], fill_time,
+                          record['sell_price'], sol=sell_amount_sol, fee=sell_fee, tokens=position['tokens'],
+                          profit=profit, reason=record['sell_reason'])
+
+    def _fill(self, kind: str, mint_name: str, index: int, fill_time: int, price: float, **fields) -> Dict:
+        self.seq += 1
+        fill = {'seq': self.seq, 'type': kind, 'mint': mint_name, 'index': index, 'fill_time': fill_time,
+                'price': price}
+        fill.update(fields)
+        fill['balance'] = self.sol
+        return fill
+
+    # ---------- 账本 ----------
+
+    def _append(self, fills: List[Dict]):
+        self.ledger_event_seq = fills[-1]['event_seq']
+        if self._ledger is None:
+            return
+        self._ledger.write(''.join(json.dumps(fill, ensure_ascii=False) + '\n' for fill in fills))
+        if self.config['FSYNC']:
+            self._ledger.flush()
+            os.fsync(self._ledger.fileno())
+
+    def close(self):
+        if self._ledger is not None:
+            self._ledger.close()
+            self._ledger = None
+
+    @classmethod
+    def from_ledger(cls, ledger_path: str, config: Optional[Dict] = None) -> 'PaperTrader':
+        """读取已有账本重建余额、持仓与统计，之后的成交继续追加到同一账本；不完整的末行忽略"""
+        trader = cls(config)
+        try:
+            with open(ledger_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                fill = json.loads(line)
+            except ValueError:
+                continue
+            trader._replay_fill(fill)
+        trader.ledger_path = ledger_path
+        trader._ledger = open(ledger_path, 'a', encoding='utf-8')
+        if lines and not lines[-1].endswith('\n'):
+            trader._ledger.write('\n')
+        return trader
+
+    def _replay_fill(self, fill: Dict):
+        mint_name = fill['mint']
+        if fill['type'] == 'buy':
+            self.positions[mint_name] = {
+                'buy_trigger_index': fill['buy_trigger_index'],
+                'actual_buy_index': fill['index'],
+                'buy_price': fill['price'],
+                'buy_amount_sol': fill['sol'],
+                'buy_fee': fill['fee'],
+                'tokens': fill['tokens'],
+                'fill_time': fill['fill_time'],
+            }
+            self.stats['buys'] += 1
+        else:
+            position = self.positions.pop(mint_name, None)
+            self.realized_profit += fill['profit']
+            self.stats['sells'] += 1
+            if fill['profit'] > 0:
+                self.stats['wins'] += 1
+            if position is not None:
+                self.closed.append({
+                    'mint_name': mint_name,
+                    'buy_trigger_index': position['buy_trigger_index'],
+                    'buy_price': position['buy_price'],
+                    'sell_price': fill['price'],
+                    'profit_sol': fill['profit'],
+                    'profit_rate': fill['profit'] / position['buy_amount_sol'],
+                })
+        self.fees_paid += fill['fee']
+        self.sol = fill['balance']
+        self.seq = fill['seq']
+        self.ledger_event_seq = fill['event_seq']
+
+    # ---------- 统计 ----------
+
+    def equity(self, marks: Optional[Dict[str, float]] = None) -> float:
+        """余额加持仓市值（marks 为 mint -> 最新价格，缺省按买入价）"""
+        marks = marks or {}
+        return self.sol + sum(position['tokens'] * marks.get(mint_name, position['buy_price'])
+                              for mint_name, position in self.positions.items())
+
+    def summary(self) -> Dict:
+        sells = self.stats['sells']
+        return {
+            'sol': self.sol,
+            'open_positions': len(self.positions),
+            'realized_profit': self.realized_profit,
+            'fees_paid': self.fees_paid,
+            'trades': sells,
+            'win_rate': self.stats['wins'] / sells if sells else 0.0,
+            'rejected': self.stats['rejected'],
+        }
+
+
+def run_paper(mint_info: Dict, trader: Optional[PaperTrader] = None, engine: Optional[StreamEngine] = None) -> Dict:
+    """按全局时间顺序回放日志驱动模拟盘，返回 {trader, engine, events, elapsed_seconds}"""
+    trader = trader or PaperTrader()
+    engine = engine or StreamEngine(clock_fills=True)
+    started = time.perf_counter()
+    count = 0
+    for mint_name, trade in merge_trade_streams(mint_info):
+        events = engine.on_trade(mint_name, trade)
+        if events:
+            trader.on_events(events, engine.events_seen)
+        count += 1
+    trader.on_events(engine.finish_all(), engine.events_seen + 1)
+    return {'trader': trader, 'engine': engine, 'events': count,
+            'elapsed_seconds': time.perf_counter() - started}
+
+
+def compare_with_backtest(mint_info: Dict, trader: PaperTrader) -> Dict:
+    """按 (mint, 买入信号索引) 把模拟盘的已平仓交易与批量回测逐笔配对"""
+    expected = {}
+    for mint_name, mint_data in mint_info.items():
+        for record in pump.backtest_mint(mint_name, mint_data):
+            expected[(mint_name, record['buy_trigger_index'])] = record
+    actual = {(trade['mint_name'], trade['buy_trigger_index']): trade for trade in trader.closed}
+    matched = [key for key in actual if key in expected]
+    differing = [key for key in matched
+                 if actual[key]['profit_sol'] != expected[key]['profit_sol']
+                 or actual[key]['buy_price'] != expected[key]['buy_price']
+                 or actual[key]['sell_price'] != expected[key]['sell_price']]
+    return {
+        'backtest_trades': len(expected),
+        'paper_trades': len(actual),
+        'matched': len(matched),
+        'identical': len(matched) - len(differing),
+        'differing': sorted(differing),
+        'only_backtest': sorted(key for key in expected if key not in actual),
+        'only_paper': sorted(key for key in actual if key not in expected),
+        'backtest_profit': sum(record['profit_sol'] for record in expected.values()),
+        'paper_profit': sum(trade['profit_sol'] for trade in actual.values()),
+    }
+
+
+def main():
+    log_file = sys.argv[1] if len(sys.argv) > 1 else '/Users/xcold/Desktop/mint_temp.log'
+    ledger_path = sys.argv[2] if len(sys.argv) > 2 else None
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    result = run_paper(mint_info, PaperTrader(ledger_path=ledger_path))
+    trader = result['trader']
+    trader.close()
+    summary = trader.summary()
+    print(f"回放 {result['events']} 笔, 耗时 {result['elapsed_seconds']:.2f}秒, "
+          f"{result['events'] / result['elapsed_seconds']:.0f} 笔/秒")
+    print(f"余额 {summary['sol']:.4f} SOL, 已实现盈亏 {summary['realized_profit']:.4f}, "
+          f"手续费 {summary['fees_paid']:.4f}, 交易 {summary['trades']} 笔, 胜率 {summary['win_rate']*100:.1f}%, "
+          f"拒绝 {summary['rejected']}, 未平仓 {summary['open_positions']}")
+    report = compare_with_backtest(mint_info, trader)
+    print(f"批量回测 {report['backtest_trades']} 笔, 模拟盘 {report['paper_trades']} 笔, "
+          f"配对 {report['matched']} 笔, 逐位相同 {report['identical']} 笔")
+    print(f"仅回测 {len(report['only_backtest'])} 笔, 仅模拟盘 {len(report['only_paper'])} 笔, "
+          f"盈亏 回测 {report['backtest_profit']:.4f} / 模拟盘 {report['paper_profit']:.4f}")
+    for key in (report['differing'] + report['only_backtest'] + report['only_paper'])[:10]:
+        print(f"  {key}")
+
+
+if __name__ == "__main__":
+    main()
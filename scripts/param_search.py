@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+买入参数的序贯模型优化 (TPE, Tree-structured Parzen Estimator)
+替代对搜索空间做完整笛卡尔积的网格回测: 已评估的参数按目标值分成"好"(前 gamma 比例)和"差"两组，
+对每个参数分别用 Parzen 估计拟合 l(x)=p(x|好) 与 g(x)=p(x|差)，从 l(x) 采样候选并取 l(x)/g(x) 最大者。
+
+搜索空间 {参数名: 取值}:
+    列表/元组           → 类别参数，取值可以是任意可JSON化的对象（包括区间元组）
+    {'low', 'high'}     → 连续参数，可选 'int': True 取整、'log': True 在对数尺度上采样、'default' 基线取值
+
+ask(n) 一次给出 n 组参数供并发回测，尚未 tell 的参数在后续提议中按"差"组处理，使同一批次彼此分散。
+目标值越大越好。纯Python实现，不依赖numpy。
+
+ParetoFrontier 在多个目标（盈利数、胜率、平均盈利率、总盈利）上增量维护非支配集，
+用于不指定单一排序键的多目标筛选。
+"""
+import bisect
+import json
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+
+# 连续参数的最小带宽（占取值范围的比例）
+MIN_BANDWIDTH_RATIO = 0.05
+# 同一组参数重复提议时的最大重采样次数
+MAX_DUPLICATE_RETRIES = 20
+
+
+def is_continuous(spec) -> bool:
+    return isinstance(spec, dict)
+
+
+def space_size(space: Dict) -> Optional[int]:
+    """搜索空间的组合总数，含连续参数时返回 None"""
+    total = 1
+    for spec in space.values():
+        if is_continuous(spec):
+            return None
+        total *= len(spec)
+    return total
+
+
+def space_defaults(space: Dict) -> Dict:
+    """每个参数的基线取值: 类别参数取第一个，连续参数取 'default'（缺省为 low）"""
+    params = {}
+    for key, spec in space.items():
+        if is_continuous(spec):
+            value = spec.get('default', spec['low'])
+            params[key] = int(round(value)) if spec.get('int') else value
+        else:
+            params[key] = spec[0]
+    return params
+
+
+def params_key(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _normal_pdf(x: float, mu: float, sigma: float) -> float:
+    z = (x - mu) / sigma
+    return math.exp(-0.5 * z * z) / (sigma * math.sqrt(2.0 * math.pi))
+
+
+class _ContinuousParam:
+    """连续参数: 在 [low, high]（log 时为对数尺度）上的截断高斯混合 + 均匀先验"""
+
+    def __init__(self, spec: Dict):
+        self.is_log = bool(spec.get('log'))
+        self.is_int = bool(spec.get('int'))
+        self.low = math.log(spec['low']) if self.is_log else float(spec['low'])
+        self.high = math.log(spec['high']) if self.is_log else float(spec['high'])
+        self.width = max(self.high - self.low, 1e-12)
+
+    def to_internal(self, value) -> float:
+        return math.log(value) if self.is_log else float(value)
+
+    def to_value(self, x: float):
+        value = math.exp(x) if self.is_log else x
+        return int(round(value)) if self.is_int else value
+
+    def _bandwidth(self, n: int) -> float:
+        return self.width * max(MIN_BANDWIDTH_RATIO, 1.0 / math.sqrt(1 + n))
+
+    def sample_prior(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+    def sample(self, observed: List[float], rng: random.Random) -> float:
+        # 均匀先验作为第 n+1 个混合分量
+        k = rng.randrange(len(observed) + 1)
+        if k == len(observed):
+            return self.sample_prior(rng)
+        sigma = self._bandwidth(len(observed))
+        x = rng.gauss(observed[k], sigma)
+        return min(max(x, self.low), self.high)
+
+    def density(self, x: float, observed: List[float]) -> float:
+        sigma = self._bandwidth(len(observed))
+        total = 1.0 / self.width
+        for mu in observed:
+            total += _normal_pdf(x, mu, sigma)
+        return total / (len(observed) + 1)
+
+
+class _CategoricalParam:
+    """类别参数: 观测计数 + 每个取值一个伪计数的平滑频率"""
+
+    def __init__(self, choices):
+        self.choices = list(choices)
+        self.keys = [params_key(c) for c in self.choices]
+
+    def to_internal(self, value) -> int:
+        return self.keys.index(params_key(value))
+
+    def to_value(self, x: int):
+        return self.choices[x]
+
+    def sample_prior(self, rng: random.Random) -> int:
+        return rng.randrange(len(self.choices))
+
+    def _weights(self, observed: List[int]) -> List[float]:
+        weights = [1.0] * len(self.choices)
+        for x in observed:
+            weights[x] += 1.0
+        return weights
+
+    def sample(self, observed: List[int], rng: random.Random) -> int:
+        return rng.choices(range(len(self.choices)), weights=self._weights(observed))[0]
+
+    def density(self, x: int, observed: List[int]) -> float:
+        return (1.0 + observed.count(x)) / (len(observed) + len(self.choices))
+
+
+class TPESampler:
+    """
+    用法:
+        sampler = TPESampler(space, seed=0)
+        while ...:
+            batch = sampler.ask(8)
+            for params, score in zip(batch, evaluate(batch)):
+                sampler.tell(params, score)
+        sampler.best
+    """
+
+    def __init__(self, space: Dict, gamma: float = 0.25, n_startup: int = 8,
+                 n_ei_candidates: int = 24, seed: Optional[int] = None):
+        self.space = space
+        self.gamma = gamma
+        self.n_startup = n_startup
+        self.n_ei_candidates = n_ei_candidates
+        self.rng = random.Random(seed)
+        self.params = {key: _ContinuousParam(spec) if is_continuous(spec) else _CategoricalParam(spec)
+                       for key, spec in space.items()}
+        self.trials: List[Tuple[Dict, float]] = []
+        self.pending: Dict[str, Dict] = {}
+        self.seen = set()
+
+    @property
+    def best(self) -> Optional[Tuple[Dict, float]]:
+        return max(self.trials, key=lambda t: t[1]) if self.trials else None
+
+    def tell(self, params: Dict, score: float):
+        key = params_key(params)
+        self.pending.pop(key, None)
+        self.seen.add(key)
+        self.trials.append((params, score))
+
+    def ask(self, n: int = 1) -> List[Dict]:
+        batch = []
+        for _ in range(n):
+            params = None
+            for attempt in range(MAX_DUPLICATE_RETRIES):
+                # 模型提议反复落在已评估的点上时，后半程改为从先验随机采样
+                candidate = self._propose() if attempt < MAX_DUPLICATE_RETRIES // 2 else self._sample_prior()
+                key = params_key(candidate)
+                if key not in self.seen and key not in self.pending:
+                    params = candidate
+                    break
+            if params is None:
+                # 空间（几乎）已被穷举
+                break
+            self.pending[params_key(params)] = params
+            batch.append(params)
+        return batch
+
+    def _split(self) -> Tuple[List[Dict], List[Dict]]:
+        ranked = sorted(self.trials, key=lambda t: t[1], reverse=True)
+        n_good = max(1, int(math.ceil(self.gamma * len(ranked))))
+        good = [p for p, _ in ranked[:n_good]]
+        bad = [p for p, _ in ranked[n_good:]] + list(self.pending.values())
+        return good, bad
+
+    def _sample_prior(self) -> Dict:
+        return {key: param.to_value(param.sample_prior(self.rng)) for key, param in self.params.items()}
+
+    def _propose(self) -> Dict:
+        if len(self.trials) < self.n_startup:
+            return self._sample_prior()
+
+        good, bad = self._split()
+        params = {}
+        for key, param in self.params.items():
+            # 各参数独立: 从 l(x) 采样候选，取 l(x)/g(x) 最大者
+            good_x = [param.to_internal(p[key]) for p in good]
+            bad_x = [param.to_internal(p[key]) for p in bad]
+            best_x, best_ratio = None, -math.inf
+            for _ in range(self.n_ei_candidates):
+                x = param.sample(good_x, self.rng)
+                ratio = math.log(param.density(x, good_x)) - math.log(param.density(x, bad_x))
+                if ratio > best_ratio:
+                    best_x, best_ratio = x, ratio
+            params[key] = param.to_value(best_x)
+        return params
+
+
+class ParetoFrontier:
+    """
+    多目标非支配集（所有目标越大越好），结果逐个流入时增量维护。
+
+    前沿按第一个目标降序存放: 能支配新点的只可能是第一个目标不小于它的前缀，
+    可能被新点支配的只可能是第一个目标不大于它的后缀，两侧各用 bisect 定位后只扫描该段。
+    目标向量完全相同的点只保留先到的一个。
+    """
+
+    def __init__(self, keys: List[str]):
+        self.keys = list(keys)
+        self._neg_first: List[float] = []
+        self._vectors: List[Tuple[float, ...]] = []
+        self._items: List = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def dominates(a: Tuple[float, ...], b: Tuple[float, ...]) -> bool:
+        """a 弱支配 b: 每个目标都不差"""
+        return all(x >= y for x, y in zip(a, b))
+
+    def objectives(self, summary: Dict) -> Tuple[float, ...]:
+        return tuple(float(summary[key]) for key in self.keys)
+
+    def add(self, item, summary: Dict) -> bool:
+        """加入一个结果，返回它是否进入前沿"""
+        vector = self.objectives(summary)
+        neg_first = -vector[0]
+        # 第一个目标 >= 新点的前缀中是否有点支配新点
+        for i in range(bisect.bisect_right(self._neg_first, neg_first)):
+            if self.dominates(self._vectors[i], vector):
+                return False
+        # 第一个目标 <= 新点的后缀中被新点支配的点移出前沿
+        start = bisect.bisect_left(self._neg_first, neg_first)
+        keep = [i for i in range(start, len(self._items)) if not self.dominates(vector, self._vectors[i])]
+        self._neg_first[start:] = [self._neg_first[i] for i in keep]
+        self._vectors[start:] = [self._vectors[i] for i in keep]
+        self._items[start:] = [self._items[i] for i in keep]
+
+        pos = bisect.bisect_right(self._neg_first, neg_first)
+        self._neg_first.insert(pos, neg_first)
+        self._vectors.insert(pos, vector)
+        self._items.insert(pos, item)
+        return True
+
+    def items(self) -> List:
+        """前沿上的结果，按第一个目标降序"""
+        return list(self._items)
@@ -10,6 +10,8 @@ import datetime
 import sys
 from typing import Dict, List, Optional, Tuple
 
+from bucket_stats import bootstrap_confidence_intervals
+
 # 策略参数配置
 STRATEGY_CONFIG = {
     # 买入策略参数
@@ -44,6 +46,13 @@ STRATEGY_CONFIG = {
 TARGET_USER = 'DaBPm5gSQJzkNiEnZQXkZ9dtr9df3UFWv7KGjUM5L32Y'
 target_user_count = 0  # 全局计数器
 
+# 回测统计的bootstrap置信区间: RESAMPLES>0 时按mint重采样输出胜率/平均盈利率/总盈利的区间
+BOOTSTRAP_CONFIG = {
+    'RESAMPLES': 0,
+    'CONFIDENCE': 0.95,
+    'SEED': 0,
+}
+
 
 def timestamp_to_datetime(timestamp_ms: int) -> str:
     """将时间戳转换为可读日期时间格式"""
@@ -240,6 +249,161 @@ def calc_buy_amount(now_sol: float) -> float:
     return a * math.sqrt(now_sol) + b
 
 
+def settle_exit(trade_data: List[Dict], actual_buy_index: int, buy_price: float, sell_index: int) -> Dict:
+    """按卖出信号索引计算实际卖出成交（含卖出延迟）和扣除手续费后的盈亏
+    
+    Args:
+        trade_data: 交易数据列表
+        actual_buy_index: 实际买入成交的交易索引
+        buy_price: 实际买入价格
+        sell_index: 触发卖出信号的交易索引
+    
+    Returns:
+        成交与盈亏字典
+    """
+    # 计算实际卖出时间和价格
+    sell_trigger_time = trade_data[sell_index]['tradetime']
+    actual_sell_time = sell_trigger_time + STRATEGY_CONFIG['SELL_DELAY_MS']
+    sell_price, actual_sell_index = get_price_at_time(trade_data, actual_sell_time, sell_index)
+    
+    settlement = {
+        'sell_trigger_time': sell_trigger_time,
+        'actual_sell_time': actual_sell_time,
+        'sell_price': sell_price,
+        'actual_sell_index': actual_sell_index,
+    }
+    settlement.update(calculate_exit_pnl(trade_data[actual_buy_index]['nowsol'], buy_price, sell_price))
+    return settlement
+
+
+def calculate_entry_cost(buy_nowsol: float, buy_price: float) -> Tuple[float, float, float]:
+    """买入成交: 按买入点nowsol决定买入金额，返回 (买入金额, 买入手续费, 买到的代币数量)"""
+    buy_amount_sol = calc_buy_amount(buy_nowsol)
+    buy_amount_sol = max(buy_amount_sol, 0.205)
+    buy_fee = calculate_transaction_fee(buy_amount_sol)
+    
+    # 实际买入的代币数量
+    tokens_bought = (buy_amount_sol - buy_fee) / buy_price
+    return buy_amount_sol, buy_fee, tokens_bought
+
+
+def calculate_exit_proceeds(tokens: float, sell_price: float) -> Tuple[float, float, float]:
+    """卖出成交: 返回 (卖出金额, 卖出手续费, 扣除手续费后到账的SOL)"""
+    sell_amount_sol = tokens * sell_price
+    sell_fee = calculate_transaction_fee(sell_amount_sol)
+    return sell_amount_sol, sell_fee, sell_amount_sol - sell_fee
+
+
+def calculate_exit_pnl(buy_nowsol: float, buy_price: float, sell_price: float) -> Dict:
+    """按买入点nowsol决定买入金额，计算扣除买卖手续费后的盈亏
+    
+    Args:
+        buy_nowsol: 实际买入成交交易的nowsol
+        buy_price: 实际买入价格
+        sell_price: 实际卖出价格
+    
+    Returns:
+        buy_amount_sol / buy_fee / tokens_bought / sell_amount_sol / sell_fee / profit / profit_rate
+    """
+    # 计算盈亏
+    buy_amount_sol, buy_fee, tokens_bought = calculate_entry_cost(buy_nowsol, buy_price)
+    sell_amount_sol, sell_fee, final_sol = calculate_exit_proceeds(tokens_bought, sell_price)
+    
+    # 净盈亏
+    profit = final_sol - buy_amount_sol
+    profit_rate = profit / buy_amount_sol
+    
+    return {
+        'buy_amount_sol': buy_amount_sol,
+        'buy_fee': buy_fee,
+        'tokens_bought': tokens_bought,
+        'sell_amount_sol': sell_amount_sol,
+        'sell_fee': sell_fee,
+        'profit': profit,
+        'profit_rate': profit_rate,
+    }
+
+
+def simulate_entry(mint_name: str, trade_data: List[Dict], buy_signal_index: int) -> Dict:
+    """从指定的买入信号点模拟一次完整的买入→卖出，返回交易记录
+    
+    Args:
+        mint_name: mint名称
+        trade_data: 交易数据列表
+        buy_signal_index: 触发买入信号的交易索引
+    
+    Returns:
+        交易记录字典，actual_sell_index 为下一次寻找买入信号的起点
+    """
+    # 计算实际买入时间和价格
+    buy_trigger_time = trade_data[buy_signal_index]['tradetime']
+    actual_buy_time = buy_trigger_time + STRATEGY_CONFIG['BUY_DELAY_MS']
+    buy_price, actual_buy_index = get_price_at_time(trade_data, actual_buy_time, buy_signal_index)
+    
+    # 寻找卖出信号
+    sell_index, sell_reason = find_sell_signal(trade_data, actual_buy_index, buy_price, actual_buy_time)
+    
+    # 计算实际卖出成交与盈亏
+    settlement = settle_exit(trade_data, actual_buy_index, buy_price, sell_index)
+    return build_trade_record(mint_name, trade_data, buy_signal_index, actual_buy_time, buy_price,
+                              actual_buy_index, sell_index, sell_reason, settlement)
+
+
+def build_trade_record(mint_name: str, trade_data, buy_signal_index: int, actual_buy_time: int,
+                       buy_price: float, actual_buy_index: int, sell_index: int, sell_reason: str,
+                       settlement: Dict) -> Dict:
+    """由买入/卖出成交结果组装交易记录（trade_data 只需支持按交易索引取值）"""
+    buy_trigger_time = trade_data[buy_signal_index]['tradetime']
+    sell_trigger_time = settlement['sell_trigger_time']
+    actual_sell_time = settlement['actual_sell_time']
+    actual_sell_index = settlement['actual_sell_index']
+    profit = settlement['profit']
+    
+    # 获取触发买入信号的交易快照
+    buy_trigger_snapshot = trade_data[buy_signal_index]
+    
+    # 获取实际买入交易的快照
+    actual_buy_snapshot = trade_data[actual_buy_index]
+    
+    # 获取触发卖出信号的交易快照
+    sell_trigger_snapshot = trade_data[sell_index]
+    
+    # 获取实际卖出交易的快照
+    actual_sell_snapshot = trade_data[actual_sell_index]
+    
+    return {
+        'mint_name': mint_name,
+        # 买入触发信息
+        'buy_trigger_index': buy_signal_index,
+        'buy_trigger_time': timestamp_to_datetime(buy_trigger_time),
+        'buy_trigger_snapshot': buy_trigger_snapshot,
+        # 实际买入信息
+        'actual_buy_index': actual_buy_index,
+        'actual_buy_time': timestamp_to_datetime(actual_buy_time),
+        'actual_buy_snapshot': actual_buy_snapshot,
+        'buy_price': buy_price,
+        'buy_amount_sol': settlement['buy_amount_sol'],
+        'buy_fee': settlement['buy_fee'],
+        'tokens_bought': settlement['tokens_bought'],
+        # 卖出触发信息
+        'sell_trigger_index': sell_index,
+        'sell_trigger_time': timestamp_to_datetime(sell_trigger_time),
+        'sell_trigger_snapshot': sell_trigger_snapshot,
+        # 实际卖出信息
+        'actual_sell_index': actual_sell_index,
+        'actual_sell_time': timestamp_to_datetime(actual_sell_time),
+        'actual_sell_snapshot': actual_sell_snapshot,
+        'sell_price': settlement['sell_price'],
+        'sell_amount_sol': settlement['sell_amount_sol'],
+        'sell_fee': settlement['sell_fee'],
+        'sell_reason': sell_reason,
+        # 盈亏信息
+        'profit_sol': profit,
+        'profit_rate': settlement['profit_rate'],
+        'is_profitable': profit > 0
+    }
+
+
 def backtest_mint(mint_name: str, mint_data: Dict) -> List[Dict]:
     """对单个mint进行回测"""
     trade_data =mint_data['trade_data']# filter_valid_trades(mint_data['trade_data'])
@@ -265,83 +429,10 @@ def backtest_mint(mint_name: str, mint_data: Dict) -> List[Dict]:
         buy_signal_index = find_buy_signal(trade_data, i, creation_time)
         
         if buy_signal_index is not None:
-            # 计算实际买入时间和价格
-            buy_trigger_time = trade_data[buy_signal_index]['tradetime']
-            actual_buy_time = buy_trigger_time + STRATEGY_CONFIG['BUY_DELAY_MS']
-            buy_price, actual_buy_index = get_price_at_time(trade_data, actual_buy_time, buy_signal_index)
-            
-            # 寻找卖出信号
-            sell_index, sell_reason = find_sell_signal(trade_data, actual_buy_index, buy_price, actual_buy_time)
-            
-            # 计算实际卖出时间和价格
-            sell_trigger_time = trade_data[sell_index]['tradetime']
-            actual_sell_time = sell_trigger_time + STRATEGY_CONFIG['SELL_DELAY_MS']
-            sell_price, actual_sell_index = get_price_at_time(trade_data, actual_sell_time, sell_index)
-            
-            # 计算盈亏
-            buy_amount_sol = calc_buy_amount(trade_data[actual_buy_index]['nowsol'])
-            buy_amount_sol = max(buy_amount_sol, 0.205)
-            buy_fee = calculate_transaction_fee(buy_amount_sol)
-            
-            # 实际买入的代币数量
-            tokens_bought = (buy_amount_sol - buy_fee) / buy_price
-            
-            # 卖出获得的SOL
-            sell_amount_sol = tokens_bought * sell_price
-            sell_fee = calculate_transaction_fee(sell_amount_sol)
-            final_sol = sell_amount_sol - sell_fee
-            
-            # 净盈亏
-            profit = final_sol - buy_amount_sol
-            profit_rate = profit / buy_amount_sol
-            
-            # 获取触发买入信号的交易快照
-            buy_trigger_snapshot = trade_data[buy_signal_index]
-            
-            # 获取实际买入交易的快照
-            actual_buy_snapshot = trade_data[actual_buy_index]
-            
-            # 获取触发卖出信号的交易快照
-            sell_trigger_snapshot = trade_data[sell_index]
-            
-            # 获取实际卖出交易的快照
-            actual_sell_snapshot = trade_data[actual_sell_index]
-            
-            trade_record = {
-                'mint_name': mint_name,
-                # 买入触发信息
-                'buy_trigger_index': buy_signal_index,
-                'buy_trigger_time': timestamp_to_datetime(buy_trigger_time),
-                'buy_trigger_snapshot': buy_trigger_snapshot,
-                # 实际买入信息
-                'actual_buy_index': actual_buy_index,
-                'actual_buy_time': timestamp_to_datetime(actual_buy_time),
-                'actual_buy_snapshot': actual_buy_snapshot,
-                'buy_price': buy_price,
-                'buy_amount_sol': buy_amount_sol,
-                'buy_fee': buy_fee,
-                'tokens_bought': tokens_bought,
-                # 卖出触发信息
-                'sell_trigger_index': sell_index,
-                'sell_trigger_time': timestamp_to_datetime(sell_trigger_time),
-                'sell_trigger_snapshot': sell_trigger_snapshot,
-                # 实际卖出信息
-                'actual_sell_index': actual_sell_index,
-                'actual_sell_time': timestamp_to_datetime(actual_sell_time),
-                'actual_sell_snapshot': actual_sell_snapshot,
-                'sell_price': sell_price,
-                'sell_amount_sol': sell_amount_sol,
-                'sell_fee': sell_fee,
-                'sell_reason': sell_reason,
-                # 盈亏信息
-                'profit_sol': profit,
-                'profit_rate': profit_rate,
-                'is_profitable': profit > 0
-            }
-            
+            trade_record = simulate_entry(mint_name, trade_data, buy_signal_index)
             trades.append(trade_record)
-            last_sell_index = actual_sell_index
-            i = actual_sell_index + 1
+            last_sell_index = trade_record['actual_sell_index']
+            i = last_sell_index + 1
         else:
             i += 1
     
@@ -394,6 +485,22 @@ def run_backtest(log_file_path: str = '/Users/xcold/Desktop/mint_temp.log'):
     total_profit = sum(t['profit_sol'] for t in filtered_trades)
     average_profit = total_profit / len(filtered_trades) if len(filtered_trades) > 0 else 0
     average_profit_rate = sum(t['profit_rate'] for t in filtered_trades) / len(filtered_trades) if len(filtered_trades) > 0 else 0
+
+    # 按mint聚合后重采样（与上面的统计口径一致: 盈利相关只计入过滤后的交易）
+    confidence_intervals = {}
+    if BOOTSTRAP_CONFIG['RESAMPLES'] > 0:
+        per_mint = {}
+        for t in all_trades:
+            stats = per_mint.setdefault(t['mint_name'], [0, 0, 0.0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += 1 if t['is_profitable'] else 0
+            if t['profit_rate'] <= 2.0:
+                stats[2] += t['profit_rate']
+                stats[3] += 1
+                stats[4] += t['profit_sol']
+        confidence_intervals = bootstrap_confidence_intervals(
+            [tuple(v) for v in per_mint.values()], BOOTSTRAP_CONFIG['RESAMPLES'],
+            BOOTSTRAP_CONFIG['CONFIDENCE'], BOOTSTRAP_CONFIG['SEED'])
     
     # 输出统计信息
     print("\n" + "="*60)
@@ -408,6 +515,12 @@ def run_backtest(log_file_path: str = '/Users/xcold/Desktop/mint_temp.log'):
     print(f"总盈利 (排除>100%): {total_profit:.6f} SOL")
     print(f"平均盈利 (排除>100%): {average_profit:.6f} SOL")
     print(f"平均盈利率 (排除>100%): {average_profit_rate:.2%}")
+    if confidence_intervals:
+        level = BOOTSTRAP_CONFIG['CONFIDENCE']
+        print(f"{level:.0%}置信区间 (按mint重采样{BOOTSTRAP_CONFIG['RESAMPLES']}次):")
+        print(f"  胜率: [{confidence_intervals['win_rate'][0]:.2%}, {confidence_intervals['win_rate'][1]:.2%}]")
+        print(f"  平均盈利率: [{confidence_intervals['avg_profit_rate'][0]:.2%}, {confidence_intervals['avg_profit_rate'][1]:.2%}]")
+        print(f"  总盈利: [{confidence_intervals['total_profit_sol'][0]:.6f}, {confidence_intervals['total_profit_sol'][1]:.6f}] SOL")
     print(f"\n目标用户 {TARGET_USER} 在信号后5个买单中出现次数: {target_user_count}")
     
     if len(excluded_trades) > 0:
@@ -485,6 +598,7 @@ def run_backtest(log_file_path: str = '/Users/xcold/Desktop/mint_temp.log'):
             'average_profit_sol': average_profit,  # 排除>100%后的平均盈利
             'average_profit_rate': average_profit_rate,  # 排除>100%后的平均盈利率
             'target_user_count': target_user_count,  # 目标用户出现次数
+            'confidence_intervals': confidence_intervals,  # bootstrap置信区间（未启用时为空）
         },
         'excluded_trades': excluded_trades,  # 被排除的高盈利交易
         'all_trades': all_trades  # 所有交易记录
@@ -3,6 +3,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 import pump
 import json
 from typing import Dict, List, Optional, Tuple
+from trade_features import (get_avg_trade_interval, get_buy_sell_count, get_consecutive_buy_sell_count,
+                            get_filtered_trades_sum, get_large_small_trade_ratio, get_min_price_before_buy,
+                            get_price_ratio_to_min, get_recent_trade_count, get_recent_trades_volatility,
+                            is_max_amount_in_recent_trades)
 
 STRATEGY_CONFIG = pump.STRATEGY_CONFIG
 
@@ -232,388 +236,6 @@ SELL_CONDITIONS_CONFIG = {
 }
 
 
-def is_max_amount_in_recent_trades(trade_data: List[Dict], current_index: int, current_amount: float, min_threshold: float, lookback_count: int) -> bool:
-    """
-    检查当前交易金额绝对值是否为近T单中最大
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        current_amount: 当前交易金额绝对值
-        min_threshold: 过滤掉交易金额绝对值小于此值的交易
-        lookback_count: 向前查看的交易数量
-    
-    Returns:
-        True如果当前交易金额是最大的，否则False
-    """
-    filtered_amounts = []
-    
-    # 从当前交易的前一笔开始向前遍历
-    for i in range(current_index - 1, -1, -1):
-        try:
-            amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            # 过滤掉交易金额绝对值小于阈值的交易
-            if amount >= min_threshold:
-                filtered_amounts.append(amount)
-                # 如果已经收集到足够数量的交易，停止遍历
-                if len(filtered_amounts) >= lookback_count:
-                    break
-        except (TypeError, ValueError):
-            continue
-    
-    # 如果没有有效交易，当前交易默认为最大
-    if not filtered_amounts:
-        return True
-    
-    # 检查当前交易金额是否大于所有历史交易金额
-    return current_amount > max(filtered_amounts)
-
-
-def get_filtered_trades_sum(trade_data: List[Dict], current_index: int, min_amount: float, count: int) -> Optional[float]:
-    """
-    获取过滤后的前N笔交易的金额总和
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        min_amount: 过滤掉交易金额绝对值小于此值的交易
-        count: 需要取的有效交易数量
-    
-    Returns:
-        交易金额总和，如果有效交易数量不足则返回None
-    """
-    filtered_amounts = []
-    
-    # 从当前交易的前一笔开始向前遍历
-    for i in range(current_index - 1, -1, -1):
-        try:
-            amount = float(trade_data[i].get('tradeamount', 0))
-            # 过滤掉交易金额绝对值小于阈值的交易
-            if abs(amount) >= min_amount:
-                filtered_amounts.append(amount)
-                # 如果已经收集到足够数量的交易，停止遍历
-                if len(filtered_amounts) >= count:
-                    break
-        except (TypeError, ValueError):
-            continue
-    
-    # 如果有效交易数量不足，返回None
-    if len(filtered_amounts) < count:
-        return None
-    
-    return sum(filtered_amounts)
-
-
-def calculate_volatility(values: List[float]) -> float:
-    """
-    计算波动率（变异系数 = 标准差/均值）
-    
-    Args:
-        values: 数值列表
-    
-    Returns:
-        波动率值
-    """
-    if len(values) < 2:
-        return 0.0
-    
-    mean = sum(values) / len(values)
-    if mean == 0:
-        return 0.0
-    
-    variance = sum((x - mean) ** 2 for x in values) / len(values)
-    std_dev = variance ** 0.5
-    return std_dev / abs(mean)  # 变异系数
-
-
-def get_recent_trades_volatility(trade_data: List[Dict], current_index: int, lookback_count: int, min_amount: float, volatility_type: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
-    """
-    获取近N个交易单的价格、时间和金额波动率
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        lookback_count: 向前查看的交易数量
-        min_amount: 过滤掉交易金额绝对值小于此值的交易
-        volatility_type: 波动率类型 ('price', 'time', 'amount', 'all')
-    
-    Returns:
-        (价格波动率, 时间波动率, 金额波动率) 元组，如果交易数量不足则返回 (None, None, None)
-    """
-    prices = []
-    time_intervals = []
-    amounts = []
-    
-    # 从当前交易的前一笔开始向前遍历，过滤后取N笔有效交易
-    prev_time = None
-    valid_count = 0
-    
-    for i in range(current_index - 1, -1, -1):
-        if valid_count >= lookback_count:
-            break
-        
-        try:
-            # 过滤交易金额绝对值小于阈值的交易
-            amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            if amount < min_amount:
-                continue
-            
-            valid_count += 1
-            
-            if volatility_type in ('price', 'all'):
-                price = float(trade_data[i].get('price', 0))
-                if price > 0:
-                    prices.append(price)
-            
-            if volatility_type in ('time', 'all'):
-                tradetime = float(trade_data[i].get('tradetime', 0))
-                if tradetime > 0:
-                    if prev_time is not None:
-                        # 计算时间间隔（毫秒）
-                        time_intervals.append(prev_time - tradetime)  # 因为是倒序遍历
-                    prev_time = tradetime
-            
-            if volatility_type in ('amount', 'all'):
-                amounts.append(amount)
-        except (TypeError, ValueError):
-            continue
-    
-    price_volatility = None
-    time_volatility = None
-    amount_volatility = None
-    
-    if volatility_type in ('price', 'all') and len(prices) >= 2:
-        price_volatility = calculate_volatility(prices)
-    
-    if volatility_type in ('time', 'all') and len(time_intervals) >= 2:
-        time_volatility = calculate_volatility(time_intervals)
-    
-    if volatility_type in ('amount', 'all') and len(amounts) >= 2:
-        amount_volatility = calculate_volatility(amounts)
-    
-    return price_volatility, time_volatility, amount_volatility
-
-
-def get_price_ratio_to_min(trade_data: List[Dict], current_index: int, current_price: float, lookback_count: int) -> Optional[float]:
-    """
-    获取当前价格相对于近N单最低价的涨幅百分比
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        current_price: 当前交易价格
-        lookback_count: 向前查看的交易数量
-    
-    Returns:
-        涨幅百分比 (当前价格/最低价 - 1) * 100，如果数据不足则返回None
-    """
-    prices = []
-    count = 0
-    
-    for i in range(current_index - 1, -1, -1):
-        if count >= lookback_count:
-            break
-        try:
-            price = float(trade_data[i].get('price', 0))
-            if price > 0:
-                prices.append(price)
-                count += 1
-        except (TypeError, ValueError):
-            continue
-    
-    if not prices:
-        return None
-    
-    min_price = min(prices)
-    if min_price <= 0:
-        return None
-    
-    return (current_price / min_price - 1) * 100  # 涨幅百分比
-
-
-def get_buy_sell_count(trade_data: List[Dict], current_index: int, lookback_count: int) -> Tuple[int, int]:
-    """
-    获取近N个交易单里的买单和卖单数量
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        lookback_count: 向前查看的交易数量
-    
-    Returns:
-        (买单数量, 卖单数量) 元组
-    """
-    buy_count = 0
-    sell_count = 0
-    count = 0
-    
-    for i in range(current_index - 1, -1, -1):
-        if count >= lookback_count:
-            break
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            if tradeamount > 0:
-                buy_count += 1
-            elif tradeamount < 0:
-                sell_count += 1
-            count += 1
-        except (TypeError, ValueError):
-            continue
-    
-    return buy_count, sell_count
-
-
-def get_large_small_trade_ratio(trade_data: List[Dict], current_index: int, lookback_count: int, large_threshold: float, small_threshold: float) -> Tuple[float, float]:
-    """
-    获取近N个交易单里大单和小单的占比
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        lookback_count: 向前查看的交易数量
-        large_threshold: 大单阈值(SOL)，交易金额绝对值 >= 此值视为大单
-        small_threshold: 小单阈值(SOL)，交易金额绝对值 < 此值视为小单
-    
-    Returns:
-        (大单占比, 小单占比) 元组
-    """
-    large_count = 0
-    small_count = 0
-    total_count = 0
-    
-    for i in range(current_index - 1, -1, -1):
-        if total_count >= lookback_count:
-            break
-        try:
-            abs_amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            if abs_amount >= large_threshold:
-                large_count += 1
-            if abs_amount < small_threshold:
-                small_count += 1
-            total_count += 1
-        except (TypeError, ValueError):
-            continue
-    
-    if total_count == 0:
-        return 0.0, 0.0
-    
-    return large_count / total_count, small_count / total_count
-
-
-def get_consecutive_buy_sell_count(trade_data: List[Dict], current_index: int, buy_threshold: float, sell_threshold: float) -> Tuple[int, int]:
-    """
-    获取从当前位置向前连续大额买单和卖单的数量
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        buy_threshold: 大额买单阈值(SOL)，交易金额绝对值 >= 此值
-        sell_threshold: 大额卖单阈值(SOL)，交易金额绝对值 >= 此值
-    
-    Returns:
-        (连续买单数量, 连续卖单数量) 元组
-    """
-    consecutive_buy = 0
-    consecutive_sell = 0
-    
-    # 计算连续买单数量
-    for i in range(current_index - 1, -1, -1):
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            abs_amount = abs(tradeamount)
-            # 如果是大额买单，继续计数
-            if tradeamount > 0 and abs_amount >= buy_threshold:
-                consecutive_buy += 1
-            else:
-                break  # 遇到非大额买单就停止
-        except (TypeError, ValueError):
-            break
-    
-    # 计算连续卖单数量
-    for i in range(current_index - 1, -1, -1):
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            abs_amount = abs(tradeamount)
-            # 如果是大额卖单，继续计数
-            if tradeamount < 0 and abs_amount >= sell_threshold:
-                consecutive_sell += 1
-            else:
-                break  # 遇到非大额卖单就停止
-        except (TypeError, ValueError):
-            break
-    
-    return consecutive_buy, consecutive_sell
-
-
-def get_recent_trade_count(trade_data: List[Dict], current_index: int, window_seconds: int) -> int:
-    """
-    获取近N秒内的交易单数量
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        window_seconds: 时间窗口（秒）
-    
-    Returns:
-        时间窗口内的交易单数量
-    """
-    try:
-        current_time = int(trade_data[current_index].get('tradetime', 0))
-    except (TypeError, ValueError):
-        return 0
-    
-    window_start = current_time - window_seconds * 1000  # 转换为毫秒
-    count = 0
-    
-    for i in range(current_index - 1, -1, -1):
-        try:
-            prev_time = int(trade_data[i].get('tradetime', 0))
-            if prev_time < window_start:
-                break
-            count += 1
-        except (TypeError, ValueError):
-            continue
-    
-    return count
-
-
-def get_avg_trade_interval(trade_data: List[Dict], current_index: int, lookback_count: int) -> Optional[float]:
-    """
-    获取近N单的平均交易间隔时间（毫秒）
-    
-    Args:
-        trade_data: 交易数据列表
-        current_index: 当前交易索引
-        lookback_count: 向前查看的交易数量
-    
-    Returns:
-        平均交易间隔（毫秒），如果交易数量不足则返回None
-    """
-    times = []
-    
-    # 收集当前交易和前N笔交易的时间
-    for i in range(current_index, max(current_index - lookback_count - 1, -1), -1):
-        try:
-            t = int(trade_data[i].get('tradetime', 0))
-            if t > 0:
-                times.append(t)
-        except (TypeError, ValueError):
-            continue
-    
-    if len(times) < 2:
-        return None
-    
-    # times 是从新到旧排列的，计算相邻时间差
-    intervals = []
-    for i in range(len(times) - 1):
-        intervals.append(times[i] - times[i + 1])
-    
-    if not intervals:
-        return None
-    
-    return sum(intervals) / len(intervals)
-
-
 # Debug模式统计数据收集器
 class DebugStatsCollector:
     """收集debug模式下的统计数据"""
@@ -1625,35 +1247,6 @@ def variant_find_buy_signal(trade_data: List[Dict], start_index: int, creation_t
     return start_index
 
 
-def get_min_price_before_buy(trade_data: List[Dict], buy_index: int, lookback_count: int) -> Optional[float]:
-    """
-    获取买入点之前N笔交易的最小价格
-    
-    Args:
-        trade_data: 交易数据列表
-        buy_index: 买入点索引
-        lookback_count: 向前查看的交易数量
-    
-    Returns:
-        最小价格，如果交易数量不足则返回None
-    """
-    prices = []
-    start_index = max(0, buy_index - lookback_count)
-    
-    for i in range(start_index, buy_index):
-        try:
-            price = float(trade_data[i].get('price', 0))
-            if price > 0:
-                prices.append(price)
-        except (TypeError, ValueError):
-            continue
-    
-    if not prices:
-        return None
-    
-    return min(prices)
-
-
 def variant_find_sell_signal(trade_data: List[Dict], buy_index: int, buy_price: float, buy_time: int) -> Tuple[int, str]:
     """
     寻找卖出信号
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+mint日志回放
+把mint日志中所有mint的交易按全局 tradetime 顺序（k路归并）逐笔送入流式引擎，
+测量每笔交易的决策延迟分位数与持续吞吐量，判断信号逻辑能否跟上高峰期的交易流量。
+
+回放速度 REPLAY_CONFIG['SPEED']:
+    1.0   → 实时（按交易时间间隔等待）
+    N     → N 倍速
+    None  → 不等待，尽可能快
+买入/卖出延迟 (BUY_DELAY_MS / SELL_DELAY_MS) 由引擎按回放时钟成交: 回放时间到达目标时间即成交，
+而不是等该mint的下一笔交易（见 stream_engine 的 clock_fills）。
+
+延迟口径:
+    处理延迟  → 引擎处理一笔交易的耗时
+    决策延迟  → 产生买卖决策的交易，从计划送达时刻（尽可能快模式下为取出时刻）到决策返回的耗时
+    落后时长  → 按倍速回放时实际送达比计划晚的时间，持续增长说明处理跟不上
+
+用法: python replay.py [mint_log] [速度倍数|max]
+"""
+import heapq
+import sys
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import pump
+from bucket_stats import QuantileSketch
+from stream_engine import StreamEngine
+
+REPLAY_CONFIG = {
+    'SPEED': None,  # None 为尽可能快
+    'CLOCK_FILLS': True,  # 延迟成交按回放时钟推进
+    'LATENCY_ACCURACY': 0.01,  # 延迟分位数草图的相对精度
+    'PEAK_WINDOW_MS': 1000,  # 统计日志自身峰值流量的时间窗口
+}
+
+LATENCY_PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def merge_trade_streams(mint_info: Dict) -> Iterator[Tuple[str, Dict]]:
+    """按 (tradetime, mint, 索引) 对所有mint的交易做k路归并，同一mint内保持原顺序"""
+    heap = []
+    for mint_name, mint_data in mint_info.items():
+        trade_data = mint_data.get('trade_data') or []
+        if trade_data:
+            heap.append((trade_data[0]['tradetime'], mint_name, 0, trade_data))
+    heapq.heapify(heap)
+    while heap:
+        _, mint_name, index, trade_data = heap[0]
+        yield mint_name, trade_data[index]
+        index += 1
+        if index < len(trade_data):
+            heapq.heapreplace(heap, (trade_data[index]['tradetime'], mint_name, index, trade_data))
+        else:
+            heapq.heappop(heap)
+
+
+def peak_event_rate(mint_info: Dict, window_ms: int) -> float:
+    """日志中任一 window_ms 时间窗口内的最大交易数，折算为每秒"""
+    times = sorted(trade['tradetime'] for mint_data in mint_info.values()
+                   for trade in mint_data.get('trade_data') or [])
+    peak = 0
+    left = 0
+    for right, t in enumerate(times):
+        while times[left] <= t - window_ms:
+            left += 1
+        peak = max(peak, right - left + 1)
+    return peak * 1000.0 / window_ms
+
+
+def run_replay(mint_info: Dict, speed: Optional[float] = None, engine: Optional[StreamEngine] = None,
+               replay_config: Optional[Dict] = None) -> Dict:
+    """回放整个日志，返回延迟/吞吐统计与引擎"""
+    replay_config = replay_config or REPLAY_CONFIG
+    if engine is None:
+        engine = StreamEngine(clock_fills=replay_config['CLOCK_FILLS'])
+    accuracy = replay_config['LATENCY_ACCURACY']
+    processing_us = QuantileSketch(accuracy)
+    decision_us = QuantileSketch(accuracy)
+    event_counts = {}
+    max_lag_ms = 0.0
+    count = 0
+
+    first_time = None
+    wall_start = time.perf_counter()
+    for mint_name, trade in merge_trade_streams(mint_info):
+        if first_time is None:
+            first_time = trade['tradetime']
+        due = time.perf_counter()
+        if speed:
+            due = wall_start + (trade['tradetime'] - first_time) / 1000.0 / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        started = time.perf_counter()
+        events = engine.on_trade(mint_name, trade)
+        finished = time.perf_counter()
+
+        count += 1
+        processing_us.add((finished - started) * 1e6)
+        if speed:
+            max_lag_ms = max(max_lag_ms, (started - due) * 1000.0)
+        if events:
+            decision_us.add((finished - due) * 1e6)
+            for event in events:
+                event_counts[event['type']] = event_counts.get(event['type'], 0) + 1
+
+    for event in engine.finish_all():
+        event_counts[event['type']] = event_counts.get(event['type'], 0) + 1
+    elapsed = time.perf_counter() - wall_start
+
+    return {
+        'events': count,
+        'elapsed_seconds': elapsed,
+        'events_per_second': count / elapsed if elapsed > 0 else 0.0,
+        'processing_us': processing_us,
+        'decision_us': decision_us,
+        'max_lag_ms': max_lag_ms,
+        'decision_counts': event_counts,
+        'engine': engine,
+    }
+
+
+def _format_percentiles(sketch: QuantileSketch) -> str:
+    if sketch.count == 0:
+        return "无"
+    parts = [f"p{q * 100:g}={sketch.quantile(q):.1f}" for q in LATENCY_PERCENTILES]
+    parts.append(f"max={sketch.max:.1f}")
+    return ", ".join(parts)
+
+
+def print_replay_report(stats: Dict, speed: Optional[float], peak_rate: float):
+    print("\n" + "=" * 60)
+    print("回放结果")
+    print("=" * 60)
+    print(f"回放速度: {'尽可能快' if not speed else f'{speed:g}x'}")
+    print(f"交易数: {stats['events']}, 耗时: {stats['elapsed_seconds']:.2f}秒, "
+          f"吞吐: {stats['events_per_second']:.0f} 笔/秒")
+    print(f"处理延迟(微秒): {_format_percentiles(stats['processing_us'])}")
+    print(f"决策延迟(微秒): {_format_percentiles(stats['decision_us'])}")
+    if speed:
+        print(f"最大落后: {stats['max_lag_ms']:.1f}毫秒")
+    print(f"日志峰值流量: {peak_rate:.0f} 笔/秒 ({REPLAY_CONFIG['PEAK_WINDOW_MS']}毫秒窗口)")
+    if peak_rate > 0 and not speed:
+        print(f"吞吐/峰值: {stats['events_per_second'] / peak_rate:.1f}x")
+    counts = stats['decision_counts']
+    print(f"决策: 买入信号 {counts.get('buy_signal', 0)}, 买入成交 {counts.get('buy_fill', 0)}, "
+          f"卖出信号 {counts.get('sell_signal', 0)}, 完成交易 {counts.get('trade', 0)}")
+
+
+def main():
+    log_file = sys.argv[1] if len(sys.argv) > 1 else '/Users/xcold/Desktop/mint_temp.log'
+    speed = REPLAY_CONFIG['SPEED']
+    if len(sys.argv) > 2:
+        speed = None if sys.argv[2] == 'max' else float(sys.argv[2])
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    stats = run_replay(mint_info, speed)
+    print_replay_report(stats, speed, peak_event_rate(mint_info, REPLAY_CONFIG['PEAK_WINDOW_MS']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按mint的定长交易历史环形缓冲区（实时模式）
+批量回测把每个mint的全部交易保存在列表里；实时评估只需要最近 max(回看笔数) 笔和最近 max(时间窗口) 毫秒的交易。
+TradeRingBuffer 用预分配的槽位数组按绝对交易索引存取，写满后覆盖最旧的交易，每个mint的内存与交易持续时间无关。
+
+与 trade_data 列表的接口一致: len() 为累计交易数，[i] 按绝对索引取交易（已被覆盖的索引抛 IndexError），
+first_index 为仍保留的最早索引。特征函数向前回看时以 history_start(trade_data) 为下界，列表和缓冲区都能直接传入。
+
+容量由配置自动推导（history_requirements）:
+    回看笔数 → *_LOOKBACK_COUNT / *_LOOKBACK / FILTERED_TRADES_COUNT / LOOKBACK_TRADES_FOR_MIN_PRICE / WINDOW_SIZE_* 等的最大值
+    时间窗口 → *_WINDOW_MS / *_LOOKBACK_MS / *_WINDOW_SECONDS / QUIET_PERIOD_SECONDS 的最大值
+写满时若最旧的交易仍在时间窗口内，或调用方声明仍需要它（keep_from），容量翻倍而不是覆盖；
+突发过后，超出基础容量（base_capacity）且不再需要的最旧交易随追加逐笔丢弃，时间窗口内的交易
+少于基础容量的一半时缩回基础容量（留一半余量，避免在窗口边界上反复扩缩）。
+因此容量上限取决于峰值交易速率 × 时间窗口，而不是代币存续时间，突发结束后内存回到基础容量。
+按金额过滤后计数的特征（如前N笔 >= min_amount 的交易和）可能回看超过N笔，HISTORY_SLACK 为这类特征预留余量；
+这类回看走到缓冲区起点（更早的交易已被覆盖）时调用 note_truncated(trade_data): 计入 truncated_lookbacks，
+并把该缓冲区的基础容量翻倍（不超过 MAX_CAPACITY），之后的回看能看到更多笔。
+"""
+from typing import Dict, Iterator, Optional, Tuple
+
+# 回看笔数的余量倍数（过滤后计数的特征会回看更多笔）
+HISTORY_SLACK = 3
+# 最小容量
+MIN_CAPACITY = 16
+# 过滤回看被截断时基础容量翻倍的上限
+MAX_CAPACITY = 4096
+
+COUNT_KEY_SUFFIXES = ('_LOOKBACK_COUNT', '_LOOKBACK')
+COUNT_KEYS = ('FILTERED_TRADES_COUNT', 'LOOKBACK_TRADES_FOR_MIN_PRICE', 'RETRACEMENT_INFLECTION_WINDOW')
+MS_KEY_SUFFIXES = ('_WINDOW_MS', '_LOOKBACK_MS')
+SECONDS_KEY_SUFFIXES = ('_WINDOW_SECONDS',)
+SECONDS_KEYS = ('QUIET_PERIOD_SECONDS',)
+
+
+def history_requirements(*configs: Dict) -> Tuple[int, int]:
+    """从一个或多个配置推导 (回看笔数, 时间窗口毫秒)"""
+    count = 0
+    span_ms = 0
+    for config in configs:
+        for key, value in config.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key.endswith(COUNT_KEY_SUFFIXES) or key in COUNT_KEYS or key.startswith('WINDOW_SIZE_'):
+                count = max(count, int(value))
+            elif key.endswith(MS_KEY_SUFFIXES):
+                span_ms = max(span_ms, int(value))
+            elif key.endswith(SECONDS_KEY_SUFFIXES) or key in SECONDS_KEYS:
+                span_ms = max(span_ms, int(value * 1000))
+    return count, span_ms
+
+
+def capacity_for(lookback_count: int) -> int:
+    # 当前交易本身 + 回看的笔数
+    return max(MIN_CAPACITY, lookback_count * HISTORY_SLACK + 1)
+
+
+def history_start(trade_data) -> int:
+    """trade_data 中仍可访问的最早索引（列表为0）"""
+    return getattr(trade_data, 'first_index', 0)
+
+
+def note_truncated(trade_data):
+    """过滤后计数的回看走到了 history_start 仍未凑够笔数时调用（列表从第一笔开始，不算截断）"""
+    if history_start(trade_data) > 0:
+        trade_data.truncated_lookbacks += 1
+        trade_data.widen()
+
+
+class TradeRingBuffer:
+    """定长环形缓冲区，按绝对交易索引存取"""
+
+    def __init__(self, capacity: int, span_ms: int = 0):
+        self.capacity = max(1, capacity)
+        self.base_capacity = self.capacity
+        self.span_ms = span_ms
+        self.truncated_lookbacks = 0
+        self._slots = [None] * self.capacity
+        self.first_index = 0
+        self._end = 0
+
+    @classmethod
+    def for_configs(cls, *configs: Dict) -> 'TradeRingBuffer':
+        count, span_ms = history_requirements(*configs)
+        return cls(capacity_for(count), span_ms)
+
+    def __len__(self) -> int:
+        return self._end
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += self._end
+        if index < self.first_index or index >= self._end:
+            raise IndexError(f"交易索引 {index} 不在缓冲区 [{self.first_index}, {self._end}) 内")
+        return self._slots[index % self.capacity]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(self.first_index, self._end):
+            yield self._slots[index % self.capacity]
+
+    def retained(self) -> int:
+        return self._end - self.first_index
+
+    def append(self, trade: Dict, keep_from: Optional[int] = None) -> int:
+        """追加一笔交易并返回它的索引；keep_from 之后（含）的交易不会被覆盖"""
+        now = trade['tradetime']
+        if self.capacity > self.base_capacity:
+            self._release(now, keep_from)
+        if self._end - self.first_index == self.capacity:
+            if self._needed(self.first_index, now, keep_from):
+                self._resize(self.capacity * 2)
+            else:
+                self._slots[self.first_index % self.capacity] = None
+                self.first_index += 1
+        index = self._end
+        self._slots[index % self.capacity] = trade
+        self._end += 1
+        return index
+
+    def reserve(self, capacity: int, span_ms: int = 0):
+        """把容量/时间窗口提高到至少给定值（已覆盖的交易不会恢复）"""
+        self.span_ms = max(self.span_ms, span_ms)
+        self.base_capacity = max(self.base_capacity, capacity)
+        if capacity > self.capacity:
+            self._resize(capacity)
+
+    def widen(self):
+        """基础容量翻倍（不超过 MAX_CAPACITY），用于过滤回看被截断之后"""
+        if self.base_capacity < MAX_CAPACITY:
+            self.reserve(min(self.base_capacity * 2, MAX_CAPACITY))
+
+    def _needed(self, index: int, now: int, keep_from: Optional[int]) -> bool:
+        if keep_from is not None and index >= keep_from:
+            return True
+        return bool(self.span_ms) and self._slots[index % self.capacity]['tradetime'] >= now - self.span_ms
+
+    def _release(self, now: int, keep_from: Optional[int]):
+        """丢弃超出基础容量且不再需要的最旧交易，时间窗口内的交易不到基础容量一半时缩回基础容量"""
+        while self.retained() > self.base_capacity and not self._needed(self.first_index, now, keep_from):
+            self._slots[self.first_index % self.capacity] = None
+            self.first_index += 1
+        if self.retained() > self.base_capacity:
+            return
+        probe = self._end - 1 - self.base_capacity // 2
+        if probe < self.first_index or not self._needed(probe, now, keep_from):
+            self._resize(self.base_capacity)
+
+    def _resize(self, capacity: int):
+        slots = [None] * capacity
+        for index in range(self.first_index, self._end):
+            slots[index % capacity] = self._slots[index % self.capacity]
+        self._slots = slots
+        self.capacity = capacity
+
+    def to_dict(self) -> Dict:
+        """序列化为可JSON/pickle的字典（只含仍保留的交易）"""
+        return {
+            'capacity': self.capacity,
+            'base_capacity': self.base_capacity,
+            'span_ms': self.span_ms,
+            'truncated_lookbacks': self.truncated_lookbacks,
+            'first_index': self.first_index,
+            'trades': list(self),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TradeRingBuffer':
+        buffer = cls(data['capacity'], data['span_ms'])
+        buffer.base_capacity = data.get('base_capacity', buffer.capacity)
+        buffer.truncated_lookbacks = data.get('truncated_lookbacks', 0)
+        buffer.first_index = buffer._end = data['first_index']
+        for trade in data['trades']:
+            buffer._slots[buffer._end % buffer.capacity] = trade
+            buffer._end += 1
+        return buffer
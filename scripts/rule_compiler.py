@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rule.json 编译求值器（Rust 端 rule_rust_buy_*.rs 的参考实现）
+rule.json 每条规则 = params（online条件的阈值）+ conditions（各条件的盈利分桶）。按 更新rust.md:
+    params 中 online 模式的条件全部满足 → can_buy
+    当前交易的特征落入某条件的盈利分桶 → 买入金额按命中分桶的盈利率叠加
+
+编译结果:
+    门槛（gates）: 每条规则一组 (特征, 下限, 上限, 缺失是否通过)，闭区间，与 variant_find_buy_signal 的online判断一致
+    分桶表: 每个条件一份排序后的边界数组 edges 与逐段的分桶序号表 slots，
+            特征值 v 所在段 = bisect_right(edges, v) - 1，查表即得命中的分桶（-1 为未命中）；
+            分桶为 [low, high)，名称以 ']' 结尾的（决策树规则）为 [low, high]，上界取 nextafter 转为半开区间
+    权重表: 每个分桶的 (avg_profit_rate, win_rate, count)
+单笔求值是每个条件一次 bisect；score_matrix 按列处理整张特征矩阵（回测用），结果与逐笔求值相同。
+
+买入金额（BUY_SIZING_CONFIG）:
+    每个命中分桶的权重 = max(avg_profit_rate, 0) × count / (count + PRIOR_COUNT)   （样本少的分桶打折）
+    score = Σ 权重，buy_sol = min(MAX_SOL, BASE_SOL × (1 + PROFIT_RATE_GAIN × score))
+    matched_avg_profit = 命中分桶按 count 加权的 avg_profit_rate
+    多条规则同时满足门槛时取 score 最高的一条（相同取序号小的）作为 matched_group。
+
+特征字段（与 rule1_optimize debug 记录的字段名一致）:
+    time_from_creation_minutes, nowsol, abs_amount, trade_side (买1/卖-1/0), time_diff, filtered_sum,
+    is_max_amount, price_volatility, time_volatility, amount_volatility, price_ratio,
+    buy_count, sell_count, large_trade_ratio, small_trade_ratio, consecutive_buy, consecutive_sell
+
+用法:
+    rule_set = compile_rule_json(load_raw_rule_json('rule.json'), defaults=BUY_CONDITIONS_CONFIG)
+    result = rule_set.evaluate(features)          # 单笔
+    columns = rule_set.score_matrix(feature_rows)  # 整张矩阵
+    python rule_compiler.py [rule.json]            输出编译后的边界/权重表（JSON），供 Rust 端核对
+"""
+import json
+import math
+import sys
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+INF = math.inf
+
+BUY_SIZING_CONFIG = {
+    'BASE_SOL': 0.2,  # 满足门槛但未命中分桶时的买入金额（与 rule_rust_buy_demo.rs 的默认值一致）
+    'MAX_SOL': 1.0,  # 买入金额上限
+    'PROFIT_RATE_GAIN': 10.0,  # score 每 0.01 增加 10% 买入金额
+    'PRIOR_COUNT': 100,  # 分桶样本数的收缩先验
+}
+
+# 条件名 → 特征字段（与 rule1_optimize.REFINABLE_CONDITIONS 一致）
+CONDITION_FIELDS = {
+    'TIME_DIFF': 'time_diff',
+    'MAX_AMOUNT': 'is_max_amount',
+    'PRICE_VOLATILITY': 'price_volatility',
+    'TIME_VOLATILITY': 'time_volatility',
+    'AMOUNT_VOLATILITY': 'amount_volatility',
+    'PRICE_RATIO': 'price_ratio',
+    'BUY_COUNT': 'buy_count',
+    'SELL_COUNT': 'sell_count',
+    'LARGE_TRADE_RATIO': 'large_trade_ratio',
+    'SMALL_TRADE_RATIO': 'small_trade_ratio',
+    'CONSECUTIVE_BUY': 'consecutive_buy',
+    'CONSECUTIVE_SELL': 'consecutive_sell',
+}
+
+# 可选条件的 online 判断: 条件名 → (模式key, 类型, 阈值key)，语义同 rule1_optimize.passes_online_condition
+ONLINE_GATES = {
+    'TIME_DIFF': ('TIME_DIFF_CHECK_MODE', 'range', 'TIME_DIFF_FROM_LAST_TRADE_RANGE'),
+    'MAX_AMOUNT': ('MAX_AMOUNT_CHECK_MODE', 'flag', None),
+    'PRICE_VOLATILITY': ('PRICE_VOLATILITY_CHECK_MODE', 'range', 'PRICE_VOLATILITY_RANGE'),
+    'TIME_VOLATILITY': ('TIME_VOLATILITY_CHECK_MODE', 'range', 'TIME_VOLATILITY_RANGE'),
+    'AMOUNT_VOLATILITY': ('AMOUNT_VOLATILITY_CHECK_MODE', 'range', 'AMOUNT_VOLATILITY_RANGE'),
+    'PRICE_RATIO': ('PRICE_RATIO_CHECK_MODE', 'range', 'PRICE_RATIO_RANGE'),
+    'BUY_COUNT': ('BUY_COUNT_CHECK_MODE', 'min', 'BUY_COUNT_MIN'),
+    'SELL_COUNT': ('SELL_COUNT_CHECK_MODE', 'min', 'SELL_COUNT_MIN'),
+    'LARGE_TRADE_RATIO': ('LARGE_TRADE_RATIO_CHECK_MODE', 'range', 'LARGE_TRADE_RATIO_RANGE'),
+    'SMALL_TRADE_RATIO': ('SMALL_TRADE_RATIO_CHECK_MODE', 'range', 'SMALL_TRADE_RATIO_RANGE'),
+    'CONSECUTIVE_BUY': ('CONSECUTIVE_BUY_CHECK_MODE', 'min', 'CONSECUTIVE_BUY_MIN'),
+    'CONSECUTIVE_SELL': ('CONSECUTIVE_SELL_CHECK_MODE', 'max', 'CONSECUTIVE_SELL_MAX'),
+}
+
+# 数据不足（特征为 None）时不过滤的条件
+MISSING_PASSES = ('PRICE_RATIO',)
+
+# 门槛: (特征字段, 下限, 上限, 缺失是否通过)
+Gate = Tuple[str, float, float, bool]
+
+
+def _range(params: Dict, key: str) -> Tuple[float, float]:
+    if key not in params:
+        raise ValueError(f"缺少阈值 {key}")
+    low, high = params[key]
+    return float(low), float(high)
+
+
+def compile_gates(params: Dict) -> Tuple[Gate, ...]:
+    """把一条规则的 params 编译为门槛列表（顺序同 variant_find_buy_signal 的条件顺序）"""
+    gates = [('time_from_creation_minutes', float(params['TIME_FROM_CREATION_MINUTES']), INF, False)]
+    gates.append(('nowsol',) + _range(params, 'NOWSOL_RANGE') + (False,))
+    gates.append(('abs_amount',) + _range(params, 'TRADE_AMOUNT_RANGE') + (False,))
+    # 时间差需要前一笔交易，缺失时即使非online也不通过
+    gates.append(('time_diff', -INF, INF, False))
+    gates.append(('filtered_sum',) + _range(params, 'FILTERED_TRADES_SUM_RANGE') + (False,))
+    trade_type = params.get('TRADE_TYPE')
+    if trade_type == 'buy':
+        gates.append(('trade_side', 1.0, 1.0, False))
+    elif trade_type == 'sell':
+        gates.append(('trade_side', -1.0, -1.0, False))
+    for cond_name, (mode_key, kind, threshold_key) in ONLINE_GATES.items():
+        if params.get(mode_key) != 'online':
+            continue
+        field = CONDITION_FIELDS[cond_name]
+        missing_ok = cond_name in MISSING_PASSES
+        if cond_name == 'TIME_DIFF':
+            gates[3] = (field,) + _range(params, threshold_key) + (False,)
+        elif kind == 'flag':
+            gates.append((field, 1.0, 1.0, False))
+        elif kind == 'range':
+            gates.append((field,) + _range(params, threshold_key) + (missing_ok,))
+        elif kind == 'min':
+            gates.append((field, float(params[threshold_key]), INF, missing_ok))
+        else:
+            gates.append((field, -INF, float(params[threshold_key]), missing_ok))
+    return tuple(gates)
+
+
+def passes_gates(gates: Sequence[Gate], features: Dict) -> bool:
+    for field, low, high, missing_ok in gates:
+        value = features.get(field)
+        if value is None:
+            if not missing_ok:
+                return False
+        elif not low <= value <= high:
+            return False
+    return True
+
+
+def bucket_bounds(bucket: Dict) -> Tuple[float, float]:
+    """分桶的半开区间 [low, high)；名称以 ']' 结尾的闭区间把上界移到下一个浮点数"""
+    low, high = float(bucket['low']), float(bucket['high'])
+    if str(bucket.get('name', '')).rstrip().endswith(']'):
+        high = math.nextafter(high, INF)
+    return low, high
+
+
+class CompiledCondition:
+    """一个条件的分桶查找表"""
+
+    def __init__(self, condition: str, buckets: List[Dict]):
+        self.condition = condition
+        self.field = CONDITION_FIELDS.get(condition, condition.lower())
+        self.buckets = [{'name': b.get('name', f"[{b['low']}, {b['high']})"),
+                         'avg_profit_rate': float(b.get('avg_profit_rate', 0.0)),
+                         'win_rate': float(b.get('win_rate', 0.0)),
+                         'count': int(b.get('count', 0))} for b in buckets]
+        bounds = [bucket_bounds(b) for b in buckets]
+        self.edges = tuple(sorted({edge for pair in bounds for edge in pair}))
+        # 段 i = [edges[i], edges[i+1])；重叠的分桶取序号小的
+        slots = [-1] * max(len(self.edges) - 1, 0)
+        for slot in range(len(slots)):
+            left = self.edges[slot]
+            for bucket_index, (low, high) in enumerate(bounds):
+                if low <= left < high:
+                    slots[slot] = bucket_index
+                    break
+        self.slots = tuple(slots)
+
+    def lookup(self, value) -> int:
+        """特征值命中的分桶序号，未命中或缺失为 -1"""
+        if value is None:
+            return -1
+        slot = bisect_right(self.edges, value) - 1
+        if slot < 0 or slot >= len(self.slots):
+            return -1
+        return self.slots[slot]
+
+    def to_dict(self) -> Dict:
+        return {'condition': self.condition, 'field': self.field, 'edges': list(self.edges),
+                'slots': list(self.slots), 'buckets': self.buckets}
+
+
+class CompiledRule:
+    def __init__(self, index: int, params: Dict, conditions: List[Dict], defaults: Optional[Dict] = None):
+        self.index = index
+        self.params = params
+        merged = dict(defaults or {}, **params)
+        self.gates = compile_gates(merged)
+        self.conditions = tuple(CompiledCondition(c['condition'], c.get('buckets', [])) for c in conditions)
+
+    def passes(self, features: Dict) -> bool:
+        return passes_gates(self.gates, features)
+
+    def match(self, features: Dict) -> List[Tuple[CompiledCondition, int]]:
+        """命中的 (条件, 分桶序号) 列表"""
+        matched = []
+        for cond in self.conditions:
+            bucket_index = cond.lookup(features.get(cond.field))
+            if bucket_index >= 0:
+                matched.append((cond, bucket_index))
+        return matched
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """规则用到的全部特征字段"""
+        names = [gate[0] for gate in self.gates] + [cond.field for cond in self.conditions]
+        return tuple(dict.fromkeys(names))
+
+    def to_dict(self) -> Dict:
+        return {'index': self.index,
+                'gates': [[field, _json_number(low), _json_number(high), missing_ok]
+                          for field, low, high, missing_ok in self.gates],
+                'conditions': [cond.to_dict() for cond in self.conditions]}
+
+
+def _json_number(value: float):
+    # JSON 没有 Infinity，开放端写为 null
+    return None if math.isinf(value) else value
+
+
+def size_buy(matched: List[Tuple[CompiledCondition, int]], sizing: Dict) -> Tuple[float, Optional[float], float]:
+    """命中分桶 → (score, matched_avg_profit, buy_sol)"""
+    score = 0.0
+    weighted = 0.0
+    total = 0
+    for cond, bucket_index in matched:
+        bucket = cond.buckets[bucket_index]
+        count = bucket['count']
+        score += max(bucket['avg_profit_rate'], 0.0) * count / (count + sizing['PRIOR_COUNT'])
+        weighted += bucket['avg_profit_rate'] * count
+        total += count
+    avg_profit = weighted / total if total else None
+    buy_sol = min(sizing['MAX_SOL'], sizing['BASE_SOL'] * (1 + sizing['PROFIT_RATE_GAIN'] * score))
+    return score, avg_profit, buy_sol
+
+
+NO_BUY = {'can_buy': False, 'matched_group': None, 'matched_avg_profit': None, 'score': 0.0,
+          'buy_sol': 0.0, 'matched_buckets': ()}
+
+
+class CompiledRuleSet:
+    """rule.json 全部规则的编译结果"""
+
+    def __init__(self, rules: Sequence[CompiledRule], sizing: Optional[Dict] = None):
+        self.rules = tuple(rules)
+        self.sizing = dict(sizing or BUY_SIZING_CONFIG)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate_rule(self, rule: CompiledRule, features: Dict) -> Dict:
+        if not rule.passes(features):
+            return NO_BUY
+        matched = rule.match(features)
+        score, avg_profit, buy_sol = size_buy(matched, self.sizing)
+        return {'can_buy': True, 'matched_group': rule.index, 'matched_avg_profit': avg_profit, 'score': score,
+                'buy_sol': buy_sol,
+                'matched_buckets': tuple((cond.condition, cond.buckets[i]['name']) for cond, i in matched)}
+
+    def evaluate(self, features, rules: Optional[Sequence[int]] = None) -> Dict:
+        """单笔求值；features 为特征dict，或按规则序号排列的特征dict列表（各规则的特征参数不同时）"""
+        best = NO_BUY
+        for rule in self.rules if rules is None else (self.rules[i] for i in rules):
+            rule_features = features[rule.index] if isinstance(features, list) else features
+            result = self.evaluate_rule(rule, rule_features)
+            if result['can_buy'] and (not best['can_buy'] or result['score'] > best['score']):
+                best = result
+        return best
+
+    def score_matrix(self, matrix) -> Dict[str, List]:
+        """按列对整张特征矩阵求值，返回 {can_buy, matched_group, matched_avg_profit, score, buy_sol} 各一列
+
+        matrix 为特征dict的列表，或 {特征字段: 列} 的列字典。每条规则先逐个门槛筛出仍满足的行号，
+        分桶只在通过门槛的行上查找，结果与逐行 evaluate 相同。
+        """
+        if isinstance(matrix, dict):
+            columns = matrix
+            n = len(next(iter(matrix.values()))) if matrix else 0
+        else:
+            columns = {}
+            n = len(matrix)
+
+        def column(field: str) -> list:
+            if field not in columns:
+                columns[field] = [None] * n if isinstance(matrix, dict) else [row.get(field) for row in matrix]
+            return columns[field]
+
+        best_group = [None] * n
+        best_score = [0.0] * n
+        best_avg = [None] * n
+        best_sol = [0.0] * n
+        sizing = self.sizing
+        prior = sizing['PRIOR_COUNT']
+        for rule in self.rules:
+            active = range(n)
+            for field, low, high, missing_ok in rule.gates:
+                values = column(field)
+                active = [i for i in active
+                          if (missing_ok if values[i] is None else low <= values[i] <= high)]
+                if not active:
+                    break
+            if not active:
+                continue
+            score = dict.fromkeys(active, 0.0)
+            weighted = dict.fromkeys(active, 0.0)
+            total = dict.fromkeys(active, 0)
+            for cond in rule.conditions:
+                # 每个分桶的 (权重, 盈利率×命中数, 命中数)，按分桶序号查表
+                table = [(max(b['avg_profit_rate'], 0.0) * b['count'] / (b['count'] + prior),
+                          b['avg_profit_rate'] * b['count'], b['count']) for b in cond.buckets]
+                values = column(cond.field)
+                for i in active:
+                    hit = cond.lookup(values[i])
+                    if hit >= 0:
+                        w, p, c = table[hit]
+                        score[i] += w
+                        weighted[i] += p
+                        total[i] += c
+            for i in active:
+                if best_group[i] is None or score[i] > best_score[i]:
+                    best_group[i] = rule.index
+                    best_score[i] = score[i]
+                    best_avg[i] = weighted[i] / total[i] if total[i] else None
+                    best_sol[i] = min(sizing['MAX_SOL'], sizing['BASE_SOL'] * (1 + sizing['PROFIT_RATE_GAIN'] * score[i]))
+        return {
+            'can_buy': [group is not None for group in best_group],
+            'matched_group': best_group,
+            'matched_avg_profit': best_avg,
+            'score': best_score,
+            'buy_sol': best_sol,
+        }
+
+    def to_dict(self) -> Dict:
+        return {'sizing': self.sizing, 'rules': [rule.to_dict() for rule in self.rules]}
+
+
+def compile_rule_json(rules: List[Dict], defaults: Optional[Dict] = None, sizing: Optional[Dict] = None,
+                      yield_fn: Callable = lambda: None) -> CompiledRuleSet:
+    """编译 rule.json 条目列表；defaults 为 params 中缺失键的默认值（如 rule1 的 BUY_CONDITIONS_CONFIG）"""
+    compiled = []
+    for index, entry in enumerate(rules):
+        try:
+            compiled.append(CompiledRule(index, entry['params'], entry.get('conditions', []), defaults))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"rule.json 第{index + 1}条编译失败: {e}") from e
+        yield_fn()
+    return CompiledRuleSet(compiled, sizing)
+
+
+def make_compile_fn(defaults: Optional[Dict] = None, sizing: Optional[Dict] = None) -> Callable:
+    """生成 rule_reload.RuleReloader 的 compile_fn"""
+    return lambda rules, yield_fn: compile_rule_json(rules, defaults, sizing, yield_fn)
+
+
+def main():
+    from rule_reload import RELOAD_CONFIG, read_rule_file, validate_rule_json
+    rule_path = sys.argv[1] if len(sys.argv) > 1 else RELOAD_CONFIG['RULE_PATH']
+    rule_set = compile_rule_json(validate_rule_json(read_rule_file(rule_path)))
+    json.dump(rule_set.to_dict(), sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
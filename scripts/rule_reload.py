@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rule.json / sell_rules.json 热更新
+实时模式下 rule.json（rule1_optimize Step5 产出）和 sell_rules.json 一天更新多次，引擎不重启即可换用新规则。
+
+流程:
+    监视线程按 POLL_INTERVAL 检查两个文件的 (mtime_ns, size)，有变化时在线程内
+    读取 → 校验 → 编译，得到不可变的 RuleBook 后把引用赋给 reloader.published（一次赋值，原子）。
+    引擎在两笔事件之间比较 published 与当前 rule_book，不同就换用新规则，
+    各mint的窗口/持仓等状态不受影响；之后的买入候选按 buy_rules 的门槛判断，新开的持仓按 sell_config 卖出
+    （见 stream_engine.StreamEngine）。sell_rules.json 须给出 REQUIRED_SELL_CONDITIONS 中的字段。
+    文件内容不合法（JSON错误、字段缺失、区间颠倒等）时保留旧规则，错误记在 last_error。
+    文件写到一半时可能读到不完整的内容，校验失败后等下一次变化（写完时 mtime/size 会再变）。
+
+停顿:
+    引擎侧的切换是一次引用比较，加上把各条规则登记到特征登记表（与规则条数成正比）。监视线程与事件处理共享GIL，
+    读取、校验、编译都分成小步，每步之间 time.sleep(0) 让出GIL，事件处理最多等一步的时间；
+    最长的一步是 json.loads（一次C调用，耗时与文件大小成正比，当前约40KB的 rule.json 约0.5毫秒）。
+
+用法:
+    reloader = RuleReloader(rule_path, sell_rule_path)
+    reloader.load_now()        # 启动时同步加载一次，失败抛 ValueError
+    reloader.start()
+    engine = StreamEngine(rule_reloader=reloader)
+    ...
+    reloader.stop()
+"""
+import json
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from rule_compiler import make_compile_fn
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RELOAD_CONFIG = {
+    'RULE_PATH': os.path.join(BASE_DIR, '..', 'rule.json'),
+    'SELL_RULE_PATH': os.path.join(BASE_DIR, 'rules', 'sell_rules.json'),
+    'POLL_INTERVAL': 1.0,  # 文件检查间隔(秒)
+}
+
+CHECK_MODES = ('online', 'debug', 'off')
+COMMENT_LINE_RE = re.compile(r'^[ \t]*//.*$', re.MULTILINE)
+
+# sell_rules.json 的 sell_conditions 键（小写）对应 rule1 SELL_CONDITIONS_CONFIG 的键（大写）
+SELL_CONDITION_TYPES = {
+    'MAX_NOWSOL_SELL': (int, float),
+    'LOSS_PERCENTAGE': (int, float),
+    'PROFIT_RATE_SELL_ENABLED': (bool,),
+    'PROFIT_RATE_SELL_THRESHOLD': (int, float, type(None)),
+    'LOOKBACK_TRADES_FOR_MIN_PRICE': (int,),
+    'RETRACEMENT_LOW_PROFIT': (int, float),
+    'RETRACEMENT_HIGH_PROFIT': (int, float),
+    'HIGH_PROFIT_THRESHOLD': (int, float),
+    'RETRACEMENT_MIN_COUNT': (int,),
+    'MAX_HOLD_TIME_SECONDS': (int, float),
+    'QUIET_PERIOD_ENABLED': (bool,),
+    'QUIET_PERIOD_SECONDS': (int, float),
+    'QUIET_PERIOD_MIN_AMOUNT': (int, float),
+    'SPIKE_SELL_ENABLED': (bool,),
+    'SPIKE_LOOKBACK_MS': (int,),
+    'SPIKE_THRESHOLD_PCT': (int, float),
+}
+
+
+# 卖出规则必须给出的字段（其余字段缺省时按 variant_find_sell_signal 的默认值）
+REQUIRED_SELL_CONDITIONS = ('MAX_NOWSOL_SELL', 'LOSS_PERCENTAGE', 'LOOKBACK_TRADES_FOR_MIN_PRICE',
+                            'RETRACEMENT_LOW_PROFIT', 'RETRACEMENT_HIGH_PROFIT', 'HIGH_PROFIT_THRESHOLD',
+                            'MAX_HOLD_TIME_SECONDS', 'QUIET_PERIOD_ENABLED', 'QUIET_PERIOD_SECONDS',
+                            'QUIET_PERIOD_MIN_AMOUNT')
+
+
+class RuleBook(NamedTuple):
+    """一次加载的全部规则，创建后不再修改"""
+    version: int
+    buy_rules: object  # compile_fn 的结果（默认为 rule_compiler.CompiledRuleSet）
+    sell_config: MappingProxyType  # 大写键，只读
+    sources: Tuple  # ((路径, mtime_ns, size), ...)
+    loaded_at: float
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_rule_entry(entry, position: int) -> Dict:
+    """校验 rule.json 的一个条目 {params, conditions}，不合法抛 ValueError"""
+    where = f"rule.json 第{position + 1}条"
+    if not isinstance(entry, dict) or not isinstance(entry.get('params'), dict):
+        raise ValueError(f"{where}: 缺少 params")
+    for key, value in entry['params'].items():
+        if key.endswith('_RANGE'):
+            if (not isinstance(value, (list, tuple)) or len(value) != 2
+                    or not all(_is_number(v) for v in value) or value[0] > value[1]):
+                raise ValueError(f"{where}: {key} 应为 [下限, 上限]，实际 {value!r}")
+        elif key.endswith('_CHECK_MODE') and value not in CHECK_MODES:
+            raise ValueError(f"{where}: {key} 应为 {'/'.join(CHECK_MODES)}，实际 {value!r}")
+    conditions = entry.get('conditions', [])
+    if not isinstance(conditions, list):
+        raise ValueError(f"{where}: conditions 应为列表")
+    for cond in conditions:
+        if not isinstance(cond, dict) or not isinstance(cond.get('condition'), str):
+            raise ValueError(f"{where}: 条件缺少 condition 名称")
+        buckets = cond.get('buckets')
+        if not isinstance(buckets, list):
+            raise ValueError(f"{where}: {cond['condition']} 缺少 buckets")
+        for bucket in buckets:
+            if (not isinstance(bucket, dict) or not _is_number(bucket.get('low'))
+                    or not _is_number(bucket.get('high')) or bucket['low'] > bucket['high']):
+                raise ValueError(f"{where}: {cond['condition']} 的区间不合法 {bucket!r}")
+            if not _is_number(bucket.get('avg_profit_rate', 0.0)):
+                raise ValueError(f"{where}: {cond['condition']} 的 avg_profit_rate 不是数值")
+    return entry
+
+
+def validate_rule_json(rules, yield_fn: Callable = lambda: None) -> List[Dict]:
+    """校验 rule.json 整体（条目列表），不合法抛 ValueError"""
+    if not isinstance(rules, list):
+        raise ValueError("rule.json 顶层应为列表")
+    validated = []
+    for i, entry in enumerate(rules):
+        validated.append(validate_rule_entry(entry, i))
+        yield_fn()
+    return validated
+
+
+def validate_sell_rules(data) -> Dict:
+    """校验 sell_rules.json，返回大写键的卖出配置；未知键或类型不符抛 ValueError"""
+    if not isinstance(data, dict) or not isinstance(data.get('sell_conditions'), dict):
+        raise ValueError("sell_rules.json 缺少 sell_conditions")
+    sell_config = {}
+    for key, value in data['sell_conditions'].items():
+        upper = key.upper()
+        types = SELL_CONDITION_TYPES.get(upper)
+        if types is None:
+            raise ValueError(f"sell_rules.json: 未知字段 {key}")
+        # bool 是 int 的子类，数值字段不接受 true/false
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            raise ValueError(f"sell_rules.json: {key} 类型不符，实际 {value!r}")
+        if _is_number(value) and value < 0:
+            raise ValueError(f"sell_rules.json: {key} 不能为负数")
+        sell_config[upper] = value
+    missing = [key.lower() for key in REQUIRED_SELL_CONDITIONS if key not in sell_config]
+    if missing:
+        raise ValueError(f"sell_rules.json: 缺少字段 {', '.join(missing)}")
+    return sell_config
+
+
+def read_rule_file(path: str, yield_fn: Callable = lambda: None):
+    """与 normalize_rule_json.load_raw_rule_json 相同的预处理（去掉 // 注释行，Infinity 换成 1e9），分步执行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    yield_fn()
+    if '//' in text:
+        text = COMMENT_LINE_RE.sub('', text)
+        yield_fn()
+    text = text.replace('Infinity', '1e9')
+    yield_fn()
+    return json.loads(text)
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class RuleReloader:
+    """监视 rule.json 与 sell_rules.json，变化时在后台线程加载，新的 RuleBook 发布到 published
+
+    compile_fn(rules, yield_fn) 把校验后的 rule.json 条目列表编译为求值结构，
+    编译过程中应在条目之间调用 yield_fn() 让出GIL。默认为 rule_compiler.compile_rule_json。
+    """
+
+    def __init__(self, rule_path: Optional[str] = None, sell_rule_path: Optional[str] = None,
+                 poll_interval: Optional[float] = None, compile_fn: Optional[Callable] = None):
+        self.rule_path = rule_path or RELOAD_CONFIG['RULE_PATH']
+        self.sell_rule_path = sell_rule_path or RELOAD_CONFIG['SELL_RULE_PATH']
+        self.poll_interval = RELOAD_CONFIG['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.compile_fn = compile_fn or make_compile_fn()
+        # 最新一次成功加载的规则；只由加载方赋值，引擎只读
+        self.published: Optional[RuleBook] = None
+        self.last_error: Optional[str] = None
+        self.stats = {'loads': 0, 'failures': 0, 'last_load_ms': 0.0}
+        self._signatures = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _signatures_now(self) -> Tuple:
+        return _file_signature(self.rule_path), _file_signature(self.sell_rule_path)
+
+    def _build(self, signatures: Tuple) -> RuleBook:
+        yield_fn = lambda: time.sleep(0)
+        rules = validate_rule_json(read_rule_file(self.rule_path, yield_fn), yield_fn)
+        sell_config = validate_sell_rules(read_rule_file(self.sell_rule_path, yield_fn))
+        yield_fn()
+        buy_rules = self.compile_fn(rules, yield_fn)
+        version = self.published.version + 1 if self.published is not None else 1
+        sources = tuple((path, *(sig or (None, None)))
+                        for path, sig in zip((self.rule_path, self.sell_rule_path), signatures))
+        return RuleBook(version, buy_rules, MappingProxyType(sell_config), sources, time.time())
+
+    def check(self) -> bool:
+        """文件有变化时加载一次，成功发布新 RuleBook 返回 True；失败保留旧规则"""
+        signatures = self._signatures_now()
+        if signatures == self._signatures:
+            return False
+        self._signatures = signatures
+        started = time.perf_counter()
+        try:
+            book = self._build(signatures)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.stats['failures'] += 1
+            return False
+        self.stats['last_load_ms'] = (time.perf_counter() - started) * 1000
+        self.stats['loads'] += 1
+        self.last_error = None
+        self.published = book
+        return True
+
+    def load_now(self) -> RuleBook:
+        """同步加载（启动时用），失败抛 ValueError"""
+        self._signatures = None
+        if not self.check():
+            raise ValueError(f"规则加载失败: {self.last_error}")
+        return self.published
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='rule-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+决策树规则归纳
+在候选特征矩阵 [(特征dict, profit_rate, is_profitable), ...] 上拟合浅层回归树（目标为 profit_rate），
+每个节点对应若干特征区间的合取；命中数足够的节点即为候选规则，按平均盈利率排序输出。
+
+分裂: 每个特征把节点内记录按特征值排序一次，用 (Σy, Σy²) 前缀和在 O(n) 内扫描所有切分点，
+取平方误差下降最多的切分。切分只落在两个相邻的不同取值之间，左子节点上界与右子节点下界都取实际出现的值，
+与online条件的闭区间判断一致。特征值为 None 的记录不满足该特征上的任何区间，切分后不进入任一子节点。
+
+特征类型 (kind):
+    'range' → 区间两端都可收紧
+    'min'   → 只能有下界 (value >= MIN)，产生上界的子节点不可导出为规则、也不再分裂
+    'max'   → 只能有上界 (value <= MAX)，同理
+纯Python实现，不依赖numpy。
+"""
+from typing import Dict, List, Tuple
+
+# 规则行: (特征dict, profit_rate, is_profitable)
+Row = Tuple[Dict, float, bool]
+
+
+def _sse(total: float, total_sq: float, n: int) -> float:
+    return total_sq - total * total / n if n else 0.0
+
+
+def _stats(rows: List[Row]) -> Dict:
+    count = len(rows)
+    wins = sum(1 for row in rows if row[2])
+    return {
+        'count': count,
+        'profitable': wins,
+        'win_rate': wins / count if count else 0.0,
+        'avg_profit_rate': sum(row[1] for row in rows) / count if count else 0.0,
+    }
+
+
+def _best_split(rows: List[Row], feature_kinds: Dict[str, str], min_leaf: int):
+    """返回 (增益, 特征, 左上界, 右下界) 或 None"""
+    n = len(rows)
+    parent_sum = sum(row[1] for row in rows)
+    parent_sq = sum(row[1] * row[1] for row in rows)
+    parent_sse = _sse(parent_sum, parent_sq, n)
+    best = None
+    for field in feature_kinds:
+        present = sorted((row[0][field], row[1]) for row in rows if row[0].get(field) is not None)
+        m = len(present)
+        if m < 2 * min_leaf:
+            continue
+        # 缺失该特征的记录单独成组
+        missing_sum = parent_sum - sum(y for _, y in present)
+        missing_sq = parent_sq - sum(y * y for _, y in present)
+        missing_sse = _sse(missing_sum, missing_sq, n - m)
+        right_sum = parent_sum - missing_sum
+        right_sq = parent_sq - missing_sq
+        left_sum = left_sq = 0.0
+        for k in range(m - 1):
+            x, y = present[k]
+            left_sum += y
+            left_sq += y * y
+            right_sum -= y
+            right_sq -= y * y
+            left_n = k + 1
+            if left_n < min_leaf or m - left_n < min_leaf or x == present[k + 1][0]:
+                continue
+            gain = parent_sse - missing_sse - _sse(left_sum, left_sq, left_n) - _sse(right_sum, right_sq, m - left_n)
+            if best is None or gain > best[0]:
+                best = (gain, field, x, present[k + 1][0])
+    return best
+
+
+def fit_rule_tree(rows: List[Row], feature_kinds: Dict[str, str], min_hits: int = 300,
+                  max_depth: int = 3, min_win_rate: float = 0.0) -> List[Dict]:
+    """拟合回归树并返回满足约束的规则，按 (平均盈利率, 命中数) 降序
+
+    每条规则: {'bounds': {特征: (下界或None, 上界或None)}, 'depth', 'count', 'profitable', 'win_rate', 'avg_profit_rate'}
+    根节点（无任何条件）不作为规则输出。
+    """
+    rules = []
+    stack = [(rows, {}, 0)]
+    while stack:
+        node_rows, bounds, depth = stack.pop()
+        if depth > 0:
+            stats = _stats(node_rows)
+            if stats['count'] >= min_hits and stats['win_rate'] >= min_win_rate:
+                rules.append(dict(stats, bounds=dict(bounds), depth=depth))
+        if depth >= max_depth or len(node_rows) < 2 * min_hits:
+            continue
+        split = _best_split(node_rows, feature_kinds, min_hits)
+        if split is None or split[0] <= 0:
+            continue
+        _, field, left_high, right_low = split
+        kind = feature_kinds[field]
+        low, high = bounds.get(field, (None, None))
+        left = [row for row in node_rows if row[0].get(field) is not None and row[0][field] <= left_high]
+        right = [row for row in node_rows if row[0].get(field) is not None and row[0][field] >= right_low]
+        if kind != 'min':
+            stack.append((left, dict(bounds, **{field: (low, left_high)}), depth + 1))
+        if kind != 'max':
+            stack.append((right, dict(bounds, **{field: (right_low, high)}), depth + 1))
+    rules.sort(key=lambda rule: (rule['avg_profit_rate'], rule['count']), reverse=True)
+    return rules
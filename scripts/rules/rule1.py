@@ -2,6 +2,7 @@ import sys, os, time
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 import pump
 import json
+from bucket_stats import BucketHistogram, ExactSum
 from typing import Dict, List, Optional, Tuple
 
 STRATEGY_CONFIG = pump.STRATEGY_CONFIG
@@ -477,7 +478,27 @@ def get_consecutive_buy_sell_count(trade_data: List[Dict], current_index: int, b
 
 # Debug模式统计数据收集器
 class DebugStatsCollector:
-    """收集debug模式下的统计数据"""
+    """收集debug模式下的统计数据
+
+    分桶统计由 BucketHistogram 在每条交易记录上单遍累加（命中数、盈利数、盈利率之和），
+    不保留原始值列表。record_*_check 登记当前交易的debug值，record_trade_result 补充盈亏后一次性入桶。
+    支持 to_dict/from_dict 序列化和 merge 合并，多个分片的统计归约后与顺序执行完全一致。
+    """
+    
+    # debug字段名 -> 分桶边界配置key
+    HISTOGRAM_BUCKETS_KEYS = {
+        'time_diff': 'TIME_DIFF_BUCKETS',
+        'price_volatility': 'PRICE_VOLATILITY_BUCKETS',
+        'time_volatility': 'TIME_VOLATILITY_BUCKETS',
+        'amount_volatility': 'AMOUNT_VOLATILITY_BUCKETS',
+        'price_ratio': 'PRICE_RATIO_BUCKETS',
+        'buy_count': 'BUY_COUNT_BUCKETS',
+        'sell_count': 'SELL_COUNT_BUCKETS',
+        'large_trade_ratio': 'LARGE_TRADE_RATIO_BUCKETS',
+        'small_trade_ratio': 'SMALL_TRADE_RATIO_BUCKETS',
+        'consecutive_buy': 'CONSECUTIVE_BUY_BUCKETS',
+        'consecutive_sell': 'CONSECUTIVE_SELL_BUCKETS',
+    }
     
     def __init__(self):
         self.reset()
@@ -485,12 +506,7 @@ class DebugStatsCollector:
     def reset(self):
         """重置统计数据"""
         # 条件4: 时间差检查统计
-        self.time_diff_stats = {
-            'total': 0,
-            'time_diff_values': [],  # 所有时间差值
-            'profitable_time_diff_values': [],  # 盈利交易的时间差值
-            'profit_rates_by_time_diff': {},  # 按时间差分桶记录盈利率 {bucket_name: [profit_rate, ...]}
-        }
+        self.time_diff_stats = {'total': 0}
         
         # 条件7: 最大金额检查统计
         self.max_amount_stats = {
@@ -499,75 +515,46 @@ class DebugStatsCollector:
             'not_max': 0,
             'profitable_is_max': 0,
             'profitable_not_max': 0,
-            'profit_rates_is_max': [],  # 是最大金额的盈利率列表
-            'profit_rates_not_max': [],  # 不是最大金额的盈利率列表
+            'profit_rate_sum_is_max': ExactSum(),  # 是最大金额的盈利率之和
+            'profit_rate_sum_not_max': ExactSum(),  # 不是最大金额的盈利率之和
+            'profit_rate_count_is_max': 0,
+            'profit_rate_count_not_max': 0,
         }
         
         # 条件8: 波动率检查统计
-        self.volatility_stats = {
-            'total': 0,
-            'price_volatility_values': [],  # 所有价格波动率值
-            'time_volatility_values': [],   # 所有时间波动率值
-            'amount_volatility_values': [],  # 所有金额波动率值
-            'profitable_price_volatility_values': [],  # 盈利交易的价格波动率值
-            'profitable_time_volatility_values': [],   # 盈利交易的时间波动率值
-            'profitable_amount_volatility_values': [],  # 盈利交易的金额波动率值
-            'profit_rates_by_price_volatility': {},  # 按价格波动率分桶记录盈利率
-            'profit_rates_by_time_volatility': {},   # 按时间波动率分桶记录盈利率
-            'profit_rates_by_amount_volatility': {},  # 按金额波动率分桶记录盈利率
-        }
+        self.volatility_stats = {'total': 0}
         
         # 条件9: 价格比例检查统计
-        self.price_ratio_stats = {
-            'total': 0,
-            'price_ratio_values': [],  # 所有价格比例值
-            'profitable_price_ratio_values': [],  # 盈利交易的价格比例值
-        }
+        self.price_ratio_stats = {'total': 0}
         
         # 条件10: 买单数量检查统计
-        self.buy_count_stats = {
-            'total': 0,
-            'buy_count_values': [],  # 所有买单数量值
-            'profitable_buy_count_values': [],  # 盈利交易的买单数量值
-        }
+        self.buy_count_stats = {'total': 0}
         
         # 条件11: 卖单数量检查统计
-        self.sell_count_stats = {
-            'total': 0,
-            'sell_count_values': [],  # 所有卖单数量值
-            'profitable_sell_count_values': [],  # 盈利交易的卖单数量值
-        }
+        self.sell_count_stats = {'total': 0}
         
         # 条件12: 大单占比检查统计
-        self.large_trade_ratio_stats = {
-            'total': 0,
-            'large_trade_ratio_values': [],  # 所有大单占比值
-            'profitable_large_trade_ratio_values': [],  # 盈利交易的大单占比值
-        }
+        self.large_trade_ratio_stats = {'total': 0}
         
         # 条件13: 小单占比检查统计
-        self.small_trade_ratio_stats = {
-            'total': 0,
-            'small_trade_ratio_values': [],  # 所有小单占比值
-            'profitable_small_trade_ratio_values': [],  # 盈利交易的小单占比值
-        }
+        self.small_trade_ratio_stats = {'total': 0}
         
         # 条件14: 连续大额买单检查统计
-        self.consecutive_buy_stats = {
-            'total': 0,
-            'consecutive_buy_values': [],  # 所有连续买单数量值
-            'profitable_consecutive_buy_values': [],  # 盈利交易的连续买单数量值
-        }
+        self.consecutive_buy_stats = {'total': 0}
         
         # 条件15: 连续大额卖单检查统计
-        self.consecutive_sell_stats = {
-            'total': 0,
-            'consecutive_sell_values': [],  # 所有连续卖单数量值
-            'profitable_consecutive_sell_values': [],  # 盈利交易的连续卖单数量值
-        }
+        self.consecutive_sell_stats = {'total': 0}
         
-        # 交易记录（用于后续分析）
-        self.trade_records = []
+        # 各debug字段的分桶直方图
+        self.histograms = {field: BucketHistogram(BUY_CONDITIONS_CONFIG[buckets_key])
+                           for field, buckets_key in self.HISTOGRAM_BUCKETS_KEYS.items()}
+        
+        # 当前交易已登记、等待 record_trade_result 补充盈亏的debug值
+        self.pending_values = {}
+        
+        # 总体盈利率累计（用于计算总体平均盈利率）
+        self.profit_rate_sum = ExactSum()
+        self.profit_rate_count = 0
         
         # 当前信号的debug信息（用于后续记录交易结果）
         self.current_signal_info = {
@@ -587,165 +574,146 @@ class DebugStatsCollector:
     def record_time_diff_check(self, time_diff: int):
         """记录时间差检查结果"""
         self.time_diff_stats['total'] += 1
-        self.time_diff_stats['time_diff_values'].append(time_diff)
+        self.pending_values['time_diff'] = time_diff
     
     def record_volatility_check(self, price_volatility: Optional[float], time_volatility: Optional[float], amount_volatility: Optional[float]):
         """记录波动率检查结果"""
         self.volatility_stats['total'] += 1
         if price_volatility is not None:
-            self.volatility_stats['price_volatility_values'].append(price_volatility)
+            self.pending_values['price_volatility'] = price_volatility
         if time_volatility is not None:
-            self.volatility_stats['time_volatility_values'].append(time_volatility)
+            self.pending_values['time_volatility'] = time_volatility
         if amount_volatility is not None:
-            self.volatility_stats['amount_volatility_values'].append(amount_volatility)
+            self.pending_values['amount_volatility'] = amount_volatility
     
     def record_price_ratio_check(self, price_ratio: float):
         """记录价格比例检查结果"""
         self.price_ratio_stats['total'] += 1
-        self.price_ratio_stats['price_ratio_values'].append(price_ratio)
+        self.pending_values['price_ratio'] = price_ratio
     
     def record_buy_count_check(self, buy_count: int):
         """记录买单数量检查结果"""
         self.buy_count_stats['total'] += 1
-        self.buy_count_stats['buy_count_values'].append(buy_count)
+        self.pending_values['buy_count'] = buy_count
     
     def record_sell_count_check(self, sell_count: int):
         """记录卖单数量检查结果"""
         self.sell_count_stats['total'] += 1
-        self.sell_count_stats['sell_count_values'].append(sell_count)
+        self.pending_values['sell_count'] = sell_count
     
     def record_large_trade_ratio_check(self, large_ratio: float):
         """记录大单占比检查结果"""
         self.large_trade_ratio_stats['total'] += 1
-        self.large_trade_ratio_stats['large_trade_ratio_values'].append(large_ratio)
+        self.pending_values['large_trade_ratio'] = large_ratio
     
     def record_small_trade_ratio_check(self, small_ratio: float):
         """记录小单占比检查结果"""
         self.small_trade_ratio_stats['total'] += 1
-        self.small_trade_ratio_stats['small_trade_ratio_values'].append(small_ratio)
+        self.pending_values['small_trade_ratio'] = small_ratio
     
     def record_consecutive_buy_check(self, consecutive_buy: int):
         """记录连续买单检查结果"""
         self.consecutive_buy_stats['total'] += 1
-        self.consecutive_buy_stats['consecutive_buy_values'].append(consecutive_buy)
+        self.pending_values['consecutive_buy'] = consecutive_buy
     
     def record_consecutive_sell_check(self, consecutive_sell: int):
         """记录连续卖单检查结果"""
         self.consecutive_sell_stats['total'] += 1
-        self.consecutive_sell_stats['consecutive_sell_values'].append(consecutive_sell)
+        self.pending_values['consecutive_sell'] = consecutive_sell
     
     def record_trade_result(self, is_profitable: bool, time_diff: Optional[int], is_max: Optional[bool], price_volatility: Optional[float], time_volatility: Optional[float], amount_volatility: Optional[float], price_ratio: Optional[float] = None, buy_count: Optional[int] = None, sell_count: Optional[int] = None, large_trade_ratio: Optional[float] = None, small_trade_ratio: Optional[float] = None, consecutive_buy: Optional[int] = None, consecutive_sell: Optional[int] = None, profit_rate: Optional[float] = None):
-        """记录交易结果"""
-        self.trade_records.append({
-            'is_profitable': is_profitable,
-            'time_diff': time_diff,
-            'is_max': is_max,
-            'price_volatility': price_volatility,
-            'time_volatility': time_volatility,
-            'amount_volatility': amount_volatility,
-            'price_ratio': price_ratio,
-            'buy_count': buy_count,
-            'sell_count': sell_count,
-            'large_trade_ratio': large_trade_ratio,
-            'small_trade_ratio': small_trade_ratio,
-            'consecutive_buy': consecutive_buy,
-            'consecutive_sell': consecutive_sell,
-            'profit_rate': profit_rate,
-        })
+        """记录交易结果，把本笔交易登记过的debug值连同盈亏一次性累加到分桶"""
+        rate = profit_rate if profit_rate is not None else 0.0
+        if profit_rate is not None:
+            self.profit_rate_sum.add(profit_rate)
+            self.profit_rate_count += 1
         
-        if is_profitable:
-            # 时间差统计
-            if time_diff is not None:
-                self.time_diff_stats['profitable_time_diff_values'].append(time_diff)
-            
-            # 最大金额统计
-            if is_max is True:
+        # 最大金额统计
+        if is_max is True:
+            if is_profitable:
                 self.max_amount_stats['profitable_is_max'] += 1
-            elif is_max is False:
+            if profit_rate is not None:
+                self.max_amount_stats['profit_rate_sum_is_max'].add(profit_rate)
+                self.max_amount_stats['profit_rate_count_is_max'] += 1
+        elif is_max is False:
+            if is_profitable:
                 self.max_amount_stats['profitable_not_max'] += 1
-            
-            # 波动率统计
-            if price_volatility is not None:
-                self.volatility_stats['profitable_price_volatility_values'].append(price_volatility)
-            if time_volatility is not None:
-                self.volatility_stats['profitable_time_volatility_values'].append(time_volatility)
-            if amount_volatility is not None:
-                self.volatility_stats['profitable_amount_volatility_values'].append(amount_volatility)
-            
-            # 价格比例统计
-            if price_ratio is not None:
-                self.price_ratio_stats['profitable_price_ratio_values'].append(price_ratio)
-            
-            # 买卖单数量统计
-            if buy_count is not None:
-                self.buy_count_stats['profitable_buy_count_values'].append(buy_count)
-            if sell_count is not None:
-                self.sell_count_stats['profitable_sell_count_values'].append(sell_count)
-            
-            # 大小单占比统计
-            if large_trade_ratio is not None:
-                self.large_trade_ratio_stats['profitable_large_trade_ratio_values'].append(large_trade_ratio)
-            if small_trade_ratio is not None:
-                self.small_trade_ratio_stats['profitable_small_trade_ratio_values'].append(small_trade_ratio)
-            
-            # 连续买卖单统计
-            if consecutive_buy is not None:
-                self.consecutive_buy_stats['profitable_consecutive_buy_values'].append(consecutive_buy)
-            if consecutive_sell is not None:
-                self.consecutive_sell_stats['profitable_consecutive_sell_values'].append(consecutive_sell)
-    
-    def get_bucket_distribution(self, values: List[float], buckets: List[float]) -> Dict[str, Dict]:
-        """计算值在各分桶中的分布"""
-        if not values:
-            return {}
-        
-        distribution = {}
-        total = len(values)
+            if profit_rate is not None:
+                self.max_amount_stats['profit_rate_sum_not_max'].add(profit_rate)
+                self.max_amount_stats['profit_rate_count_not_max'] += 1
         
-        for i in range(len(buckets)):
-            if i == len(buckets) - 1:
-                # 最后一个桶: >= buckets[i]
-                bucket_name = f">={buckets[i]}"
-                count = sum(1 for v in values if v >= buckets[i])
+        # 分桶统计
+        for field, value in self.pending_values.items():
+            self.histograms[field].add(value, is_profitable, rate)
+        self.pending_values = {}
+    
+    # 只含计数的统计字典名（合并时按key相加）
+    COUNTER_STATS_ATTRS = [
+        'time_diff_stats', 'volatility_stats', 'price_ratio_stats', 'buy_count_stats', 'sell_count_stats',
+        'large_trade_ratio_stats', 'small_trade_ratio_stats', 'consecutive_buy_stats', 'consecutive_sell_stats',
+    ]
+    
+    def to_dict(self) -> Dict:
+        """序列化为可JSON/pickle的字典（不含当前交易未入桶的debug值）"""
+        max_amount_stats = {k: (v.to_dict() if isinstance(v, ExactSum) else v)
+                            for k, v in self.max_amount_stats.items()}
+        return {
+            'counters': {attr: dict(getattr(self, attr)) for attr in self.COUNTER_STATS_ATTRS},
+            'max_amount_stats': max_amount_stats,
+            'histograms': {field: hist.to_dict() for field, hist in self.histograms.items()},
+            'profit_rate_sum': self.profit_rate_sum.to_dict(),
+            'profit_rate_count': self.profit_rate_count,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DebugStatsCollector':
+        collector = cls()
+        for attr, counters in data['counters'].items():
+            setattr(collector, attr, dict(counters))
+        collector.max_amount_stats = {k: (ExactSum.from_dict(v) if k.startswith('profit_rate_sum_') else v)
+                                      for k, v in data['max_amount_stats'].items()}
+        collector.histograms = {field: BucketHistogram.from_dict(h) for field, h in data['histograms'].items()}
+        collector.profit_rate_sum = ExactSum.from_dict(data['profit_rate_sum'])
+        collector.profit_rate_count = data['profit_rate_count']
+        return collector
+    
+    def merge(self, other: 'DebugStatsCollector') -> 'DebugStatsCollector':
+        """合并另一个收集器的统计（计数相加、直方图逐桶合并），返回 self"""
+        for attr in self.COUNTER_STATS_ATTRS:
+            target = getattr(self, attr)
+            for key, value in getattr(other, attr).items():
+                target[key] = target.get(key, 0) + value
+        for key, value in other.max_amount_stats.items():
+            if isinstance(value, ExactSum):
+                self.max_amount_stats[key].merge(value)
             else:
-                # 中间桶: [buckets[i], buckets[i+1])
-                bucket_name = f"[{buckets[i]}, {buckets[i+1]})"
-                count = sum(1 for v in values if buckets[i] <= v < buckets[i+1])
-            
-            distribution[bucket_name] = {
-                'count': count,
-                'ratio': count / total if total > 0 else 0,
-            }
-        
-        return distribution
-    
-    def get_bucket_for_value(self, value: float, buckets: List[float]) -> str:
-        """获取值所属的分桶名称"""
-        for i in range(len(buckets)):
-            if i == len(buckets) - 1:
-                return f">={buckets[i]}"
-            elif buckets[i] <= value < buckets[i+1]:
-                return f"[{buckets[i]}, {buckets[i+1]})"
-        return f">={buckets[-1]}"
-    
-    def get_avg_profit_rate_by_bucket(self, values: List[float], buckets: List[float], all_records: List[Dict], value_key: str) -> Dict[str, float]:
-        """按分桶计算平均盈利率"""
-        bucket_profit_rates: Dict[str, List[float]] = {}
-        
-        for record in all_records:
-            value = record.get(value_key)
-            profit_rate = record.get('profit_rate')
-            if value is not None and profit_rate is not None:
-                bucket_name = self.get_bucket_for_value(value, buckets)
-                if bucket_name not in bucket_profit_rates:
-                    bucket_profit_rates[bucket_name] = []
-                bucket_profit_rates[bucket_name].append(profit_rate)
-        
-        avg_profit_rates = {}
-        for bucket_name, rates in bucket_profit_rates.items():
-            avg_profit_rates[bucket_name] = sum(rates) / len(rates) if rates else 0.0
-        
-        return avg_profit_rates
+                self.max_amount_stats[key] += value
+        for field, hist in other.histograms.items():
+            if field in self.histograms:
+                self.histograms[field].merge(hist)
+            else:
+                self.histograms[field] = BucketHistogram.from_dict(hist.to_dict())
+        self.profit_rate_sum.merge(other.profit_rate_sum)
+        self.profit_rate_count += other.profit_rate_count
+        return self
+    
+    def print_bucket_distribution(self, field: str, name_suffix: str = ''):
+        """打印某个debug字段的分桶分布: 命中数(占比) | 盈利数(胜率) | 平均盈利率"""
+        hist = self.histograms[field]
+        edges = hist.edges
+        for i in range(len(edges)):
+            if i == len(edges) - 1:
+                # 最后一个桶: >= edges[i]
+                bucket_name = f">={edges[i]}"
+            else:
+                # 中间桶: [edges[i], edges[i+1])
+                bucket_name = f"[{edges[i]}, {edges[i+1]})"
+            count = hist.counts[i]
+            ratio = count / hist.total if hist.total > 0 else 0
+            profitable_in_bucket = hist.profitable[i]
+            bucket_profit_rate = profitable_in_bucket / count * 100 if count > 0 else 0
+            avg_rate = hist.avg_profit_rate(i) * 100
+            print(f"    {bucket_name}{name_suffix}: {count} ({ratio*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
     
     def print_summary(self):
         """打印统计摘要"""
@@ -754,46 +722,33 @@ class DebugStatsCollector:
         print("=" * 60)
         
         # 计算总体平均盈利率
-        all_profit_rates = [r.get('profit_rate', 0) for r in self.trade_records if r.get('profit_rate') is not None]
-        overall_avg_profit_rate = sum(all_profit_rates) / len(all_profit_rates) * 100 if all_profit_rates else 0
+        overall_avg_profit_rate = self.profit_rate_sum.value / self.profit_rate_count * 100 if self.profit_rate_count else 0
         
         # 条件4: 时间差检查统计
         if self.time_diff_stats['total'] > 0:
             total = self.time_diff_stats['total']
-            profitable_count = len(self.time_diff_stats['profitable_time_diff_values'])
+            profitable_count = self.histograms['time_diff'].total_profitable
             
             print("\n【条件4: 时间差检查】")
             print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
             
             # 时间差分布
-            if self.time_diff_stats['time_diff_values']:
+            if self.histograms['time_diff'].total:
                 print(f"\n  时间差分布:")
-                time_diff_buckets = BUY_CONDITIONS_CONFIG['TIME_DIFF_BUCKETS']
-                time_diff_dist = self.get_bucket_distribution(self.time_diff_stats['time_diff_values'], time_diff_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_time_diff_dist = self.get_bucket_distribution(self.time_diff_stats['profitable_time_diff_values'], time_diff_buckets) if self.time_diff_stats['profitable_time_diff_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.time_diff_stats['time_diff_values'], time_diff_buckets, self.trade_records, 'time_diff')
-                
-                for bucket_name, stats in time_diff_dist.items():
-                    profitable_in_bucket = profitable_time_diff_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
+                self.print_bucket_distribution('time_diff')
         
         # 条件7: 最大金额检查统计
         if self.max_amount_stats['total'] > 0:
-            total = self.max_amount_stats['total']
-            is_max = self.max_amount_stats['is_max']
-            not_max = self.max_amount_stats['not_max']
-            profitable_is_max = self.max_amount_stats['profitable_is_max']
-            profitable_not_max = self.max_amount_stats['profitable_not_max']
+            stats = self.max_amount_stats
+            total = stats['total']
+            is_max = stats['is_max']
+            not_max = stats['not_max']
+            profitable_is_max = stats['profitable_is_max']
+            profitable_not_max = stats['profitable_not_max']
             
             # 计算是/不是最大金额的平均盈利率
-            is_max_rates = [r.get('profit_rate', 0) for r in self.trade_records if r.get('is_max') is True and r.get('profit_rate') is not None]
-            not_max_rates = [r.get('profit_rate', 0) for r in self.trade_records if r.get('is_max') is False and r.get('profit_rate') is not None]
-            avg_is_max_rate = sum(is_max_rates) / len(is_max_rates) * 100 if is_max_rates else 0
-            avg_not_max_rate = sum(not_max_rates) / len(not_max_rates) * 100 if not_max_rates else 0
+            avg_is_max_rate = stats['profit_rate_sum_is_max'].value / stats['profit_rate_count_is_max'] * 100 if stats['profit_rate_count_is_max'] else 0
+            avg_not_max_rate = stats['profit_rate_sum_not_max'].value / stats['profit_rate_count_not_max'] * 100 if stats['profit_rate_count_not_max'] else 0
             
             print("\n【条件7: 最大金额检查】")
             print(f"  总交易数: {total}, 平均盈利率: {overall_avg_profit_rate:.2f}%")
@@ -805,231 +760,48 @@ class DebugStatsCollector:
         # 条件8: 波动率检查统计
         if self.volatility_stats['total'] > 0:
             total = self.volatility_stats['total']
-            profitable_price_count = len(self.volatility_stats['profitable_price_volatility_values'])
-            profitable_time_count = len(self.volatility_stats['profitable_time_volatility_values'])
-            profitable_amount_count = len(self.volatility_stats['profitable_amount_volatility_values'])
             
             print("\n【条件8: 波动率检查】")
             print(f"  总交易数: {total}, 平均盈利率: {overall_avg_profit_rate:.2f}%")
             
-            # 价格波动率分布
-            if self.volatility_stats['price_volatility_values']:
-                all_count = len(self.volatility_stats['price_volatility_values'])
-                print(f"\n  价格波动率分布 (所有交易: {all_count}, 盈利: {profitable_price_count}, 盈利率: {profitable_price_count/all_count*100:.2f}%):")
-                price_buckets = BUY_CONDITIONS_CONFIG['PRICE_VOLATILITY_BUCKETS']
-                price_dist = self.get_bucket_distribution(self.volatility_stats['price_volatility_values'], price_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_price_dist = self.get_bucket_distribution(self.volatility_stats['profitable_price_volatility_values'], price_buckets) if self.volatility_stats['profitable_price_volatility_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.volatility_stats['price_volatility_values'], price_buckets, self.trade_records, 'price_volatility')
-                
-                for bucket_name, stats in price_dist.items():
-                    profitable_in_bucket = profitable_price_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-            
-            # 时间波动率分布
-            if self.volatility_stats['time_volatility_values']:
-                all_count = len(self.volatility_stats['time_volatility_values'])
-                print(f"\n  时间波动率分布 (所有交易: {all_count}, 盈利: {profitable_time_count}, 盈利率: {profitable_time_count/all_count*100:.2f}%):")
-                time_buckets = BUY_CONDITIONS_CONFIG['TIME_VOLATILITY_BUCKETS']
-                time_dist = self.get_bucket_distribution(self.volatility_stats['time_volatility_values'], time_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_time_dist = self.get_bucket_distribution(self.volatility_stats['profitable_time_volatility_values'], time_buckets) if self.volatility_stats['profitable_time_volatility_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.volatility_stats['time_volatility_values'], time_buckets, self.trade_records, 'time_volatility')
-                
-                for bucket_name, stats in time_dist.items():
-                    profitable_in_bucket = profitable_time_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-            
-            # 金额波动率分布
-            if self.volatility_stats['amount_volatility_values']:
-                all_count = len(self.volatility_stats['amount_volatility_values'])
-                print(f"\n  金额波动率分布 (所有交易: {all_count}, 盈利: {profitable_amount_count}, 盈利率: {profitable_amount_count/all_count*100:.2f}%):")
-                amount_buckets = BUY_CONDITIONS_CONFIG['AMOUNT_VOLATILITY_BUCKETS']
-                amount_dist = self.get_bucket_distribution(self.volatility_stats['amount_volatility_values'], amount_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_amount_dist = self.get_bucket_distribution(self.volatility_stats['profitable_amount_volatility_values'], amount_buckets) if self.volatility_stats['profitable_amount_volatility_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.volatility_stats['amount_volatility_values'], amount_buckets, self.trade_records, 'amount_volatility')
-                
-                for bucket_name, stats in amount_dist.items():
-                    profitable_in_bucket = profitable_amount_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件9: 价格比例检查统计
-        if self.price_ratio_stats['total'] > 0:
-            total = self.price_ratio_stats['total']
-            profitable_count = len(self.price_ratio_stats['profitable_price_ratio_values'])
-            
-            print("\n【条件9: 价格比例检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 价格比例分布
-            if self.price_ratio_stats['price_ratio_values']:
-                print(f"\n  价格比例分布 (当前价格/近N单最低价 - 1)%:")
-                price_ratio_buckets = BUY_CONDITIONS_CONFIG['PRICE_RATIO_BUCKETS']
-                price_ratio_dist = self.get_bucket_distribution(self.price_ratio_stats['price_ratio_values'], price_ratio_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_price_ratio_dist = self.get_bucket_distribution(self.price_ratio_stats['profitable_price_ratio_values'], price_ratio_buckets) if self.price_ratio_stats['profitable_price_ratio_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.price_ratio_stats['price_ratio_values'], price_ratio_buckets, self.trade_records, 'price_ratio')
-                
-                for bucket_name, stats in price_ratio_dist.items():
-                    profitable_in_bucket = profitable_price_ratio_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}%: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件10: 买单数量检查统计
-        if self.buy_count_stats['total'] > 0:
-            total = self.buy_count_stats['total']
-            profitable_count = len(self.buy_count_stats['profitable_buy_count_values'])
-            
-            print("\n【条件10: 买单数量检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 买单数量分布
-            if self.buy_count_stats['buy_count_values']:
-                print(f"\n  买单数量分布:")
-                buy_count_buckets = BUY_CONDITIONS_CONFIG['BUY_COUNT_BUCKETS']
-                buy_count_dist = self.get_bucket_distribution(self.buy_count_stats['buy_count_values'], buy_count_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_buy_count_dist = self.get_bucket_distribution(self.buy_count_stats['profitable_buy_count_values'], buy_count_buckets) if self.buy_count_stats['profitable_buy_count_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.buy_count_stats['buy_count_values'], buy_count_buckets, self.trade_records, 'buy_count')
-                
-                for bucket_name, stats in buy_count_dist.items():
-                    profitable_in_bucket = profitable_buy_count_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件11: 卖单数量检查统计
-        if self.sell_count_stats['total'] > 0:
-            total = self.sell_count_stats['total']
-            profitable_count = len(self.sell_count_stats['profitable_sell_count_values'])
-            
-            print("\n【条件11: 卖单数量检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 卖单数量分布
-            if self.sell_count_stats['sell_count_values']:
-                print(f"\n  卖单数量分布:")
-                sell_count_buckets = BUY_CONDITIONS_CONFIG['SELL_COUNT_BUCKETS']
-                sell_count_dist = self.get_bucket_distribution(self.sell_count_stats['sell_count_values'], sell_count_buckets)
-                
-                # 计算每个分桶的盈利数量和平均盈利率
-                profitable_sell_count_dist = self.get_bucket_distribution(self.sell_count_stats['profitable_sell_count_values'], sell_count_buckets) if self.sell_count_stats['profitable_sell_count_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.sell_count_stats['sell_count_values'], sell_count_buckets, self.trade_records, 'sell_count')
-                
-                for bucket_name, stats in sell_count_dist.items():
-                    profitable_in_bucket = profitable_sell_count_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件12: 大单占比检查统计
-        if self.large_trade_ratio_stats['total'] > 0:
-            total = self.large_trade_ratio_stats['total']
-            profitable_count = len(self.large_trade_ratio_stats['profitable_large_trade_ratio_values'])
-            
-            print("\n【条件12: 大单占比检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 大单占比分布
-            if self.large_trade_ratio_stats['large_trade_ratio_values']:
-                large_threshold = BUY_CONDITIONS_CONFIG['LARGE_TRADE_THRESHOLD']
-                print(f"\n  大单(>={large_threshold}SOL)占比分布:")
-                large_ratio_buckets = BUY_CONDITIONS_CONFIG['LARGE_TRADE_RATIO_BUCKETS']
-                large_ratio_dist = self.get_bucket_distribution(self.large_trade_ratio_stats['large_trade_ratio_values'], large_ratio_buckets)
-                
-                profitable_large_ratio_dist = self.get_bucket_distribution(self.large_trade_ratio_stats['profitable_large_trade_ratio_values'], large_ratio_buckets) if self.large_trade_ratio_stats['profitable_large_trade_ratio_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.large_trade_ratio_stats['large_trade_ratio_values'], large_ratio_buckets, self.trade_records, 'large_trade_ratio')
-                
-                for bucket_name, stats in large_ratio_dist.items():
-                    profitable_in_bucket = profitable_large_ratio_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件13: 小单占比检查统计
-        if self.small_trade_ratio_stats['total'] > 0:
-            total = self.small_trade_ratio_stats['total']
-            profitable_count = len(self.small_trade_ratio_stats['profitable_small_trade_ratio_values'])
-            
-            print("\n【条件13: 小单占比检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 小单占比分布
-            if self.small_trade_ratio_stats['small_trade_ratio_values']:
-                small_threshold = BUY_CONDITIONS_CONFIG['SMALL_TRADE_THRESHOLD']
-                print(f"\n  小单(<{small_threshold}SOL)占比分布:")
-                small_ratio_buckets = BUY_CONDITIONS_CONFIG['SMALL_TRADE_RATIO_BUCKETS']
-                small_ratio_dist = self.get_bucket_distribution(self.small_trade_ratio_stats['small_trade_ratio_values'], small_ratio_buckets)
-                
-                profitable_small_ratio_dist = self.get_bucket_distribution(self.small_trade_ratio_stats['profitable_small_trade_ratio_values'], small_ratio_buckets) if self.small_trade_ratio_stats['profitable_small_trade_ratio_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.small_trade_ratio_stats['small_trade_ratio_values'], small_ratio_buckets, self.trade_records, 'small_trade_ratio')
-                
-                for bucket_name, stats in small_ratio_dist.items():
-                    profitable_in_bucket = profitable_small_ratio_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
+            for field, title in (('price_volatility', '价格波动率分布'),
+                                 ('time_volatility', '时间波动率分布'),
+                                 ('amount_volatility', '金额波动率分布')):
+                hist = self.histograms[field]
+                if hist.total:
+                    print(f"\n  {title} (所有交易: {hist.total}, 盈利: {hist.total_profitable}, 盈利率: {hist.total_profitable/hist.total*100:.2f}%):")
+                    self.print_bucket_distribution(field)
         
-        # 条件14: 连续大额买单检查统计
-        if self.consecutive_buy_stats['total'] > 0:
-            total = self.consecutive_buy_stats['total']
-            profitable_count = len(self.consecutive_buy_stats['profitable_consecutive_buy_values'])
-            
-            print("\n【条件14: 连续大额买单检查】")
-            print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
-            
-            # 连续买单数量分布
-            if self.consecutive_buy_stats['consecutive_buy_values']:
-                buy_threshold = BUY_CONDITIONS_CONFIG['CONSECUTIVE_BUY_THRESHOLD']
-                print(f"\n  连续大额(>={buy_threshold}SOL)买单数量分布:")
-                consecutive_buy_buckets = BUY_CONDITIONS_CONFIG['CONSECUTIVE_BUY_BUCKETS']
-                consecutive_buy_dist = self.get_bucket_distribution(self.consecutive_buy_stats['consecutive_buy_values'], consecutive_buy_buckets)
-                
-                profitable_consecutive_buy_dist = self.get_bucket_distribution(self.consecutive_buy_stats['profitable_consecutive_buy_values'], consecutive_buy_buckets) if self.consecutive_buy_stats['profitable_consecutive_buy_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.consecutive_buy_stats['consecutive_buy_values'], consecutive_buy_buckets, self.trade_records, 'consecutive_buy')
-                
-                for bucket_name, stats in consecutive_buy_dist.items():
-                    profitable_in_bucket = profitable_consecutive_buy_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
-        
-        # 条件15: 连续大额卖单检查统计
-        if self.consecutive_sell_stats['total'] > 0:
-            total = self.consecutive_sell_stats['total']
-            profitable_count = len(self.consecutive_sell_stats['profitable_consecutive_sell_values'])
+        # 条件9 ~ 条件15: 分桶分布统计
+        sections = [
+            (self.price_ratio_stats, 'price_ratio', '条件9: 价格比例检查',
+             lambda: "价格比例分布 (当前价格/近N单最低价 - 1)%", '%'),
+            (self.buy_count_stats, 'buy_count', '条件10: 买单数量检查',
+             lambda: "买单数量分布", ''),
+            (self.sell_count_stats, 'sell_count', '条件11: 卖单数量检查',
+             lambda: "卖单数量分布", ''),
+            (self.large_trade_ratio_stats, 'large_trade_ratio', '条件12: 大单占比检查',
+             lambda: f"大单(>={BUY_CONDITIONS_CONFIG['LARGE_TRADE_THRESHOLD']}SOL)占比分布", ''),
+            (self.small_trade_ratio_stats, 'small_trade_ratio', '条件13: 小单占比检查',
+             lambda: f"小单(<{BUY_CONDITIONS_CONFIG['SMALL_TRADE_THRESHOLD']}SOL)占比分布", ''),
+            (self.consecutive_buy_stats, 'consecutive_buy', '条件14: 连续大额买单检查',
+             lambda: f"连续大额(>={BUY_CONDITIONS_CONFIG['CONSECUTIVE_BUY_THRESHOLD']}SOL)买单数量分布", ''),
+            (self.consecutive_sell_stats, 'consecutive_sell', '条件15: 连续大额卖单检查',
+             lambda: f"连续大额(>={BUY_CONDITIONS_CONFIG['CONSECUTIVE_SELL_THRESHOLD']}SOL)卖单数量分布", ''),
+        ]
+        for stats, field, title, dist_title, name_suffix in sections:
+            if stats['total'] <= 0:
+                continue
+            total = stats['total']
+            hist = self.histograms[field]
+            profitable_count = hist.total_profitable
             
-            print("\n【条件15: 连续大额卖单检查】")
+            print(f"\n【{title}】")
             print(f"  总交易数: {total}, 盈利: {profitable_count}, 盈利率: {profitable_count/total*100:.2f}%, 平均盈利率: {overall_avg_profit_rate:.2f}%")
             
-            # 连续卖单数量分布
-            if self.consecutive_sell_stats['consecutive_sell_values']:
-                sell_threshold = BUY_CONDITIONS_CONFIG['CONSECUTIVE_SELL_THRESHOLD']
-                print(f"\n  连续大额(>={sell_threshold}SOL)卖单数量分布:")
-                consecutive_sell_buckets = BUY_CONDITIONS_CONFIG['CONSECUTIVE_SELL_BUCKETS']
-                consecutive_sell_dist = self.get_bucket_distribution(self.consecutive_sell_stats['consecutive_sell_values'], consecutive_sell_buckets)
-                
-                profitable_consecutive_sell_dist = self.get_bucket_distribution(self.consecutive_sell_stats['profitable_consecutive_sell_values'], consecutive_sell_buckets) if self.consecutive_sell_stats['profitable_consecutive_sell_values'] else {}
-                avg_profit_rates = self.get_avg_profit_rate_by_bucket(self.consecutive_sell_stats['consecutive_sell_values'], consecutive_sell_buckets, self.trade_records, 'consecutive_sell')
-                
-                for bucket_name, stats in consecutive_sell_dist.items():
-                    profitable_in_bucket = profitable_consecutive_sell_dist.get(bucket_name, {'count': 0})['count']
-                    bucket_profit_rate = profitable_in_bucket / stats['count'] * 100 if stats['count'] > 0 else 0
-                    avg_rate = avg_profit_rates.get(bucket_name, 0) * 100
-                    print(f"    {bucket_name}: {stats['count']} ({stats['ratio']*100:.2f}%) | 盈利: {profitable_in_bucket} ({bucket_profit_rate:.2f}%) | 平均盈利率: {avg_rate:.2f}%")
+            if hist.total:
+                print(f"\n  {dist_title()}:")
+                self.print_bucket_distribution(field, name_suffix)
         
         print("=" * 60)
 
@@ -1521,14 +1293,11 @@ def wrapped_backtest_mint(mint_name: str, mint_data: Dict) -> List[Dict]:
                 volatility_min_amount = BUY_CONDITIONS_CONFIG['VOLATILITY_MIN_AMOUNT']
                 price_volatility, time_volatility, amount_volatility = get_recent_trades_volatility(trade_data, buy_trigger_index, volatility_lookback, volatility_min_amount, 'all')
                 
-                # 记录波动率统计
-                if BUY_CONDITIONS_CONFIG['PRICE_VOLATILITY_CHECK_MODE'] == 'debug' and price_volatility is not None:
-                    debug_stats.volatility_stats['price_volatility_values'].append(price_volatility)
-                if BUY_CONDITIONS_CONFIG['TIME_VOLATILITY_CHECK_MODE'] == 'debug' and time_volatility is not None:
-                    debug_stats.volatility_stats['time_volatility_values'].append(time_volatility)
-                if BUY_CONDITIONS_CONFIG['AMOUNT_VOLATILITY_CHECK_MODE'] == 'debug' and amount_volatility is not None:
-                    debug_stats.volatility_stats['amount_volatility_values'].append(amount_volatility)
-                debug_stats.volatility_stats['total'] += 1
+                # 记录波动率统计（只登记debug模式的波动率）
+                debug_stats.record_volatility_check(
+                    price_volatility if BUY_CONDITIONS_CONFIG['PRICE_VOLATILITY_CHECK_MODE'] == 'debug' else None,
+                    time_volatility if BUY_CONDITIONS_CONFIG['TIME_VOLATILITY_CHECK_MODE'] == 'debug' else None,
+                    amount_volatility if BUY_CONDITIONS_CONFIG['AMOUNT_VOLATILITY_CHECK_MODE'] == 'debug' else None)
             
             # 重新计算价格比例
             price_ratio = None
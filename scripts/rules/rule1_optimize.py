@@ -1,14 +1,26 @@
 import sys, os, time
 import itertools
+import math
 import copy
 import io
 import contextlib
 import concurrent.futures
 import multiprocessing
 import shutil
+from array import array
+from collections import OrderedDict
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 import pump
 import json
+from bucket_stats import (BucketHistogram, ExactSum, PairwiseCrossTab, QuantileSketch, bootstrap_confidence_intervals,
+                          merge_sell_signal_stats, select_best_bucket_range, INF_REPLACEMENT)
+from forward_index import ForwardIndex
+from sell_grid import evaluate_entry_grid, evaluate_sell_grid, expand_grid, grid_point_sell_config
+from param_search import ParetoFrontier, TPESampler, space_defaults, space_size
+from trade_features import (get_buy_sell_count, get_consecutive_buy_sell_count, get_filtered_trades_sum,
+                            get_large_small_trade_ratio, get_min_price_before_buy, get_price_ratio_to_min,
+                            get_recent_trades_volatility, is_max_amount_in_recent_trades)
+from rule_tree import fit_rule_tree
 from typing import Dict, List, Optional, Tuple
 
 STRATEGY_CONFIG = pump.STRATEGY_CONFIG
@@ -98,11 +110,17 @@ BASE_BUY_CONFIG = {
     'CONSECUTIVE_SELL_THRESHOLD': 0.3,
     'CONSECUTIVE_SELL_MAX': 2,
     'CONSECUTIVE_SELL_BUCKETS': [0, 1, 2, 3, 4, 5, 7, 10],
+    # 自动分桶: 按候选集上各特征的分位数生成等人数分桶，替换上面手写的 *_BUCKETS
+    'AUTO_BUCKETS_ENABLED': False,
+    'AUTO_BUCKET_COUNT': 10,
 }
 
 SELL_CONDITIONS_CONFIG = {
     'MAX_NOWSOL_SELL': 70.0,
     'LOSS_PERCENTAGE': 0.05,
+    # 盈利率止盈: 当前盈利率 >= 阈值时卖出
+    'PROFIT_RATE_SELL_ENABLED': False,
+    'PROFIT_RATE_SELL_THRESHOLD': 0.30,
     'LOOKBACK_TRADES_FOR_MIN_PRICE': 7,
     'RETRACEMENT_LOW_PROFIT': 0.05,
     'RETRACEMENT_HIGH_PROFIT': 0.05,
@@ -118,6 +136,23 @@ SELL_CONDITIONS_CONFIG = {
     'SPIKE_THRESHOLD_PCT': 10.0,  # 涨幅阈值百分比，当前价格相对于1秒前价格涨幅 >= 此值时卖出
 }
 
+# 卖出参数网格（run_sell_grid_search 使用，PROFIT_RATE_SELL_THRESHOLD 为 None 表示不启用盈利率止盈）
+# 汇总统计的bootstrap置信区间（按mint重采样）
+BOOTSTRAP_CONFIG = {
+    'ENABLED': False,             # 为True时 get_summary 附带 'confidence_intervals'
+    'RESAMPLES': 1000,
+    'CONFIDENCE': 0.95,
+    'SEED': 0,
+    'RANK_BY_LOWER_BOUND': False,  # Step3/Step5 按置信区间下界排序（需 ENABLED）
+}
+
+SELL_GRID_SEARCH_SPACE = {
+    'LOSS_PERCENTAGE': [0.03, 0.05, 0.08],
+    'RETRACEMENT_LOW_PROFIT': [0.03, 0.05, 0.08],
+    'PROFIT_RATE_SELL_THRESHOLD': [None, 0.2, 0.3],
+    'MAX_HOLD_TIME_SECONDS': [200, 400, 600],
+}
+
 # =============================================================================
 # 当前活跃的 BUY_CONDITIONS_CONFIG（会在每次回测前被更新）
 # =============================================================================
@@ -127,174 +162,7 @@ BUY_CONDITIONS_CONFIG = {}
 
 
 # =============================================================================
-# 辅助计算函数
-# =============================================================================
-def is_max_amount_in_recent_trades(trade_data, current_index, current_amount, min_threshold, lookback_count):
-    filtered_amounts = []
-    for i in range(current_index - 1, -1, -1):
-        try:
-            amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            if amount >= min_threshold:
-                filtered_amounts.append(amount)
-                if len(filtered_amounts) >= lookback_count:
-                    break
-        except (TypeError, ValueError):
-            continue
-    if not filtered_amounts:
-        return True
-    return current_amount > max(filtered_amounts)
-
-
-def get_filtered_trades_sum(trade_data, current_index, min_amount, count):
-    filtered_amounts = []
-    for i in range(current_index - 1, -1, -1):
-        try:
-            amount = float(trade_data[i].get('tradeamount', 0))
-            if abs(amount) >= min_amount:
-                filtered_amounts.append(amount)
-                if len(filtered_amounts) >= count:
-                    break
-        except (TypeError, ValueError):
-            continue
-    if len(filtered_amounts) < count:
-        return None
-    return sum(filtered_amounts)
-
-
-def calculate_volatility(values):
-    if len(values) < 2:
-        return 0.0
-    mean = sum(values) / len(values)
-    if mean == 0:
-        return 0.0
-    variance = sum((x - mean) ** 2 for x in values) / len(values)
-    std_dev = variance ** 0.5
-    return std_dev / abs(mean)
-
-
-def get_recent_trades_volatility(trade_data, current_index, lookback_count, min_amount, volatility_type):
-    prices = []
-    time_intervals = []
-    amounts = []
-    prev_time = None
-    valid_count = 0
-    for i in range(current_index - 1, -1, -1):
-        if valid_count >= lookback_count:
-            break
-        try:
-            amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            if amount < min_amount:
-                continue
-            valid_count += 1
-            if volatility_type in ('price', 'all'):
-                price = float(trade_data[i].get('price', 0))
-                if price > 0:
-                    prices.append(price)
-            if volatility_type in ('time', 'all'):
-                tradetime = float(trade_data[i].get('tradetime', 0))
-                if tradetime > 0:
-                    if prev_time is not None:
-                        time_intervals.append(prev_time - tradetime)
-                    prev_time = tradetime
-            if volatility_type in ('amount', 'all'):
-                amounts.append(amount)
-        except (TypeError, ValueError):
-            continue
-    price_volatility = calculate_volatility(prices) if len(prices) >= 2 else None
-    time_volatility = calculate_volatility(time_intervals) if len(time_intervals) >= 2 else None
-    amount_volatility = calculate_volatility(amounts) if len(amounts) >= 2 else None
-    return price_volatility, time_volatility, amount_volatility
-
-
-def get_price_ratio_to_min(trade_data, current_index, current_price, lookback_count):
-    prices = []
-    count = 0
-    for i in range(current_index - 1, -1, -1):
-        if count >= lookback_count:
-            break
-        try:
-            price = float(trade_data[i].get('price', 0))
-            if price > 0:
-                prices.append(price)
-                count += 1
-        except (TypeError, ValueError):
-            continue
-    if not prices:
-        return None
-    min_price = min(prices)
-    if min_price <= 0:
-        return None
-    return (current_price / min_price - 1) * 100
-
-
-def get_buy_sell_count(trade_data, current_index, lookback_count):
-    buy_count = 0
-    sell_count = 0
-    count = 0
-    for i in range(current_index - 1, -1, -1):
-        if count >= lookback_count:
-            break
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            if tradeamount > 0:
-                buy_count += 1
-            elif tradeamount < 0:
-                sell_count += 1
-            count += 1
-        except (TypeError, ValueError):
-            continue
-    return buy_count, sell_count
-
-
-def get_large_small_trade_ratio(trade_data, current_index, lookback_count, large_threshold, small_threshold):
-    large_count = 0
-    small_count = 0
-    total_count = 0
-    for i in range(current_index - 1, -1, -1):
-        if total_count >= lookback_count:
-            break
-        try:
-            abs_amount = abs(float(trade_data[i].get('tradeamount', 0)))
-            if abs_amount >= large_threshold:
-                large_count += 1
-            if abs_amount < small_threshold:
-                small_count += 1
-            total_count += 1
-        except (TypeError, ValueError):
-            continue
-    if total_count == 0:
-        return 0.0, 0.0
-    return large_count / total_count, small_count / total_count
-
-
-def get_consecutive_buy_sell_count(trade_data, current_index, buy_threshold, sell_threshold):
-    consecutive_buy = 0
-    consecutive_sell = 0
-    for i in range(current_index - 1, -1, -1):
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            abs_amount = abs(tradeamount)
-            if tradeamount > 0 and abs_amount >= buy_threshold:
-                consecutive_buy += 1
-            else:
-                break
-        except (TypeError, ValueError):
-            break
-    for i in range(current_index - 1, -1, -1):
-        try:
-            tradeamount = float(trade_data[i].get('tradeamount', 0))
-            abs_amount = abs(tradeamount)
-            if tradeamount < 0 and abs_amount >= sell_threshold:
-                consecutive_sell += 1
-            else:
-                break
-        except (TypeError, ValueError):
-            break
-    return consecutive_buy, consecutive_sell
-
-
-# =============================================================================
-# 买入信号函数
+# 买入信号函数（辅助计算函数见 trade_features）
 # =============================================================================
 def variant_find_buy_signal(trade_data, start_index, creation_time):
     if start_index < 0 or start_index >= len(trade_data):
@@ -447,19 +315,6 @@ def variant_find_buy_signal(trade_data, start_index, creation_time):
 # =============================================================================
 # 卖出信号函数
 # =============================================================================
-def get_min_price_before_buy(trade_data, buy_index, lookback_count):
-    prices = []
-    start_idx = max(0, buy_index - lookback_count)
-    for i in range(start_idx, buy_index):
-        try:
-            price = float(trade_data[i].get('price', 0))
-            if price > 0:
-                prices.append(price)
-        except (TypeError, ValueError):
-            continue
-    return min(prices) if prices else None
-
-
 def variant_find_sell_signal(trade_data, buy_index, buy_price, buy_time):
     original_buy_price = buy_price
     max_price = buy_price
@@ -467,6 +322,8 @@ def variant_find_sell_signal(trade_data, buy_index, buy_price, buy_time):
 
     max_nowsol_sell = SELL_CONDITIONS_CONFIG['MAX_NOWSOL_SELL']
     loss_percentage = SELL_CONDITIONS_CONFIG['LOSS_PERCENTAGE']
+    profit_rate_sell_enabled = SELL_CONDITIONS_CONFIG.get('PROFIT_RATE_SELL_ENABLED', False)
+    profit_rate_sell_threshold = SELL_CONDITIONS_CONFIG.get('PROFIT_RATE_SELL_THRESHOLD', 0.30)
     lookback_count = SELL_CONDITIONS_CONFIG['LOOKBACK_TRADES_FOR_MIN_PRICE']
     retracement_low = SELL_CONDITIONS_CONFIG['RETRACEMENT_LOW_PROFIT']
     retracement_high = SELL_CONDITIONS_CONFIG['RETRACEMENT_HIGH_PROFIT']
@@ -503,6 +360,9 @@ def variant_find_sell_signal(trade_data, buy_index, buy_price, buy_time):
         if current_nowsol >= max_nowsol_sell:
             return i, "市值止盈"
 
+        if profit_rate_sell_enabled and current_profit_rate >= profit_rate_sell_threshold:
+            return i, "盈利率止盈"
+
         if current_profit_rate <= -loss_percentage:
             if min_price_before_buy is not None and current_price < min_price_before_buy:
                 return i, "亏损止损"
@@ -602,7 +462,11 @@ for name, obj in vars(pump).items():
 # 回测结果收集器（含debug快照）
 # =============================================================================
 class BacktestResultCollector:
-    """收集回测结果统计数据和debug快照"""
+    """收集回测结果统计数据和debug快照
+
+    可序列化 (to_dict/from_dict) 与合并 (merge)：按mint分片并行回测时，
+    各进程返回部分结果，归约后与顺序执行的结果完全一致。
+    """
 
     DEBUG_CONDITIONS = [
         ('TIME_DIFF', 'TIME_DIFF_CHECK_MODE', 'TIME_DIFF_BUCKETS', 'TIME_DIFF_FROM_LAST_TRADE_RANGE'),
@@ -619,57 +483,146 @@ class BacktestResultCollector:
         ('CONSECUTIVE_SELL', 'CONSECUTIVE_SELL_CHECK_MODE', 'CONSECUTIVE_SELL_BUCKETS', None),
     ]
 
+    # debug字段名 -> 分桶配置key
+    FIELD_BUCKETS_KEYS = {
+        'time_diff': 'TIME_DIFF_BUCKETS', 'price_volatility': 'PRICE_VOLATILITY_BUCKETS',
+        'time_volatility': 'TIME_VOLATILITY_BUCKETS', 'amount_volatility': 'AMOUNT_VOLATILITY_BUCKETS',
+        'price_ratio': 'PRICE_RATIO_BUCKETS', 'buy_count': 'BUY_COUNT_BUCKETS', 'sell_count': 'SELL_COUNT_BUCKETS',
+        'large_trade_ratio': 'LARGE_TRADE_RATIO_BUCKETS', 'small_trade_ratio': 'SMALL_TRADE_RATIO_BUCKETS',
+        'consecutive_buy': 'CONSECUTIVE_BUY_BUCKETS', 'consecutive_sell': 'CONSECUTIVE_SELL_BUCKETS',
+    }
+
     def __init__(self):
         self.reset()
 
     def reset(self):
         self.total_trades = 0
         self.profitable_trades = 0
-        self.total_profit_sol = 0.0
-        self.profit_rates = []
-        self.trade_debug_records = []
+        self.total_profit_sol = ExactSum()
+        self.profit_rate_sum = ExactSum()
+        # 卖出原因 -> {'count', 'profit', 'loss'}
+        self.sell_signal_stats = {}
+        # debug字段名 -> BucketHistogram（首次出现时按当前配置的分桶边界创建）
+        self.histograms = {}
+        # mint名 -> [交易数, 盈利交易数, profit_rate之和, profit_sol之和]，用于按mint重采样
+        self.mint_stats = {}
+
+    def _get_histogram(self, field_name):
+        hist = self.histograms.get(field_name)
+        if hist is None:
+            buckets = BUY_CONDITIONS_CONFIG.get(self.FIELD_BUCKETS_KEYS[field_name], [])
+            hist = BucketHistogram(buckets, upper=INF_REPLACEMENT)
+            self.histograms[field_name] = hist
+        return hist
 
     def collect_from_trades(self, trades):
         for trade in trades:
             self.total_trades += 1
             profit_rate = trade.get('profit_rate', 0.0)
-            self.profit_rates.append(profit_rate)
+            self.profit_rate_sum.add(profit_rate)
             is_profitable = trade.get('is_profitable', False)
             if is_profitable:
                 self.profitable_trades += 1
 
+            sell_reason = trade.get('sell_reason')
+            if sell_reason is not None:
+                reason_stats = self.sell_signal_stats.setdefault(sell_reason, {'count': 0, 'profit': 0, 'loss': 0})
+                reason_stats['count'] += 1
+                reason_stats['profit' if is_profitable else 'loss'] += 1
+
             # 计算盈利金额
             profit_sol = trade.get('profit_sol', None)
-            if profit_sol is not None:
-                self.total_profit_sol += profit_sol
-            else:
+            if profit_sol is None:
                 buy_amount = trade.get('buy_amount', None) or trade.get('tradeamount', None) or trade.get('amount', None)
                 if buy_amount and float(buy_amount) > 0:
-                    self.total_profit_sol += profit_rate * float(buy_amount)
+                    profit_sol = profit_rate * float(buy_amount)
                 else:
                     amount_min, amount_max = BUY_CONDITIONS_CONFIG.get('TRADE_AMOUNT_RANGE', (0.3, 2.0))
                     approx_amount = (amount_min + amount_max) / 2
-                    self.total_profit_sol += profit_rate * approx_amount
-
-            # 收集debug快照数据
-            debug_record = {'profit_rate': profit_rate, 'is_profitable': is_profitable}
-            for field in ['time_diff', 'is_max_amount', 'price_volatility', 'time_volatility',
-                          'amount_volatility', 'price_ratio', 'buy_count', 'sell_count',
-                          'large_trade_ratio', 'small_trade_ratio', 'consecutive_buy', 'consecutive_sell']:
-                if field in trade:
-                    debug_record[field] = trade[field]
-            self.trade_debug_records.append(debug_record)
-
-    def get_summary(self):
-        win_rate = self.profitable_trades / self.total_trades if self.total_trades > 0 else 0.0
-        avg_profit_rate = sum(self.profit_rates) / len(self.profit_rates) if self.profit_rates else 0.0
+                    profit_sol = profit_rate * approx_amount
+            self.total_profit_sol.add(profit_sol)
+
+            mint_stats = self.mint_stats.setdefault(trade.get('mint_name'), [0, 0, 0.0, 0.0])
+            mint_stats[0] += 1
+            mint_stats[1] += 1 if is_profitable else 0
+            mint_stats[2] += profit_rate
+            mint_stats[3] += profit_sol
+
+            # 单遍累加debug分桶统计，不保留原始值
+            for field in self.FIELD_BUCKETS_KEYS:
+                val = trade.get(field)
+                if val is not None:
+                    self._get_histogram(field).add(val, is_profitable, profit_rate)
+
+    def debug_record_count(self, field_name):
+        """含指定debug字段的交易数"""
+        hist = self.histograms.get(field_name)
+        return hist.total if hist is not None else 0
+
+    def to_dict(self):
+        """序列化为可JSON/pickle的字典"""
         return {
+            'total_trades': self.total_trades,
+            'profitable_trades': self.profitable_trades,
+            'total_profit_sol': self.total_profit_sol.to_dict(),
+            'profit_rate_sum': self.profit_rate_sum.to_dict(),
+            'sell_signal_stats': copy.deepcopy(self.sell_signal_stats),
+            'histograms': {field: hist.to_dict() for field, hist in self.histograms.items()},
+            'mint_stats': copy.deepcopy(self.mint_stats),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        collector = cls()
+        collector.total_trades = data['total_trades']
+        collector.profitable_trades = data['profitable_trades']
+        collector.total_profit_sol = ExactSum.from_dict(data['total_profit_sol'])
+        collector.profit_rate_sum = ExactSum.from_dict(data['profit_rate_sum'])
+        collector.sell_signal_stats = copy.deepcopy(data['sell_signal_stats'])
+        collector.histograms = {field: BucketHistogram.from_dict(h) for field, h in data['histograms'].items()}
+        collector.mint_stats = copy.deepcopy(data['mint_stats'])
+        return collector
+
+    def merge(self, other):
+        """合并另一个收集器（或其 to_dict 结果）的统计，返回 self"""
+        if isinstance(other, dict):
+            other = BacktestResultCollector.from_dict(other)
+        self.total_trades += other.total_trades
+        self.profitable_trades += other.profitable_trades
+        self.total_profit_sol.merge(other.total_profit_sol)
+        self.profit_rate_sum.merge(other.profit_rate_sum)
+        merge_sell_signal_stats(self.sell_signal_stats, other.sell_signal_stats)
+        for field, hist in other.histograms.items():
+            if field in self.histograms:
+                self.histograms[field].merge(hist)
+            else:
+                self.histograms[field] = BucketHistogram.from_dict(hist.to_dict())
+        for mint_name, stats in other.mint_stats.items():
+            target = self.mint_stats.setdefault(mint_name, [0, 0, 0.0, 0.0])
+            for k in range(4):
+                target[k] += stats[k]
+        return self
+
+    def get_summary(self, confidence_intervals=None):
+        """汇总统计; confidence_intervals 为 None 时按 BOOTSTRAP_CONFIG['ENABLED'] 决定是否附带置信区间"""
+        win_rate = self.profitable_trades / self.total_trades if self.total_trades > 0 else 0.0
+        avg_profit_rate = self.profit_rate_sum.value / self.total_trades if self.total_trades > 0 else 0.0
+        summary = {
             'total_trades': self.total_trades,
             'profitable_trades': self.profitable_trades,
             'win_rate': win_rate,
-            'total_profit_sol': self.total_profit_sol,
+            'total_profit_sol': self.total_profit_sol.value,
             'avg_profit_rate': avg_profit_rate,
         }
+        if confidence_intervals is None:
+            confidence_intervals = BOOTSTRAP_CONFIG['ENABLED']
+        if confidence_intervals:
+            # 按mint名排序，使分片合并与顺序执行得到相同的重采样结果
+            mint_stats = [(n, wins, rate_sum, n, sol_sum) for _, (n, wins, rate_sum, sol_sum)
+                          in sorted(self.mint_stats.items(), key=lambda item: str(item[0]))]
+            summary['confidence_intervals'] = bootstrap_confidence_intervals(
+                mint_stats, BOOTSTRAP_CONFIG['RESAMPLES'], BOOTSTRAP_CONFIG['CONFIDENCE'], BOOTSTRAP_CONFIG['SEED'])
+        return summary
 
     def get_debug_snapshot(self):
         """获取debug模式的分桶统计快照"""
@@ -682,29 +635,22 @@ class BacktestResultCollector:
             if buckets_key is None:
                 continue
 
-            buckets = config.get(buckets_key, [])
             field_name = self._condition_to_field(cond_name)
             if not field_name:
                 continue
 
-            values_with_profit = []
-            for rec in self.trade_debug_records:
-                val = rec.get(field_name)
-                if val is not None:
-                    values_with_profit.append((val, rec['profit_rate'], rec['is_profitable']))
-
-            if not values_with_profit:
+            hist = self.histograms.get(field_name)
+            if hist is None or hist.total == 0:
                 continue
 
-            bucket_stats = self._compute_bucket_stats(values_with_profit, buckets)
             snapshot[cond_name] = {
                 'mode_key': mode_key,
                 'range_key': range_key,
                 'buckets_key': buckets_key,
-                'buckets': buckets,
+                'buckets': hist.edges,
                 'field_name': field_name,
-                'total_records': len(values_with_profit),
-                'bucket_stats': bucket_stats,
+                'total_records': hist.total,
+                'bucket_stats': hist.to_bucket_stats(),
             }
         return snapshot
 
@@ -719,29 +665,6 @@ class BacktestResultCollector:
         }
         return mapping.get(cond_name)
 
-    def _compute_bucket_stats(self, values_with_profit, buckets):
-        bucket_stats = []
-        # Use 1e9 instead of float('inf') to ensure valid JSON output (Infinity is not valid JSON)
-        INF_REPLACEMENT = 1e9
-        for i in range(len(buckets)):
-            low = buckets[i]
-            high = buckets[i + 1] if i + 1 < len(buckets) else INF_REPLACEMENT
-            bucket_name = f"[{low}, {high})" if high != INF_REPLACEMENT else f"[{low}, +∞)"
-
-            in_bucket = [(v, pr, ip) for v, pr, ip in values_with_profit if low <= v < high]
-            count = len(in_bucket)
-            if count == 0:
-                bucket_stats.append({'name': bucket_name, 'low': low, 'high': high,
-                    'count': 0, 'profitable': 0, 'avg_profit_rate': 0.0, 'win_rate': 0.0})
-                continue
-
-            profitable_count = sum(1 for _, _, ip in in_bucket if ip)
-            avg_pr = sum(pr for _, pr, _ in in_bucket) / count
-            wr = profitable_count / count
-            bucket_stats.append({'name': bucket_name, 'low': low, 'high': high,
-                'count': count, 'profitable': profitable_count, 'avg_profit_rate': avg_pr, 'win_rate': wr})
-        return bucket_stats
-
 
 # =============================================================================
 # 全局对象
@@ -750,6 +673,97 @@ result_collector = BacktestResultCollector()
 original_backtest_mint = pump.backtest_mint
 
 
+def compute_debug_fields(trade_data, buy_trigger_index):
+    """通过 buy_trigger_index 计算所有debug指标，返回 {字段名: 值}"""
+    fields = {}
+    try:
+        rec = trade_data[buy_trigger_index]
+        tradetime = int(rec.get('tradetime', 0))
+        abs_amount = abs(float(rec.get('tradeamount', 0)))
+    except (IndexError, TypeError, ValueError):
+        return fields
+
+    # time_diff
+    if buy_trigger_index > 0:
+        try:
+            prev_tradetime = int(trade_data[buy_trigger_index - 1].get('tradetime', 0))
+            fields['time_diff'] = tradetime - prev_tradetime
+        except (TypeError, ValueError):
+            pass
+
+    # 波动率 (price, time, amount)
+    try:
+        pv, tv, av = get_recent_trades_volatility(trade_data, buy_trigger_index,
+                        BUY_CONDITIONS_CONFIG['VOLATILITY_LOOKBACK_COUNT'],
+                        BUY_CONDITIONS_CONFIG['VOLATILITY_MIN_AMOUNT'], 'all')
+        if pv is not None:
+            fields['price_volatility'] = pv
+        if tv is not None:
+            fields['time_volatility'] = tv
+        if av is not None:
+            fields['amount_volatility'] = av
+    except Exception:
+        pass
+
+    # is_max_amount
+    try:
+        is_max = is_max_amount_in_recent_trades(trade_data, buy_trigger_index, abs_amount,
+                    BUY_CONDITIONS_CONFIG['MAX_AMOUNT_MIN_THRESHOLD'],
+                    BUY_CONDITIONS_CONFIG['MAX_AMOUNT_LOOKBACK_COUNT'])
+        fields['is_max_amount'] = 1.0 if is_max else 0.0
+    except Exception:
+        pass
+
+    # price_ratio
+    try:
+        current_price = float(rec.get('price', 0))
+        if current_price > 0:
+            pr = get_price_ratio_to_min(trade_data, buy_trigger_index, current_price,
+                    BUY_CONDITIONS_CONFIG['PRICE_RATIO_LOOKBACK_COUNT'])
+            if pr is not None:
+                fields['price_ratio'] = pr
+    except Exception:
+        pass
+
+    # buy_count, sell_count (与online过滤一致，分别使用各自的lookback)
+    try:
+        bc, _ = get_buy_sell_count(trade_data, buy_trigger_index,
+                    BUY_CONDITIONS_CONFIG['BUY_COUNT_LOOKBACK_COUNT'])
+        _, sc = get_buy_sell_count(trade_data, buy_trigger_index,
+                    BUY_CONDITIONS_CONFIG['SELL_COUNT_LOOKBACK_COUNT'])
+        fields['buy_count'] = bc
+        fields['sell_count'] = sc
+    except Exception:
+        pass
+
+    # large_trade_ratio, small_trade_ratio (与online过滤一致，分别使用各自的lookback)
+    try:
+        lr, _ = get_large_small_trade_ratio(trade_data, buy_trigger_index,
+                    BUY_CONDITIONS_CONFIG['LARGE_TRADE_RATIO_LOOKBACK'],
+                    BUY_CONDITIONS_CONFIG['LARGE_TRADE_THRESHOLD'],
+                    BUY_CONDITIONS_CONFIG['SMALL_TRADE_THRESHOLD'])
+        _, sr = get_large_small_trade_ratio(trade_data, buy_trigger_index,
+                    BUY_CONDITIONS_CONFIG['SMALL_TRADE_RATIO_LOOKBACK'],
+                    BUY_CONDITIONS_CONFIG['LARGE_TRADE_THRESHOLD'],
+                    BUY_CONDITIONS_CONFIG['SMALL_TRADE_THRESHOLD'])
+        fields['large_trade_ratio'] = lr
+        fields['small_trade_ratio'] = sr
+    except Exception:
+        pass
+
+    # consecutive_buy, consecutive_sell
+    try:
+        cb, cs_val = get_consecutive_buy_sell_count(trade_data, buy_trigger_index,
+                    BUY_CONDITIONS_CONFIG['CONSECUTIVE_BUY_THRESHOLD'],
+                    BUY_CONDITIONS_CONFIG['CONSECUTIVE_SELL_THRESHOLD'])
+        fields['consecutive_buy'] = cb
+        fields['consecutive_sell'] = cs_val
+    except Exception:
+        pass
+
+    return fields
+
+
 def wrapped_backtest_mint(mint_name, mint_data):
     """包装的回测函数，在每笔交易上通过 buy_trigger_index 重新计算debug指标"""
     trades = original_backtest_mint(mint_name, mint_data)
@@ -758,91 +772,8 @@ def wrapped_backtest_mint(mint_name, mint_data):
     
     for trade in trades:
         buy_trigger_index = trade.get('buy_trigger_index', None)
-        if buy_trigger_index is None:
-            result_collector.collect_from_trades([trade])
-            continue
-        
-        # 通过 buy_trigger_index 重新计算所有debug指标并注入到trade中
-        try:
-            rec = trade_data[buy_trigger_index]
-            tradetime = int(rec.get('tradetime', 0))
-            abs_amount = abs(float(rec.get('tradeamount', 0)))
-        except (IndexError, TypeError, ValueError):
-            result_collector.collect_from_trades([trade])
-            continue
-        
-        # time_diff
-        if buy_trigger_index > 0:
-            try:
-                prev_tradetime = int(trade_data[buy_trigger_index - 1].get('tradetime', 0))
-                trade['time_diff'] = tradetime - prev_tradetime
-            except (TypeError, ValueError):
-                pass
-        
-        # 波动率 (price, time, amount)
-        try:
-            pv, tv, av = get_recent_trades_volatility(trade_data, buy_trigger_index,
-                            BUY_CONDITIONS_CONFIG['VOLATILITY_LOOKBACK_COUNT'],
-                            BUY_CONDITIONS_CONFIG['VOLATILITY_MIN_AMOUNT'], 'all')
-            if pv is not None:
-                trade['price_volatility'] = pv
-            if tv is not None:
-                trade['time_volatility'] = tv
-            if av is not None:
-                trade['amount_volatility'] = av
-        except Exception:
-            pass
-        
-        # is_max_amount
-        try:
-            is_max = is_max_amount_in_recent_trades(trade_data, buy_trigger_index, abs_amount,
-                        BUY_CONDITIONS_CONFIG['MAX_AMOUNT_MIN_THRESHOLD'],
-                        BUY_CONDITIONS_CONFIG['MAX_AMOUNT_LOOKBACK_COUNT'])
-            trade['is_max_amount'] = 1.0 if is_max else 0.0
-        except Exception:
-            pass
-        
-        # price_ratio
-        try:
-            current_price = float(rec.get('price', 0))
-            if current_price > 0:
-                pr = get_price_ratio_to_min(trade_data, buy_trigger_index, current_price,
-                        BUY_CONDITIONS_CONFIG['PRICE_RATIO_LOOKBACK_COUNT'])
-                if pr is not None:
-                    trade['price_ratio'] = pr
-        except Exception:
-            pass
-        
-        # buy_count, sell_count
-        try:
-            bc, sc = get_buy_sell_count(trade_data, buy_trigger_index,
-                        BUY_CONDITIONS_CONFIG['BUY_COUNT_LOOKBACK_COUNT'])
-            trade['buy_count'] = bc
-            trade['sell_count'] = sc
-        except Exception:
-            pass
-        
-        # large_trade_ratio, small_trade_ratio
-        try:
-            lr, sr = get_large_small_trade_ratio(trade_data, buy_trigger_index,
-                        BUY_CONDITIONS_CONFIG['LARGE_TRADE_RATIO_LOOKBACK'],
-                        BUY_CONDITIONS_CONFIG['LARGE_TRADE_THRESHOLD'],
-                        BUY_CONDITIONS_CONFIG['SMALL_TRADE_THRESHOLD'])
-            trade['large_trade_ratio'] = lr
-            trade['small_trade_ratio'] = sr
-        except Exception:
-            pass
-        
-        # consecutive_buy, consecutive_sell
-        try:
-            cb, cs_val = get_consecutive_buy_sell_count(trade_data, buy_trigger_index,
-                        BUY_CONDITIONS_CONFIG['CONSECUTIVE_BUY_THRESHOLD'],
-                        BUY_CONDITIONS_CONFIG['CONSECUTIVE_SELL_THRESHOLD'])
-            trade['consecutive_buy'] = cb
-            trade['consecutive_sell'] = cs_val
-        except Exception:
-            pass
-        
+        if buy_trigger_index is not None:
+            trade.update(compute_debug_fields(trade_data, buy_trigger_index))
         result_collector.collect_from_trades([trade])
     
     return trades
@@ -855,6 +786,7 @@ pump.backtest_mint = wrapped_backtest_mint
 # 参数组合生成与辅助函数
 # =============================================================================
 def generate_param_combinations():
+    """搜索空间的完整笛卡尔积（仅适用于全部为类别参数的空间）"""
     keys = list(PARAM_SEARCH_SPACE.keys())
     values = list(PARAM_SEARCH_SPACE.values())
     combinations = list(itertools.product(*values))
@@ -878,7 +810,7 @@ def format_params(params):
 def run_single_backtest(params, log_file, silent=True):
     """执行单次回测，返回结果和debug快照"""
     global BUY_CONDITIONS_CONFIG
-    config = build_config(params)
+    config = apply_auto_buckets(build_config(params), log_file)
     BUY_CONDITIONS_CONFIG = config
     result_collector.reset()
 
@@ -893,13 +825,21 @@ def run_single_backtest(params, log_file, silent=True):
     debug_snapshot = result_collector.get_debug_snapshot()
     
     # 诊断: 检查debug数据是否注入成功
-    total_with_debug = sum(1 for rec in result_collector.trade_debug_records if 'time_diff' in rec)
+    total_with_debug = result_collector.debug_record_count('time_diff')
     if summary['total_trades'] > 0 and total_with_debug == 0:
         print(f"    ⚠️ 诊断: {summary['total_trades']}笔交易, 但0笔含debug数据 (注入可能失败)")
     
     return {'params': params, 'config': config, 'summary': summary, 'debug_snapshot': debug_snapshot}
 
 
+def rank_value(summary, key):
+    """排序用的统计值: BOOTSTRAP_CONFIG['RANK_BY_LOWER_BOUND'] 且有置信区间时取区间下界"""
+    intervals = summary.get('confidence_intervals')
+    if BOOTSTRAP_CONFIG['RANK_BY_LOWER_BOUND'] and intervals and key in intervals:
+        return intervals[key][0]
+    return summary[key]
+
+
 def meets_full_criteria(summary):
     return (summary['profitable_trades'] >= FILTER_THRESHOLDS['MIN_PROFITABLE_TRADES'] and
             summary['total_profit_sol'] >= FILTER_THRESHOLDS['MIN_TOTAL_PROFIT_SOL'] and
@@ -956,11 +896,14 @@ def extract_profitable_range_from_snapshot(snapshot, condition_order):
 
 
 def run_backtests_concurrent(param_list, log_file, max_workers=None):
-    """Run run_single_backtest over param_list in parallel and return list of results."""
+    """Run run_single_backtest over param_list in parallel and return list of results.
+
+    每组参数在独立进程中回测: 配置与结果收集器都是模块级全局对象，线程间共享会互相覆盖。
+    """
     if max_workers is None:
-        max_workers = min(8, (multiprocessing.cpu_count() or 2) * 2)
+        max_workers = min(8, multiprocessing.cpu_count() or 2)
     results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as ex:
         futures = {ex.submit(run_single_backtest, p, log_file, True): p for p in param_list}
         for fut in concurrent.futures.as_completed(futures):
             try:
@@ -971,6 +914,968 @@ def run_backtests_concurrent(param_list, log_file, max_workers=None):
     return results
 
 
+def _sketch_shard(params, log_file, mint_names):
+    """子进程: 构建分片内候选集的特征分位数草图，返回序列化结果"""
+    mint_info = load_mint_info_cached(log_file)
+    candidates = build_candidates(build_config(params), [(name, mint_info[name]) for name in mint_names])
+    return {field: sketch.to_dict() for field, sketch in build_feature_sketches(candidates).items()}
+
+
+def _backtest_shard(params, log_file, mint_names):
+    """子进程: 只回测分片内的mint，返回结果收集器的序列化部分结果"""
+    global BUY_CONDITIONS_CONFIG
+    BUY_CONDITIONS_CONFIG = build_config(params)
+    result_collector.reset()
+    mint_info = load_mint_info_cached(log_file)
+    for mint_name in mint_names:
+        try:
+            pump.backtest_mint(mint_name, mint_info[mint_name])
+        except Exception as e:
+            print(f"处理mint {mint_name} 时出错: {e}")
+    return result_collector.to_dict()
+
+
+def run_single_backtest_sharded(params, log_file, num_shards=None):
+    """按mint分片在进程池中执行单次回测，合并各分片的部分结果，结果与 run_single_backtest 一致"""
+    global BUY_CONDITIONS_CONFIG
+    if num_shards is None:
+        num_shards = min(8, multiprocessing.cpu_count() or 2)
+    config = build_config(params)
+    mint_names = list(load_mint_info_cached(log_file).keys())
+    shard_size = (len(mint_names) + num_shards - 1) // num_shards if mint_names else 0
+    shards = [mint_names[i:i + shard_size] for i in range(0, len(mint_names), shard_size)] if shard_size else []
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, len(shards))) as ex:
+        shard_params = params
+        if config.get('AUTO_BUCKETS_ENABLED'):
+            # 先合并各分片的特征草图得到全局分桶，再用同一组分桶回测
+            sketches = {}
+            for partial in ex.map(_sketch_shard, [params] * len(shards), [log_file] * len(shards), shards):
+                for field, data in partial.items():
+                    sketch = QuantileSketch.from_dict(data)
+                    if field in sketches:
+                        sketches[field].merge(sketch)
+                    else:
+                        sketches[field] = sketch
+            bucket_config = sketches_to_bucket_config(sketches, config.get('AUTO_BUCKET_COUNT', 10))
+            config.update(bucket_config)
+            shard_params = dict(params, AUTO_BUCKETS_ENABLED=False, **bucket_config)
+
+        BUY_CONDITIONS_CONFIG = config
+        result_collector.reset()
+        for partial in ex.map(_backtest_shard, [shard_params] * len(shards), [log_file] * len(shards), shards):
+            result_collector.merge(partial)
+
+    summary = result_collector.get_summary()
+    debug_snapshot = result_collector.get_debug_snapshot()
+    return {'params': params, 'config': config, 'summary': summary, 'debug_snapshot': debug_snapshot}
+
+
+# =============================================================================
+# 增量回测: 收紧online范围时复用上一轮的候选集与特征值
+# =============================================================================
+# 可增量重新过滤的条件: 条件名 -> (debug字段名, mode_key)
+REFINABLE_CONDITIONS = {
+    'TIME_DIFF': ('time_diff', 'TIME_DIFF_CHECK_MODE'),
+    'MAX_AMOUNT': ('is_max_amount', 'MAX_AMOUNT_CHECK_MODE'),
+    'PRICE_VOLATILITY': ('price_volatility', 'PRICE_VOLATILITY_CHECK_MODE'),
+    'TIME_VOLATILITY': ('time_volatility', 'TIME_VOLATILITY_CHECK_MODE'),
+    'AMOUNT_VOLATILITY': ('amount_volatility', 'AMOUNT_VOLATILITY_CHECK_MODE'),
+    'PRICE_RATIO': ('price_ratio', 'PRICE_RATIO_CHECK_MODE'),
+    'BUY_COUNT': ('buy_count', 'BUY_COUNT_CHECK_MODE'),
+    'SELL_COUNT': ('sell_count', 'SELL_COUNT_CHECK_MODE'),
+    'LARGE_TRADE_RATIO': ('large_trade_ratio', 'LARGE_TRADE_RATIO_CHECK_MODE'),
+    'SMALL_TRADE_RATIO': ('small_trade_ratio', 'SMALL_TRADE_RATIO_CHECK_MODE'),
+    'CONSECUTIVE_BUY': ('consecutive_buy', 'CONSECUTIVE_BUY_CHECK_MODE'),
+    'CONSECUTIVE_SELL': ('consecutive_sell', 'CONSECUTIVE_SELL_CHECK_MODE'),
+}
+
+# 可增量条件在online模式下使用的阈值参数（不参与候选集缓存的key）
+REFINABLE_THRESHOLD_KEYS = [
+    'TIME_DIFF_FROM_LAST_TRADE_RANGE', 'PRICE_VOLATILITY_RANGE', 'TIME_VOLATILITY_RANGE',
+    'AMOUNT_VOLATILITY_RANGE', 'PRICE_RATIO_RANGE', 'BUY_COUNT_MIN', 'SELL_COUNT_MIN',
+    'LARGE_TRADE_RATIO_RANGE', 'SMALL_TRADE_RATIO_RANGE', 'CONSECUTIVE_BUY_MIN', 'CONSECUTIVE_SELL_MAX',
+]
+
+CANDIDATE_CACHE_MAX_ENTRIES = 8  # 最多缓存的基础条件组合数
+
+
+def passes_online_condition(cond_name, value, config):
+    """按 variant_find_buy_signal 中online模式的语义判断单个条件是否通过"""
+    if cond_name == 'TIME_DIFF':
+        td_min, td_max = config['TIME_DIFF_FROM_LAST_TRADE_RANGE']
+        return value is not None and td_min <= value <= td_max
+    if cond_name == 'MAX_AMOUNT':
+        return bool(value)
+    if cond_name in ('PRICE_VOLATILITY', 'TIME_VOLATILITY', 'AMOUNT_VOLATILITY'):
+        v_min, v_max = config[cond_name + '_RANGE']
+        return value is not None and v_min <= value <= v_max
+    if cond_name == 'PRICE_RATIO':
+        # 数据不足时不过滤
+        if value is None:
+            return True
+        r_min, r_max = config['PRICE_RATIO_RANGE']
+        return r_min <= value <= r_max
+    if cond_name == 'BUY_COUNT':
+        return value is not None and value >= config['BUY_COUNT_MIN']
+    if cond_name == 'SELL_COUNT':
+        return value is not None and value >= config['SELL_COUNT_MIN']
+    if cond_name in ('LARGE_TRADE_RATIO', 'SMALL_TRADE_RATIO'):
+        r_min, r_max = config[cond_name + '_RANGE']
+        return value is not None and r_min <= value <= r_max
+    if cond_name == 'CONSECUTIVE_BUY':
+        return value is not None and value >= config['CONSECUTIVE_BUY_MIN']
+    if cond_name == 'CONSECUTIVE_SELL':
+        return value is not None and value <= config['CONSECUTIVE_SELL_MAX']
+    return True
+
+
+def relax_config(config):
+    """把所有可增量条件从online降为debug，得到只含基础条件的配置"""
+    relaxed = dict(config)
+    for _, mode_key in REFINABLE_CONDITIONS.values():
+        if relaxed.get(mode_key) == 'online':
+            relaxed[mode_key] = 'debug'
+    return relaxed
+
+
+def _candidate_cache_key(config, log_file, mint_names=None):
+    # 分桶边界不影响候选集；mint子集（walk-forward窗口）单独成键
+    key_config = {k: v for k, v in config.items()
+                  if k not in REFINABLE_THRESHOLD_KEYS and not k.endswith('_BUCKETS') and not k.startswith('AUTO_BUCKET')}
+    for _, mode_key in REFINABLE_CONDITIONS.values():
+        key_config.pop(mode_key, None)
+    names = sorted(mint_names) if mint_names is not None else None
+    return json.dumps([log_file, key_config, names], sort_keys=True, default=str)
+
+
+def _outcome_cache_key():
+    return json.dumps([SELL_CONDITIONS_CONFIG, STRATEGY_CONFIG], sort_keys=True, default=str)
+
+
+_mint_info_cache = {}
+_forward_index_cache = {}  # mint_name -> ForwardIndex，随mint日志一起失效
+
+
+def load_mint_info_cached(log_file):
+    """加载mint日志，按 (路径, 修改时间) 缓存，避免每次回测都重新解析"""
+    try:
+        mtime = os.path.getmtime(log_file)
+    except OSError:
+        mtime = None
+    cached = _mint_info_cache.get(log_file)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    mint_info = pump.load_mint_info(log_file)
+    _mint_info_cache.clear()
+    _forward_index_cache.clear()
+    # 逐索引结果表按mint名缓存，换日志后同名mint的交易序列不同
+    candidate_cache.outcome_table.clear()
+    _mint_info_cache[log_file] = (mtime, mint_info)
+    return mint_info
+
+
+def build_candidates(config, mint_items):
+    """在基础条件（可增量条件降为debug）下评估每个交易索引，返回 {mint_name: [(index, debug字段), ...]}"""
+    global BUY_CONDITIONS_CONFIG
+    previous_config = BUY_CONDITIONS_CONFIG
+    BUY_CONDITIONS_CONFIG = relax_config(config)
+    try:
+        candidates = {}
+        for mint_name, mint_data in mint_items:
+            trade_data = mint_data.get('trade_data', [])
+            mint_candidates = []
+            if len(trade_data) >= 20:
+                creation_time = trade_data[0]['tradetime']
+                for i in range(1, len(trade_data)):
+                    if variant_find_buy_signal(trade_data, i, creation_time) is not None:
+                        mint_candidates.append((i, compute_debug_fields(trade_data, i)))
+            candidates[mint_name] = mint_candidates
+    finally:
+        BUY_CONDITIONS_CONFIG = previous_config
+    return candidates
+
+
+class OutcomeTable:
+    """逐索引入场结果表
+
+    对固定的卖出配置与买卖延迟（SELL_CONDITIONS_CONFIG + STRATEGY_CONFIG），按mint列式保存
+    每个交易索引作为买入信号时的入场结果: 实际卖出索引、卖出原因、profit_rate、profit_sol、是否盈利。
+    列在mint首次被访问时按交易数分配，某个索引的结果在首次查询时才模拟并填入（只算候选用到的索引）；
+    配置变化时整表失效。
+    任意买入过滤组合都只需给出入场候选索引，再按 last_sell_index 顺序扫描，不再运行卖出循环。
+    """
+
+    def __init__(self):
+        self.config_key = None
+        self.mints = {}  # mint_name -> 列式结果
+        self.reasons = []  # 卖出原因编码 -> 原因
+        self.reason_codes = {}
+
+    def _reason_code(self, reason):
+        code = self.reason_codes.get(reason)
+        if code is None:
+            code = len(self.reasons)
+            self.reasons.append(reason)
+            self.reason_codes[reason] = code
+        return code
+
+    def _new_mint(self, trade_data):
+        # reason 为 -1 表示该索引尚未模拟
+        n = len(trade_data)
+        return {'exit_index': array('l', [-1]) * n, 'reason': array('l', [-1]) * n,
+                'profit_rate': array('d', [0.0]) * n, 'profit_sol': array('d', [0.0]) * n,
+                'profitable': bytearray(n)}
+
+    def get_mint(self, mint_name, trade_data):
+        """返回该mint的列式结果（卖出配置变化时整表失效；未查询过的索引尚未填入）"""
+        config_key = _outcome_cache_key()
+        if config_key != self.config_key:
+            self.mints = {}
+            self.config_key = config_key
+        columns = self.mints.get(mint_name)
+        if columns is None:
+            columns = self._new_mint(trade_data)
+            self.mints[mint_name] = columns
+        return columns
+
+    def _fill(self, columns, mint_name, trade_data, index):
+        """确保该索引的入场结果已模拟并写入列"""
+        if columns['reason'][index] >= 0:
+            return
+        record = pump.simulate_entry(mint_name, trade_data, index)
+        columns['exit_index'][index] = record['actual_sell_index']
+        columns['reason'][index] = self._reason_code(record['sell_reason'])
+        columns['profit_rate'][index] = record['profit_rate']
+        columns['profit_sol'][index] = record['profit_sol']
+        columns['profitable'][index] = 1 if record['is_profitable'] else 0
+
+    def get(self, mint_name, trade_data, index):
+        """返回从该索引入场的交易记录（只含结果收集器需要的字段）"""
+        columns = self.get_mint(mint_name, trade_data)
+        self._fill(columns, mint_name, trade_data, index)
+        return {
+            'mint_name': mint_name,
+            'buy_trigger_index': index,
+            'actual_sell_index': columns['exit_index'][index],
+            'sell_reason': self.reasons[columns['reason'][index]],
+            'profit_sol': columns['profit_sol'][index],
+            'profit_rate': columns['profit_rate'][index],
+            'is_profitable': bool(columns['profitable'][index]),
+        }
+
+    def sequential_entries(self, mint_name, trade_data, entry_indices):
+        """按 last_sell_index 顺序扫描升序的入场候选索引，返回实际入场的索引（只模拟实际入场的索引）"""
+        columns = self.get_mint(mint_name, trade_data)
+        exit_index = columns['exit_index']
+        taken = []
+        last_sell_index = -1
+        for index in entry_indices:
+            if index <= last_sell_index:
+                continue
+            self._fill(columns, mint_name, trade_data, index)
+            taken.append(index)
+            last_sell_index = exit_index[index]
+        return taken
+
+    def clear(self):
+        self.config_key = None
+        self.mints = {}
+
+
+class CandidateCache:
+    """候选集缓存
+
+    对一组基础条件（所有可增量条件降为debug），预先在每个mint的每个交易索引上评估买入信号，
+    保存满足条件的索引及其debug特征值；入场结果从逐索引结果表 OutcomeTable 查询。
+    收紧online范围时只需重新应用变化的条件并做一次顺序扫描，不再运行卖出循环。
+    """
+
+    def __init__(self, max_entries=CANDIDATE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # cache_key -> {mint_name: [(index, fields), ...]}
+        self.sketches = {}  # cache_key -> {debug字段名: QuantileSketch}
+        self.outcome_table = OutcomeTable()
+
+    def get_candidates(self, config, log_file, mint_info, mint_names=None):
+        """返回基础条件下的候选集，必要时重新构建
+
+        mint_names 不为空时只返回其中的mint: 已缓存整个日志的候选集则直接切出子集，
+        否则只在这些mint上构建；子集按 (日志, 基础条件, mint集合) 单独缓存。
+        """
+        key = _candidate_cache_key(config, log_file, mint_names)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        full = self.entries.get(_candidate_cache_key(config, log_file)) if mint_names is not None else None
+        if full is not None:
+            candidates = {name: full[name] for name in mint_info if name in mint_names}
+        elif mint_names is not None:
+            candidates = build_candidates(config, [(name, info) for name, info in mint_info.items() if name in mint_names])
+        else:
+            candidates = build_candidates(config, mint_info.items())
+        self.entries[key] = candidates
+        while len(self.entries) > self.max_entries:
+            evicted_key, _ = self.entries.popitem(last=False)
+            self.sketches.pop(evicted_key, None)
+        return candidates
+
+    def get_feature_sketches(self, config, log_file, mint_info):
+        """返回候选集上各debug特征的分位数草图（随候选集一起缓存）"""
+        key = _candidate_cache_key(config, log_file)
+        candidates = self.get_candidates(config, log_file, mint_info)
+        sketches = self.sketches.get(key)
+        if sketches is None:
+            sketches = build_feature_sketches(candidates)
+            self.sketches[key] = sketches
+        return sketches
+
+    def get_outcome(self, mint_name, trade_data, index):
+        """返回从该买入信号索引入场的交易记录（卖出配置变化时自动失效）"""
+        return self.outcome_table.get(mint_name, trade_data, index)
+
+    def clear(self):
+        self.entries.clear()
+        self.sketches = {}
+        self.outcome_table.clear()
+
+
+candidate_cache = CandidateCache()
+
+
+# =============================================================================
+# 自动分桶: 候选集特征分位数 -> 等人数分桶边界
+# =============================================================================
+AUTO_BUCKET_SKETCH_ACCURACY = 0.01  # 分位数草图的相对误差
+
+
+def build_feature_sketches(candidates):
+    """单遍扫描候选集，为每个debug特征构建分位数草图"""
+    sketches = {field: QuantileSketch(AUTO_BUCKET_SKETCH_ACCURACY)
+                for field in BacktestResultCollector.FIELD_BUCKETS_KEYS}
+    for mint_candidates in candidates.values():
+        for _, fields in mint_candidates:
+            for field, sketch in sketches.items():
+                sketch.add(fields.get(field))
+    return sketches
+
+
+def sketches_to_bucket_config(sketches, bucket_count):
+    """草图 -> {*_BUCKETS: 等人数分桶边界}，无数据的特征保留原分桶"""
+    bucket_config = {}
+    for field, sketch in sketches.items():
+        edges = sketch.equal_population_edges(bucket_count)
+        if edges:
+            bucket_config[BacktestResultCollector.FIELD_BUCKETS_KEYS[field]] = edges
+    return bucket_config
+
+
+def apply_auto_buckets(config, log_file):
+    """AUTO_BUCKETS_ENABLED 时用候选集特征的分位数分桶替换 config 中的 *_BUCKETS（原地修改）"""
+    if not config.get('AUTO_BUCKETS_ENABLED'):
+        return config
+    mint_info = load_mint_info_cached(log_file)
+    sketches = candidate_cache.get_feature_sketches(config, log_file, mint_info)
+    config.update(sketches_to_bucket_config(sketches, config.get('AUTO_BUCKET_COUNT', 10)))
+    return config
+
+
+def run_single_backtest_incremental(params, log_file, mint_names=None):
+    """增量回测，结果与 run_single_backtest 一致
+
+    复用候选集缓存: 只重新应用online条件得到入场候选，
+    再用逐索引结果表按 last_sell_index 顺序扫描，不运行卖出循环。
+    mint_names 不为空时只在其中的mint上构建（或从整个日志的缓存中切出）候选集。
+    """
+    global BUY_CONDITIONS_CONFIG
+    config = apply_auto_buckets(build_config(params), log_file)
+    mint_info = load_mint_info_cached(log_file)
+    candidates = candidate_cache.get_candidates(config, log_file, mint_info, mint_names)
+
+    BUY_CONDITIONS_CONFIG = config
+    result_collector.reset()
+    online_conditions = [(cond_name, field_name) for cond_name, (field_name, mode_key) in REFINABLE_CONDITIONS.items()
+                         if config.get(mode_key) == 'online']
+
+    outcome_table = candidate_cache.outcome_table
+    for mint_name, mint_candidates in candidates.items():
+        trade_data = mint_info[mint_name]['trade_data']
+        entries = [(index, fields) for index, fields in mint_candidates
+                   if all(passes_online_condition(cond_name, fields.get(field_name), config)
+                          for cond_name, field_name in online_conditions)]
+        if not entries:
+            continue
+        entry_fields = dict(entries)
+        for index in outcome_table.sequential_entries(mint_name, trade_data, [index for index, _ in entries]):
+            trade = outcome_table.get(mint_name, trade_data, index)
+            trade.update(entry_fields[index])
+            result_collector.collect_from_trades([trade])
+
+    summary = result_collector.get_summary()
+    debug_snapshot = result_collector.get_debug_snapshot()
+    return {'params': params, 'config': config, 'summary': summary, 'debug_snapshot': debug_snapshot}
+
+
+# =============================================================================
+# Step4 最优连续分桶区间
+# =============================================================================
+# 最优区间的约束
+STEP4_RANGE_CONSTRAINTS = {
+    'MIN_HIT_COUNT': 300,   # 区间命中数>=300
+    'MIN_WIN_RATE': 0.38,   # 区间胜率>=38%
+}
+
+# 条件在online模式下的阈值形式: 条件名 -> (类型, 阈值key)
+#   range: (min, max) 闭区间；min: value >= MIN，区间必须延伸到最后一个分桶；
+#   max: value <= MAX，区间必须从第一个分桶开始
+CONDITION_ONLINE_SPEC = {
+    'TIME_DIFF': ('range', 'TIME_DIFF_FROM_LAST_TRADE_RANGE'),
+    'PRICE_VOLATILITY': ('range', 'PRICE_VOLATILITY_RANGE'),
+    'TIME_VOLATILITY': ('range', 'TIME_VOLATILITY_RANGE'),
+    'AMOUNT_VOLATILITY': ('range', 'AMOUNT_VOLATILITY_RANGE'),
+    'PRICE_RATIO': ('range', 'PRICE_RATIO_RANGE'),
+    'BUY_COUNT': ('min', 'BUY_COUNT_MIN'),
+    'SELL_COUNT': ('min', 'SELL_COUNT_MIN'),
+    'LARGE_TRADE_RATIO': ('range', 'LARGE_TRADE_RATIO_RANGE'),
+    'SMALL_TRADE_RATIO': ('range', 'SMALL_TRADE_RATIO_RANGE'),
+    'CONSECUTIVE_BUY': ('min', 'CONSECUTIVE_BUY_MIN'),
+    'CONSECUTIVE_SELL': ('max', 'CONSECUTIVE_SELL_MAX'),
+}
+
+
+# 区间类型 -> 连续分桶区间的锚定端（min 型必须延伸到最后一个分桶，max 型必须从第一个分桶开始）
+CONDITION_RANGE_ANCHORS = {'min': 'high', 'max': 'low'}
+
+
+def condition_threshold(kind, low, high):
+    """连续分桶区间 [low, high) -> online阈值"""
+    if kind == 'range':
+        return (low, high)
+    if kind == 'min':
+        return low
+    # 计数型特征: 分桶 [low, high) 内的最大整数
+    return math.ceil(high) - 1
+
+
+def select_condition_range(cond_name, cond_data, constraints=STEP4_RANGE_CONSTRAINTS):
+    """用debug快照中某个条件的分桶统计选出最优连续区间，返回 (区间统计, 阈值key, 阈值) 或 None"""
+    spec = CONDITION_ONLINE_SPEC.get(cond_name)
+    if spec is None:
+        return None
+    kind, threshold_key = spec
+    best = select_best_bucket_range(cond_data['bucket_stats'], constraints['MIN_HIT_COUNT'],
+                                    constraints['MIN_WIN_RATE'], CONDITION_RANGE_ANCHORS.get(kind))
+    if best is None:
+        return None
+    return best, threshold_key, condition_threshold(kind, best['low'], best['high'])
+
+
+def apply_condition_range(params, cond_name, threshold):
+    """返回把某个条件设为online并使用给定阈值的新参数"""
+    _, mode_key = REFINABLE_CONDITIONS[cond_name]
+    _, threshold_key = CONDITION_ONLINE_SPEC[cond_name]
+    new_params = copy.deepcopy(params)
+    new_params[mode_key] = 'online'
+    new_params[threshold_key] = threshold
+    return new_params
+
+
+# =============================================================================
+# 多条件漏斗搜索: 在缓存的候选特征矩阵上做beam search，只对最终候选跑真实回测
+# =============================================================================
+FUNNEL_SEARCH_CONFIG = {
+    'BEAM_WIDTH': 4,          # 每层保留的部分规则集数量
+    'MAX_DEPTH': 4,           # 最多叠加的特征条件数
+    'FINALISTS': 5,           # 用真实顺序回测确认的规则集数量
+    'BASE_CANDIDATES': 3,     # 对Step2中平均盈利率最高的几个基础组合做漏斗搜索
+    'MIN_HIT_COUNT': 300,     # 目标: 命中数>=300
+    'MIN_AVG_PROFIT_RATE': 0.01,  # 目标: 平均盈利率>=1%
+    'MIN_WIN_RATE': 0.38,     # 目标: 胜率>=38%
+    'PAIR_CONDITIONS': True,  # 每层也尝试一次叠加两个条件（在二维交叉表上选联合区间）
+}
+
+
+def build_label_matrix(params, log_file, mint_names=None):
+    """基础条件下的候选特征矩阵与盈亏标签: [(debug字段dict, profit_rate, is_profitable), ...]
+
+    标签为从该候选索引独立入场的卖出结果（不考虑持仓重叠），卖出结果复用候选集缓存。
+    mint_names 不为空时只取其中的mint。
+    """
+    config = build_config(params)
+    mint_info = load_mint_info_cached(log_file)
+    candidates = candidate_cache.get_candidates(config, log_file, mint_info, mint_names)
+    online_conditions = [(cond_name, field_name) for cond_name, (field_name, mode_key) in REFINABLE_CONDITIONS.items()
+                         if config.get(mode_key) == 'online']
+    rows = []
+    for mint_name, mint_candidates in candidates.items():
+        trade_data = mint_info[mint_name]['trade_data']
+        for index, fields in mint_candidates:
+            if not all(passes_online_condition(cond_name, fields.get(field_name), config)
+                       for cond_name, field_name in online_conditions):
+                continue
+            outcome = candidate_cache.get_outcome(mint_name, trade_data, index)
+            rows.append((fields, outcome['profit_rate'], outcome['is_profitable']))
+    return rows
+
+
+def _label_summary(rows):
+    count = len(rows)
+    wins = sum(1 for row in rows if row[2])
+    return {
+        'count': count,
+        'profitable': wins,
+        'win_rate': wins / count if count else 0.0,
+        'avg_profit_rate': math.fsum(row[1] for row in rows) / count if count else 0.0,
+    }
+
+
+def _meets_funnel_target(summary, search_config):
+    return (summary['count'] >= search_config['MIN_HIT_COUNT'] and
+            summary['avg_profit_rate'] >= search_config['MIN_AVG_PROFIT_RATE'] and
+            summary['win_rate'] >= search_config['MIN_WIN_RATE'])
+
+
+def _expand_funnel_state(state, config, search_config):
+    """对一个部分规则集，逐个尝试叠加尚未使用的条件（取当前命中集合上的最优连续区间）"""
+    constraints = {'MIN_HIT_COUNT': search_config['MIN_HIT_COUNT'], 'MIN_WIN_RATE': search_config['MIN_WIN_RATE']}
+    children = []
+    if len(state['conditions']) >= search_config['MAX_DEPTH']:
+        # 叠加条件对的规则集可能提前达到最大条件数
+        return children
+    for cond_name, (_, threshold_key) in CONDITION_ONLINE_SPEC.items():
+        field_name, mode_key = REFINABLE_CONDITIONS[cond_name]
+        if cond_name in state['conditions'] or config.get(mode_key) != 'debug':
+            continue
+        hist = BucketHistogram(config[BacktestResultCollector.FIELD_BUCKETS_KEYS[field_name]], upper=INF_REPLACEMENT)
+        for fields, profit_rate, is_profitable in state['rows']:
+            hist.add(fields.get(field_name), is_profitable, profit_rate)
+        selection = select_condition_range(cond_name, {'bucket_stats': hist.to_bucket_stats()}, constraints)
+        if selection is None:
+            continue
+        _, threshold_key, threshold = selection
+        threshold_config = {threshold_key: threshold}
+        rows = [row for row in state['rows']
+                if passes_online_condition(cond_name, row[0].get(field_name), threshold_config)]
+        if len(rows) == len(state['rows']):
+            # 区间覆盖了全部命中，叠加该条件没有过滤作用
+            continue
+        children.append({
+            'params': apply_condition_range(state['params'], cond_name, threshold),
+            'conditions': state['conditions'] + [cond_name],
+            'thresholds': dict(state['thresholds'], **threshold_config),
+            'rows': rows,
+            'summary': _label_summary(rows),
+        })
+    if search_config.get('PAIR_CONDITIONS') and len(state['conditions']) + 2 <= search_config['MAX_DEPTH']:
+        children.extend(_expand_funnel_state_pairs(state, config, search_config))
+    return children
+
+
+def _expand_funnel_state_pairs(state, config, search_config):
+    """对一个部分规则集，一次叠加两个尚未使用的条件: 单遍构建所有条件对的交叉表，取每对的最优联合区间"""
+    cond_fields = {}
+    for cond_name in CONDITION_ONLINE_SPEC:
+        field_name, mode_key = REFINABLE_CONDITIONS[cond_name]
+        if cond_name not in state['conditions'] and config.get(mode_key) == 'debug':
+            cond_fields[cond_name] = field_name
+    field_conds = {field_name: cond_name for cond_name, field_name in cond_fields.items()}
+    crosstab = PairwiseCrossTab({field_name: config[BacktestResultCollector.FIELD_BUCKETS_KEYS[field_name]]
+                                 for field_name in field_conds}, upper=INF_REPLACEMENT)
+    for fields, profit_rate, is_profitable in state['rows']:
+        crosstab.add(fields, is_profitable, profit_rate)
+
+    children = []
+    for field_a, field_b in crosstab.pairs:
+        cond_a, cond_b = field_conds[field_a], field_conds[field_b]
+        kind_a, threshold_key_a = CONDITION_ONLINE_SPEC[cond_a]
+        kind_b, threshold_key_b = CONDITION_ONLINE_SPEC[cond_b]
+        best = crosstab.select_best_rectangle(field_a, field_b, search_config['MIN_HIT_COUNT'], search_config['MIN_WIN_RATE'],
+                                              CONDITION_RANGE_ANCHORS.get(kind_a), CONDITION_RANGE_ANCHORS.get(kind_b))
+        if best is None:
+            continue
+        threshold_a = condition_threshold(kind_a, best['a']['low'], best['a']['high'])
+        threshold_b = condition_threshold(kind_b, best['b']['low'], best['b']['high'])
+        threshold_config = {threshold_key_a: threshold_a, threshold_key_b: threshold_b}
+        rows = [row for row in state['rows']
+                if passes_online_condition(cond_a, row[0].get(field_a), threshold_config)
+                and passes_online_condition(cond_b, row[0].get(field_b), threshold_config)]
+        if len(rows) == len(state['rows']):
+            continue
+        params = apply_condition_range(apply_condition_range(state['params'], cond_a, threshold_a), cond_b, threshold_b)
+        children.append({
+            'params': params,
+            'conditions': state['conditions'] + [cond_a, cond_b],
+            'thresholds': dict(state['thresholds'], **threshold_config),
+            'rows': rows,
+            'summary': _label_summary(rows),
+        })
+    return children
+
+
+def run_funnel_search(base_params, log_file, search_config=FUNNEL_SEARCH_CONFIG, mint_names=None):
+    """从基础参数出发做多条件漏斗搜索，返回经真实回测确认的结果列表（按平均盈利率降序）
+
+    每一层在候选特征矩阵上为每个部分规则集叠加一个条件的最优区间，按标签估计的平均盈利率
+    保留前 BEAM_WIDTH 个；全部层结束后只对估计最好的 FINALISTS 个规则集跑真实顺序回测。
+    mint_names 不为空时只在这些mint上拟合与回测。
+    分桶边界与真实回测一致（AUTO_BUCKETS_ENABLED 时取候选集特征的分位数分桶）。
+    """
+    config = apply_auto_buckets(build_config(base_params), log_file)
+    rows = build_label_matrix(base_params, log_file, mint_names)
+    root = {'params': copy.deepcopy(base_params), 'conditions': [], 'thresholds': {},
+            'rows': rows, 'summary': _label_summary(rows)}
+    print(f"    候选特征矩阵: {len(rows)} 行, 估计胜率: {root['summary']['win_rate']*100:.1f}%, "
+          f"估计平均盈利率: {root['summary']['avg_profit_rate']*100:.2f}%")
+
+    beam = [root]
+    explored = {}
+    for depth in range(1, search_config['MAX_DEPTH'] + 1):
+        children = []
+        for state in beam:
+            for child in _expand_funnel_state(state, config, search_config):
+                key = json.dumps(sorted(child['thresholds'].items()), default=str)
+                if key not in explored:
+                    explored[key] = child
+                    children.append(child)
+        if not children:
+            break
+        children.sort(key=lambda st: st['summary']['avg_profit_rate'], reverse=True)
+        beam = children[:search_config['BEAM_WIDTH']]
+        best = beam[0]
+        print(f"    第{depth}层: 扩展 {len(children)} 个规则集, 最优 {'+'.join(best['conditions'])} | "
+              f"估计 {best['summary']['count']}笔 胜率: {best['summary']['win_rate']*100:.1f}% "
+              f"平均盈利率: {best['summary']['avg_profit_rate']*100:.2f}%")
+
+    finalists = sorted(explored.values(),
+                       key=lambda st: (_meets_funnel_target(st['summary'], search_config), st['summary']['avg_profit_rate']),
+                       reverse=True)[:search_config['FINALISTS']]
+
+    results = []
+    for state in finalists:
+        result = run_single_backtest_incremental(state['params'], log_file, mint_names)
+        result['optimized_condition'] = '+'.join(state['conditions'])
+        result['optimized_range'] = state['thresholds']
+        result['estimated_summary'] = {k: v for k, v in state['summary'].items()}
+        results.append(result)
+    results.sort(key=lambda r: r['summary']['avg_profit_rate'], reverse=True)
+    return results
+
+
+# =============================================================================
+# 决策树规则归纳: 在候选特征矩阵上拟合浅层回归树，节点即条件区间的合取
+# =============================================================================
+RULE_TREE_CONFIG = {
+    'ENABLED': True,
+    'MAX_DEPTH': 3,              # 规则最多包含的切分数
+    'FINALISTS': 5,              # 用真实顺序回测确认的规则数
+    'MIN_HIT_COUNT': 300,        # 节点命中数>=300（同时是最小叶子大小）
+    'MIN_WIN_RATE': 0.38,
+}
+
+
+def tree_rule_thresholds(bounds):
+    """树规则的 {debug字段: (下界, 上界)} -> [(条件名, 阈值key, online阈值)]; 开放端用 ±INF_REPLACEMENT"""
+    field_conds = {REFINABLE_CONDITIONS[cond_name][0]: cond_name for cond_name in CONDITION_ONLINE_SPEC}
+    thresholds = []
+    for field_name, (low, high) in bounds.items():
+        cond_name = field_conds[field_name]
+        kind, threshold_key = CONDITION_ONLINE_SPEC[cond_name]
+        if kind == 'range':
+            threshold = (-INF_REPLACEMENT if low is None else low, INF_REPLACEMENT if high is None else high)
+        elif kind == 'min':
+            threshold = low
+        else:
+            threshold = high
+        thresholds.append((cond_name, threshold_key, threshold))
+    return thresholds
+
+
+def run_rule_induction(base_params, log_file, tree_config=RULE_TREE_CONFIG, mint_names=None):
+    """在基础参数的候选特征矩阵上归纳规则，返回经真实回测确认的结果列表（按平均盈利率降序）
+
+    每个结果另含 'rule_json_conditions': 每个条件一个区间分桶（统计为该区间在候选矩阵上的边际命中），
+    可直接写入 rule.json 的 conditions。
+    """
+    config = apply_auto_buckets(build_config(base_params), log_file)
+    rows = build_label_matrix(base_params, log_file, mint_names)
+    feature_kinds = {}
+    for cond_name, (kind, _) in CONDITION_ONLINE_SPEC.items():
+        field_name, mode_key = REFINABLE_CONDITIONS[cond_name]
+        if config.get(mode_key) == 'debug':
+            feature_kinds[field_name] = kind
+    rules = fit_rule_tree(rows, feature_kinds, tree_config['MIN_HIT_COUNT'], tree_config['MAX_DEPTH'],
+                          tree_config['MIN_WIN_RATE'])
+    print(f"    候选特征矩阵: {len(rows)} 行, 归纳出 {len(rules)} 条满足约束的规则")
+
+    results = []
+    for rule in rules[:tree_config['FINALISTS']]:
+        params = copy.deepcopy(base_params)
+        threshold_config = {}
+        rule_json_conditions = []
+        for cond_name, threshold_key, threshold in tree_rule_thresholds(rule['bounds']):
+            params = apply_condition_range(params, cond_name, threshold)
+            threshold_config[threshold_key] = threshold
+            field_name = REFINABLE_CONDITIONS[cond_name][0]
+            marginal = _label_summary([row for row in rows
+                                       if passes_online_condition(cond_name, row[0].get(field_name), threshold_config)])
+            low, high = rule['bounds'][field_name]
+            low = -INF_REPLACEMENT if low is None else low
+            high = INF_REPLACEMENT if high is None else high
+            rule_json_conditions.append({'condition': cond_name, 'buckets': [{
+                'name': f"[{low}, {high}]", 'low': low, 'high': high,
+                'count': marginal['count'], 'profitable': marginal['profitable'],
+                'avg_profit_rate': marginal['avg_profit_rate'], 'win_rate': marginal['win_rate'],
+            }]})
+        result = run_single_backtest_incremental(params, log_file, mint_names)
+        result['optimized_condition'] = '+'.join(c['condition'] for c in rule_json_conditions)
+        result['optimized_range'] = threshold_config
+        result['estimated_summary'] = {k: rule[k] for k in ('count', 'profitable', 'win_rate', 'avg_profit_rate')}
+        result['rule_json_conditions'] = rule_json_conditions
+        results.append(result)
+    results.sort(key=lambda r: r['summary']['avg_profit_rate'], reverse=True)
+    return results
+
+
+# =============================================================================
+# Walk-forward验证: 在一个窗口上拟合漏斗规则，在下一个窗口上评估
+# =============================================================================
+WALK_FORWARD_CONFIG = {
+    'ENABLED': False,
+    'LOG_FILES': [],       # 多个按天的日志: 每个日志为一个窗口; 为空时把主日志按mint创建时间切分
+    'NUM_WINDOWS': 4,      # 按创建时间切分的窗口数（每个窗口mint数相同）
+    'MAX_WORKERS': None,   # 并发执行的fold数，None 为 min(8, cpu数)
+}
+
+
+def _mint_creation_time(mint_data):
+    creation_time = mint_data.get('creatertime')
+    if creation_time is None and mint_data.get('trade_data'):
+        creation_time = mint_data['trade_data'][0]['tradetime']
+    return creation_time or 0
+
+
+def build_walk_forward_windows(log_file, wf_config=WALK_FORWARD_CONFIG):
+    """返回按时间先后排列的窗口 [{'log_file', 'mint_names'(None为整个日志), 'start', 'end', 'mint_count'}]"""
+    windows = []
+    if wf_config['LOG_FILES']:
+        for path in wf_config['LOG_FILES']:
+            times = [_mint_creation_time(m) for m in load_mint_info_cached(path).values()]
+            windows.append({'log_file': path, 'mint_names': None, 'start': min(times, default=0),
+                            'end': max(times, default=0), 'mint_count': len(times)})
+        windows.sort(key=lambda w: w['start'])
+        return windows
+
+    mint_info = load_mint_info_cached(log_file)
+    ordered = sorted(mint_info, key=lambda name: (_mint_creation_time(mint_info[name]), name))
+    num_windows = max(2, wf_config['NUM_WINDOWS'])
+    for k in range(num_windows):
+        names = ordered[k * len(ordered) // num_windows:(k + 1) * len(ordered) // num_windows]
+        if not names:
+            continue
+        windows.append({'log_file': log_file, 'mint_names': names,
+                        'start': _mint_creation_time(mint_info[names[0]]),
+                        'end': _mint_creation_time(mint_info[names[-1]]), 'mint_count': len(names)})
+    return windows
+
+
+def _walk_forward_fold(base_params, train_window, test_window, search_config):
+    """子进程: 在训练窗口上做漏斗搜索，把基础组合与每个入选规则放到测试窗口上回测"""
+    train_names = set(train_window['mint_names']) if train_window['mint_names'] is not None else None
+    test_names = set(test_window['mint_names']) if test_window['mint_names'] is not None else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        base_result = run_single_backtest_incremental(base_params, train_window['log_file'], train_names)
+        base_result['optimized_condition'] = '基础组合'
+        base_result['optimized_range'] = {}
+        fitted = [base_result] + run_funnel_search(base_params, train_window['log_file'], search_config, train_names)
+    rules = []
+    for result in fitted:
+        oos = run_single_backtest_incremental(result['params'], test_window['log_file'], test_names)
+        rules.append({
+            'condition': result['optimized_condition'],
+            'range': result['optimized_range'],
+            'params': result['params'],
+            'in_sample': result['summary'],
+            'out_of_sample': oos['summary'],
+        })
+    return rules
+
+
+def run_walk_forward(base_params, log_file, search_config=FUNNEL_SEARCH_CONFIG, wf_config=WALK_FORWARD_CONFIG):
+    """滚动walk-forward: 第k个窗口拟合、第k+1个窗口评估，各fold在进程池中并发执行
+
+    各fold只在自己窗口的mint上构建候选集（按mint集合缓存），逐索引结果表在同一进程内共用。
+    返回 [{'fold', 'train', 'test', 'rules': [{condition, range, params, in_sample, out_of_sample}]}]
+    """
+    windows = build_walk_forward_windows(log_file, wf_config)
+    pairs = list(zip(windows[:-1], windows[1:]))
+    max_workers = wf_config['MAX_WORKERS'] or min(8, multiprocessing.cpu_count() or 2)
+    folds = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(pairs)))) as ex:
+        futures = [ex.submit(_walk_forward_fold, base_params, train, test, search_config) for train, test in pairs]
+        for k, ((train, test), fut) in enumerate(zip(pairs, futures), 1):
+            folds.append({'fold': k, 'train': train, 'test': test, 'rules': fut.result()})
+    return folds
+
+
+def _format_window(window):
+    name = os.path.basename(window['log_file'])
+    return (f"{name} 创建时间[{window['start']}, {window['end']}] {window['mint_count']}个mint"
+            if window['mint_names'] is not None else f"{name} {window['mint_count']}个mint")
+
+
+def print_walk_forward_report(folds):
+    for fold in folds:
+        print(f"\n  Fold {fold['fold']}: 训练 {_format_window(fold['train'])}")
+        print(f"          测试 {_format_window(fold['test'])}")
+        for rule in fold['rules']:
+            print(f"    [{rule['condition']}]" + (f" {rule['range']}" if rule['range'] else ""))
+            for tag, s in (('样本内', rule['in_sample']), ('样本外', rule['out_of_sample'])):
+                print(f"      {tag}: 交易数: {s['total_trades']}, 盈利数: {s['profitable_trades']}, "
+                      f"胜率: {s['win_rate']*100:.2f}%, 总盈利: {s['total_profit_sol']:.2f}SOL, "
+                      f"平均盈利率: {s['avg_profit_rate']*100:.2f}%")
+
+
+# =============================================================================
+# 卖出参数网格搜索: 固定买入参数，一次性评估整张卖出网格
+# =============================================================================
+def run_sell_grid_search(params, log_file, grid=SELL_GRID_SEARCH_SPACE):
+    """在固定买入参数下评估卖出参数网格，返回按平均盈利率降序的 [{'sell_params', 'summary'}]
+
+    入场候选来自候选集缓存；sell_grid 对每个候选一次性算出所有网格点的卖出结果，
+    每个网格点再按 last_sell_index 顺序扫描，结果与把该网格点写入 SELL_CONDITIONS_CONFIG 后的完整回测一致。
+    """
+    global BUY_CONDITIONS_CONFIG
+    config = apply_auto_buckets(build_config(params), log_file)
+    mint_info = load_mint_info_cached(log_file)
+    candidates = candidate_cache.get_candidates(config, log_file, mint_info)
+    online_conditions = [(cond_name, field_name) for cond_name, (field_name, mode_key) in REFINABLE_CONDITIONS.items()
+                         if config.get(mode_key) == 'online']
+    entries = {}
+    for mint_name, mint_candidates in candidates.items():
+        indices = [index for index, fields in mint_candidates
+                   if all(passes_online_condition(cond_name, fields.get(field_name), config)
+                          for cond_name, field_name in online_conditions)]
+        if indices:
+            entries[mint_name] = indices
+
+    points, outcomes = evaluate_sell_grid(mint_info, entries, grid, SELL_CONDITIONS_CONFIG, _forward_index_cache)
+
+    BUY_CONDITIONS_CONFIG = config
+    results = []
+    for k, point in enumerate(points):
+        collector = BacktestResultCollector()
+        for mint_name, indices in entries.items():
+            mint_outcomes = outcomes[mint_name]
+            last_sell_index = -1
+            for index in indices:
+                if index <= last_sell_index:
+                    continue
+                outcome = mint_outcomes[index][k]
+                collector.collect_from_trades([outcome])
+                last_sell_index = outcome['actual_sell_index']
+        results.append({'sell_params': point, 'summary': collector.get_summary(),
+                        'sell_signal_stats': collector.sell_signal_stats})
+    results.sort(key=lambda r: r['summary']['avg_profit_rate'], reverse=True)
+    return results
+
+
+def verify_sell_grid(log_file, grid=SELL_GRID_SEARCH_SPACE, entry_stride=50):
+    """抽查 sell_grid 与逐个网格点运行 variant_find_sell_signal 的卖出结果，返回不一致的描述
+
+    每个mint每隔 entry_stride 笔取一个入场点，分别用前向索引缓存和缺省参数（入场点内部新建索引）各算一遍。
+    """
+    global SELL_CONDITIONS_CONFIG
+    mint_info = load_mint_info_cached(log_file)
+    base_sell_config = SELL_CONDITIONS_CONFIG
+    points = expand_grid(grid, base_sell_config)
+    point_configs = [grid_point_sell_config(base_sell_config, point) for point in points]
+    mismatches = []
+    try:
+        for mint_name, mint_data in mint_info.items():
+            trade_data = mint_data['trade_data']
+            forward_index = _forward_index_cache.get(mint_name)
+            if forward_index is None:
+                forward_index = _forward_index_cache[mint_name] = ForwardIndex(trade_data)
+            for buy_index in range(0, len(trade_data), entry_stride):
+                buy_price = trade_data[buy_index]['price']
+                buy_time = trade_data[buy_index]['tradetime']
+                with_index = evaluate_entry_grid(trade_data, buy_index, buy_price, buy_time, points,
+                                                 base_sell_config, forward_index)
+                without_index = evaluate_entry_grid(trade_data, buy_index, buy_price, buy_time, points,
+                                                    base_sell_config)
+                for k, point_config in enumerate(point_configs):
+                    SELL_CONDITIONS_CONFIG = point_config
+                    expected = variant_find_sell_signal(trade_data, buy_index, buy_price, buy_time)
+                    if with_index[k] != expected or without_index[k] != expected:
+                        mismatches.append(f"{mint_name}@{buy_index} {points[k]}: 网格 {with_index[k]} / "
+                                          f"缺省索引 {without_index[k]} / 逐点 {expected}")
+    finally:
+        SELL_CONDITIONS_CONFIG = base_sell_config
+    return mismatches
+
+
+# =============================================================================
+# TPE参数搜索: 组合数超过预算（或含连续参数）时替代完整网格
+# =============================================================================
+TPE_SEARCH_CONFIG = {
+    'MAX_TRIALS': 48,          # 回测预算（含基线）; 网格组合数不超过预算时直接跑完整网格
+    'BATCH_SIZE': 8,           # 每批并发回测的参数组数
+    'STARTUP_TRIALS': 8,       # 前若干组随机采样
+    'GAMMA': 0.25,             # 目标值前25%的参数作为"好"组
+    'EI_CANDIDATES': 24,       # 每个参数从 l(x) 采样的候选数
+    'SEED': 0,
+}
+
+# 搜索目标: 命中数、胜率、平均盈利率的约束与漏斗搜索一致
+SEARCH_OBJECTIVE = {
+    'MIN_HIT_COUNT': 300,
+    'MIN_WIN_RATE': 0.38,
+    'MIN_AVG_PROFIT_RATE': 0.01,
+}
+
+
+def composite_objective(summary, objective=SEARCH_OBJECTIVE):
+    """复合目标值（越大越好）
+
+    满足全部约束时为平均盈利率（>=MIN_AVG_PROFIT_RATE>0）；否则为负的相对缺口之和，
+    离约束越近得分越高，任何满足约束的组合都优于不满足的组合。
+    """
+    shortfall = max(0.0, 1.0 - summary['total_trades'] / objective['MIN_HIT_COUNT'])
+    shortfall += max(0.0, 1.0 - summary['win_rate'] / objective['MIN_WIN_RATE'])
+    shortfall += max(0.0, 1.0 - summary['avg_profit_rate'] / objective['MIN_AVG_PROFIT_RATE'])
+    if shortfall > 0:
+        return -shortfall
+    return summary['avg_profit_rate']
+
+
+def run_tpe_search(log_file, space=PARAM_SEARCH_SPACE, search_config=TPE_SEARCH_CONFIG,
+                   seed_results=(), on_result=None):
+    """在搜索空间上做TPE序贯优化，返回本次新回测的结果列表（按完成顺序）
+
+    seed_results 中已有的回测结果（如Step2a基线）先告知采样器，计入预算；
+    每批 BATCH_SIZE 组参数并发回测，回测完成后再提议下一批。on_result(result) 在每个结果返回时调用。
+    """
+    sampler = TPESampler(space, gamma=search_config['GAMMA'], n_startup=search_config['STARTUP_TRIALS'],
+                         n_ei_candidates=search_config['EI_CANDIDATES'], seed=search_config['SEED'])
+    for res in seed_results:
+        sampler.tell(res['params'], composite_objective(res['summary']))
+
+    results = []
+    budget = search_config['MAX_TRIALS'] - len(sampler.trials)
+    while budget > 0:
+        batch = sampler.ask(min(search_config['BATCH_SIZE'], budget))
+        if not batch:
+            break
+        for res in run_backtests_concurrent(batch, log_file):
+            sampler.tell(res['params'], composite_objective(res['summary']))
+            results.append(res)
+            if on_result is not None:
+                on_result(res)
+        budget -= len(batch)
+    return results
+
+
 # =============================================================================
 # Step5 筛选阈值
 # =============================================================================
@@ -980,6 +1885,17 @@ STEP5_THRESHOLDS = {
     'MIN_WIN_RATE': 0.35,
 }
 
+# Step5 选择方式: 'single' 按平均盈利率排序; 'pareto' 输出下列目标上的非支配前沿，
+# 不必为不同排序键重跑搜索
+STEP5_SELECTION_MODE = 'single'
+PARETO_OBJECTIVES = ['profitable_trades', 'win_rate', 'avg_profit_rate', 'total_profit_sol']
+
+
+def meets_step5_criteria(summary):
+    return (summary['profitable_trades'] > STEP5_THRESHOLDS['MIN_PROFITABLE_TRADES'] and
+            summary['avg_profit_rate'] > STEP5_THRESHOLDS['MIN_AVG_PROFIT_RATE'] and
+            summary['win_rate'] > STEP5_THRESHOLDS['MIN_WIN_RATE'])
+
 # =============================================================================
 # 主流程: Step2 → Step3 → Step4 → Step5
 # =============================================================================
@@ -991,6 +1907,8 @@ def main():
     print("=" * 80)
 
     overall_start = time.time()
+    # 各步骤的回测结果流入时增量维护非支配前沿
+    frontier = ParetoFrontier(PARETO_OBJECTIVES)
 
     # =====================================================================
     # STEP 2: 基础参数组合回测
@@ -999,9 +1917,14 @@ def main():
     print("STEP 2: 基础参数组合回测")
     print("=" * 80)
 
-    param_combinations = generate_param_combinations()
-    total_combinations = len(param_combinations)
-    print(f"\n总参数组合数: {total_combinations}")
+    grid_size = space_size(PARAM_SEARCH_SPACE)
+    use_tpe = grid_size is None or grid_size > TPE_SEARCH_CONFIG['MAX_TRIALS']
+    total_combinations = TPE_SEARCH_CONFIG['MAX_TRIALS'] if use_tpe else grid_size
+    if use_tpe:
+        print(f"\n总参数组合数: {grid_size if grid_size is not None else '连续空间'} "
+              f"→ TPE搜索, 回测预算: {total_combinations}")
+    else:
+        print(f"\n总参数组合数: {total_combinations}")
     print(f"\n搜索空间:")
     for key, values in PARAM_SEARCH_SPACE.items():
         print(f"  {key}: {values}")
@@ -1010,41 +1933,44 @@ def main():
     step2_start = time.time()
 
     # STEP2a: run a single initial baseline using the first option of each search key
-    initial_params = {}
-    for k, v in PARAM_SEARCH_SPACE.items():
-        initial_params[k] = v[0] if isinstance(v, (list, tuple)) and len(v) > 0 else v
+    initial_params = space_defaults(PARAM_SEARCH_SPACE)
 
     print("\n  → STEP2a: 先运行每个条件的第一个组合 (快速判断)")
     baseline_start = time.time()
     baseline_result = run_single_backtest(initial_params, log_file, silent=True)
     baseline_result['time'] = time.time() - baseline_start
     step2_all_results.append(baseline_result)
+    frontier.add(baseline_result, baseline_result['summary'])
     print_result_line(1, total_combinations, baseline_result, "(baseline)")
 
+    def record_step2_result(res):
+        res['time'] = time.time() - step2_start
+        step2_all_results.append(res)
+        frontier.add(res, res['summary'])
+        tag = "✅ 满足全部条件" if meets_full_criteria(res['summary']) else ""
+        print_result_line(len(step2_all_results), total_combinations, res, tag)
+
     # If baseline already meets the strict FILTER_THRESHOLDS, we can continue to analysis
     if meets_full_criteria(baseline_result['summary']):
         print("  ✅ 基线组合已满足Step3要求，跳过其余组合回测")
-        remaining_results = []
+    elif use_tpe:
+        # STEP2b: 组合数超出预算 → TPE按批提议参数并发回测
+        print(f"\n  → STEP2b: TPE分批并发回测 (每批{TPE_SEARCH_CONFIG['BATCH_SIZE']}组)")
+        run_tpe_search(log_file, seed_results=[baseline_result], on_result=record_step2_result)
     else:
         # STEP2b: 并发执行其余参数组合以加速搜索
         print("\n  → STEP2b: 并发执行其余组合回测（加速）")
         remaining_params = []
         baseline_key = json.dumps(initial_params, sort_keys=True, default=str)
-        for p in param_combinations:
+        for p in generate_param_combinations():
             if json.dumps(p, sort_keys=True, default=str) == baseline_key:
                 continue
             remaining_params.append(p)
 
         if remaining_params:
-            concurrent_results = run_backtests_concurrent(remaining_params, log_file)
             # attach timing approximately
-            for res in concurrent_results:
-                res['time'] = time.time() - step2_start
-                step2_all_results.append(res)
-                idx = len(step2_all_results)
-                s = res['summary']
-                tag = "✅ 满足全部条件" if meets_full_criteria(s) else ""
-                print_result_line(idx, total_combinations, res, tag)
+            for res in run_backtests_concurrent(remaining_params, log_file):
+                record_step2_result(res)
         else:
             print("  (没有需要并发回测的组合)")
 
@@ -1065,7 +1991,7 @@ def main():
     step3_qualified = [r for r in step2_all_results if meets_full_criteria(r['summary'])]
 
     if step3_qualified:
-        step3_qualified.sort(key=lambda x: x['summary']['total_profit_sol'], reverse=True)
+        step3_qualified.sort(key=lambda x: rank_value(x['summary'], 'total_profit_sol'), reverse=True)
         print(f"\n  ✅ 找到 {len(step3_qualified)} 个满足全部条件的组合，跳过Step4，直接进入Step5")
         final_results = step3_qualified + step2_all_results
         final_step = "Step3(直接满足)"
@@ -1073,10 +1999,12 @@ def main():
         print(f"\n  ⚠️ 没有满足全部条件的组合 → 进入Step4")
 
         # =================================================================
-        # STEP 4: 分析TIME_DIFF debug分桶 → 提取盈利桶 → 设为online再回测
+        # STEP 4: 在debug分桶上选出最优连续区间 → 设为online再回测
         # =================================================================
         print("\n" + "=" * 80)
-        print("STEP 4: 分析TIME_DIFF分桶数据 → 提取盈利范围 → 再回测")
+        print("STEP 4: 分析debug分桶数据 → 选出最优连续区间 → 再回测")
+        print(f"  区间约束: 命中数>={STEP4_RANGE_CONSTRAINTS['MIN_HIT_COUNT']}, "
+              f"胜率>={STEP4_RANGE_CONSTRAINTS['MIN_WIN_RATE']*100:.0f}%")
         print("=" * 80)
 
         step4_results = []
@@ -1093,58 +2021,42 @@ def main():
                   f"胜率:{s['win_rate']*100:.2f}% 总盈利:{s['total_profit_sol']:.2f}SOL "
                   f"平均:{s['avg_profit_rate']*100:.2f}%")
 
-            # 检查 TIME_DIFF 的 debug 数据
-            if 'TIME_DIFF' not in snapshot:
-                print(f"  ⚠️ 无TIME_DIFF debug数据，跳过")
-                if snapshot:
-                    print(f"    (snapshot包含: {list(snapshot.keys())})")
-                else:
-                    print(f"    (snapshot为空，debug指标可能未注入到交易记录中)")
+            if not snapshot:
+                print(f"  ⚠️ snapshot为空，debug指标可能未注入到交易记录中，跳过")
                 continue
 
-            td_data = snapshot['TIME_DIFF']
-            print(f"\n  TIME_DIFF 分桶数据:")
-            for bs in td_data['bucket_stats']:
-                if bs['count'] == 0:
+            # 每个debug条件上的最优连续区间（直接由已收集的分桶统计得出，无需回测）
+            best_choice = None
+            for cond_name, cond_data in snapshot.items():
+                selection = select_condition_range(cond_name, cond_data)
+                if selection is None:
                     continue
-                print(f"    {bs['name']}: {bs['count']}笔 | "
-                      f"盈利: {bs['profitable']} ({bs['win_rate']*100:.1f}%) | "
-                      f"平均盈利率: {bs['avg_profit_rate']*100:.2f}%")
-
-            # 找出平均盈利率 > -0.1% 的分桶
-            profitable_buckets = [bs for bs in td_data['bucket_stats']
-                                  if bs['count'] > 0 and bs['avg_profit_rate'] > -0.001]
-            if not profitable_buckets:
-                print(f"  ⚠️ 无平均盈利率>-0.1%的分桶，跳过")
+                best, threshold_key, threshold = selection
+                print(f"    {cond_name}: 分桶[{best['start']}..{best['end']}] {threshold_key}={threshold} | "
+                      f"{best['count']}笔 | 胜率: {best['win_rate']*100:.1f}% | "
+                      f"平均盈利率: {best['avg_profit_rate']*100:.2f}%")
+                if best_choice is None or best['avg_profit_rate'] > best_choice[1]['avg_profit_rate']:
+                    best_choice = (cond_name, best, threshold_key, threshold)
+
+            if best_choice is None:
+                print(f"  ⚠️ 没有满足区间约束的条件，跳过")
                 continue
 
-            total_hits = sum(bs['count'] for bs in profitable_buckets)
-            print(f"\n  盈利分桶: {len(profitable_buckets)} 个, 命中总数: {total_hits}")
+            cond_name, best, threshold_key, threshold = best_choice
+            print(f"  → 最优条件: {cond_name}, 设置 {REFINABLE_CONDITIONS[cond_name][1]}='online', "
+                  f"{threshold_key}={threshold}")
 
-            if total_hits < 300:
-                print(f"  ⚠️ 命中总数 {total_hits} < 300，跳过")
-                continue
-
-            # 提取范围
-            range_min = min(bs['low'] for bs in profitable_buckets)
-            range_max = max(bs['high'] if bs['high'] != float('inf') else 999999 for bs in profitable_buckets)
-            new_range = (range_min, range_max)
-            print(f"  → 提取TIME_DIFF盈利范围: {new_range}")
-            print(f"  → 设置 TIME_DIFF_CHECK_MODE='online', TIME_DIFF_FROM_LAST_TRADE_RANGE={new_range}")
-
-            # 构建新参数
-            new_params = copy.deepcopy(base_params)
-            new_params['TIME_DIFF_CHECK_MODE'] = 'online'
-            new_params['TIME_DIFF_FROM_LAST_TRADE_RANGE'] = new_range
+            new_params = apply_condition_range(base_params, cond_name, threshold)
 
-            print(f"  → 开始回测...")
+            print(f"  → 开始增量回测（复用候选集缓存）...")
             step4_total += 1
-            result = run_single_backtest(new_params, log_file, silent=True)
+            result = run_single_backtest_incremental(new_params, log_file)
             result['time'] = time.time() - overall_start
             result['source_candidate'] = cand_idx
-            result['optimized_condition'] = 'TIME_DIFF'
-            result['optimized_range'] = new_range
+            result['optimized_condition'] = cond_name
+            result['optimized_range'] = threshold
             step4_results.append(result)
+            frontier.add(result, result['summary'])
 
             rs = result['summary']
             tag = "✅ 满足全部条件" if meets_full_criteria(rs) else ""
@@ -1152,8 +2064,59 @@ def main():
 
         print(f"\n  Step4完成, 共{step4_total}次回测")
 
+        # =================================================================
+        # STEP 4b: 多条件漏斗搜索（特征矩阵上beam search → 真实回测确认）
+        # =================================================================
+        print("\n" + "=" * 80)
+        print("STEP 4b: 多条件漏斗搜索")
+        print(f"  目标: 命中数>={FUNNEL_SEARCH_CONFIG['MIN_HIT_COUNT']}, "
+              f"平均盈利率>={FUNNEL_SEARCH_CONFIG['MIN_AVG_PROFIT_RATE']*100:.1f}%, "
+              f"胜率>={FUNNEL_SEARCH_CONFIG['MIN_WIN_RATE']*100:.0f}%")
+        print("=" * 80)
+
+        funnel_results = []
+        funnel_bases = sorted(step2_all_results, key=lambda x: x['summary']['avg_profit_rate'],
+                              reverse=True)[:FUNNEL_SEARCH_CONFIG['BASE_CANDIDATES']]
+        for base in funnel_bases:
+            print(f"\n  {'─' * 60}")
+            print(f"  基础组合: {format_params(base['params'])}")
+            for result in run_funnel_search(base['params'], log_file):
+                result['time'] = time.time() - overall_start
+                funnel_results.append(result)
+                frontier.add(result, result['summary'])
+                rs = result['summary']
+                tag = "✅ 满足全部条件" if meets_full_criteria(rs) else ""
+                print(f"    [{result['optimized_condition']}] {result['optimized_range']}")
+                print(f"      交易数: {rs['total_trades']}, 盈利数: {rs['profitable_trades']}, "
+                      f"胜率: {rs['win_rate']*100:.2f}%, 总盈利: {rs['total_profit_sol']:.2f}SOL, "
+                      f"平均盈利率: {rs['avg_profit_rate']*100:.2f}% {tag}")
+
+        # =================================================================
+        # STEP 4c: 决策树规则归纳（与漏斗搜索使用相同的基础组合）
+        # =================================================================
+        tree_results = []
+        if RULE_TREE_CONFIG['ENABLED']:
+            print("\n" + "=" * 80)
+            print("STEP 4c: 决策树规则归纳")
+            print(f"  约束: 命中数>={RULE_TREE_CONFIG['MIN_HIT_COUNT']}, "
+                  f"胜率>={RULE_TREE_CONFIG['MIN_WIN_RATE']*100:.0f}%, 最多{RULE_TREE_CONFIG['MAX_DEPTH']}次切分")
+            print("=" * 80)
+            for base in funnel_bases:
+                print(f"\n  {'─' * 60}")
+                print(f"  基础组合: {format_params(base['params'])}")
+                for result in run_rule_induction(base['params'], log_file):
+                    result['time'] = time.time() - overall_start
+                    tree_results.append(result)
+                    frontier.add(result, result['summary'])
+                    rs = result['summary']
+                    tag = "✅ 满足全部条件" if meets_full_criteria(rs) else ""
+                    print(f"    [{result['optimized_condition']}] {result['optimized_range']}")
+                    print(f"      交易数: {rs['total_trades']}, 盈利数: {rs['profitable_trades']}, "
+                          f"胜率: {rs['win_rate']*100:.2f}%, 总盈利: {rs['total_profit_sol']:.2f}SOL, "
+                          f"平均盈利率: {rs['avg_profit_rate']*100:.2f}% {tag}")
+
         # 合并所有结果
-        final_results = step4_results + step2_all_results
+        final_results = step4_results + funnel_results + tree_results + step2_all_results
         final_step = "Step4"
 
     # =====================================================================
@@ -1166,14 +2129,11 @@ def main():
           f"胜率>{STEP5_THRESHOLDS['MIN_WIN_RATE']*100:.0f}%")
     print("=" * 80)
 
-    # 按step5条件筛选
-    step5_qualified = []
-    for r in final_results:
-        s = r['summary']
-        if (s['profitable_trades'] > STEP5_THRESHOLDS['MIN_PROFITABLE_TRADES'] and
-            s['avg_profit_rate'] > STEP5_THRESHOLDS['MIN_AVG_PROFIT_RATE'] and
-            s['win_rate'] > STEP5_THRESHOLDS['MIN_WIN_RATE']):
-            step5_qualified.append(r)
+    # 按step5条件筛选; pareto模式下只在非支配前沿中筛选
+    if STEP5_SELECTION_MODE == 'pareto':
+        final_results = frontier.items()
+        print(f"\n  非支配前沿 ({', '.join(PARETO_OBJECTIVES)}): {len(final_results)} 个组合")
+    step5_qualified = [r for r in final_results if meets_step5_criteria(r['summary'])]
 
     # 去重 (按params字符串去重)
     seen = set()
@@ -1183,11 +2143,11 @@ def main():
         if key not in seen:
             seen.add(key)
             unique_qualified.append(r)
-    step5_qualified = sorted(unique_qualified, key=lambda x: x['summary']['avg_profit_rate'], reverse=True)
+    step5_qualified = sorted(unique_qualified, key=lambda x: rank_value(x['summary'], 'avg_profit_rate'), reverse=True)
 
     if not step5_qualified:
         print(f"\n  ⚠️ 没有满足Step5条件的组合，取所有结果中最优的")
-        all_sorted = sorted(final_results, key=lambda x: x['summary']['avg_profit_rate'], reverse=True)
+        all_sorted = sorted(final_results, key=lambda x: rank_value(x['summary'], 'avg_profit_rate'), reverse=True)
         seen2 = set()
         for r in all_sorted[:5]:
             key = json.dumps(r['params'], sort_keys=True, default=str)
@@ -1261,6 +2221,13 @@ def main():
             key = json.dumps(params, sort_keys=True, default=str)
             if key not in grouped:
                 grouped[key] = {'params': params, 'conditions': []}
+                if STEP5_SELECTION_MODE == 'pareto':
+                    # 前沿候选之间没有单一优劣，附上目标值供人工取舍
+                    grouped[key]['summary'] = {k: result['summary'][k] for k in PARETO_OBJECTIVES}
+            if 'rule_json_conditions' in result:
+                # 决策树归纳的规则直接写入归纳出的区间
+                grouped[key]['conditions'].extend(result['rule_json_conditions'])
+                continue
             for cond_name, data in snapshot.items():
                 good_buckets = [bs for bs in data.get('bucket_stats', []) if bs.get('count', 0) > 50 and bs.get('avg_profit_rate', 0.0) > 0.0]
                 if not good_buckets:
@@ -1284,6 +2251,17 @@ def main():
     except Exception as e:
         print(f"保存rule.json失败: {e}")
 
+    # =====================================================================
+    # STEP 6 (可选): walk-forward 验证，对比规则的样本内与样本外表现
+    # =====================================================================
+    if WALK_FORWARD_CONFIG['ENABLED']:
+        print("\n" + "=" * 80)
+        print("STEP 6: Walk-forward验证 (前一窗口拟合漏斗规则 → 后一窗口评估)")
+        print("=" * 80)
+        wf_base = max(step2_all_results, key=lambda x: x['summary']['avg_profit_rate'])
+        print(f"  基础组合: {format_params(wf_base['params'])}")
+        print_walk_forward_report(run_walk_forward(wf_base['params'], log_file))
+
     # 输出最佳配置
     if step5_qualified:
         best = step5_qualified[0]
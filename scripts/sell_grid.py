@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卖出参数网格评估
+对一组入场点和一组卖出参数网格 (LOSS_PERCENTAGE, RETRACEMENT_LOW_PROFIT,
+PROFIT_RATE_SELL_THRESHOLD, MAX_HOLD_TIME_SECONDS)，一次性算出所有网格点的卖出索引。
+
+卖出逻辑与 rules/rule1_optimize.py 的 variant_find_sell_signal 一致。每条卖出规则在价格路径上
+独立求首次触发索引，同一索引上按原循环中的检查顺序取优先级:
+    市值止盈 > 盈利率止盈 > 亏损止损 > 回撤止损 > 时间止损(返回 i-1) > 短期暴涨卖出 > 冷淡期卖出
+与网格无关的规则（市值、暴涨、冷淡期）每个入场只扫描一次；止损/止盈用每个mint共用的
+前向路径索引 (forward_index.ForwardIndex) 做首次穿越查询，时间止损按成交时间二分；只有带状态的回撤规则需要按 RETRACEMENT_LOW_PROFIT 的取值各走一遍，
+且只走到与网格无关规则的最早触发点为止。
+"""
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import pump
+from forward_index import ForwardIndex
+
+# 网格参数名
+GRID_KEYS = ['LOSS_PERCENTAGE', 'RETRACEMENT_LOW_PROFIT', 'PROFIT_RATE_SELL_THRESHOLD', 'MAX_HOLD_TIME_SECONDS']
+
+# 同一索引上的检查顺序
+RANK_NOWSOL, RANK_PROFIT, RANK_LOSS, RANK_RETRACEMENT, RANK_TIME, RANK_SPIKE, RANK_QUIET = range(7)
+
+
+def expand_grid(grid: Dict[str, List], sell_config: Dict) -> List[Dict]:
+    """把 {参数名: 取值列表} 展开为网格点列表，未给出的参数取 sell_config 中的当前值
+
+    PROFIT_RATE_SELL_THRESHOLD 取 None 表示不启用盈利率止盈。
+    """
+    default_profit = sell_config.get('PROFIT_RATE_SELL_THRESHOLD') if sell_config.get('PROFIT_RATE_SELL_ENABLED') else None
+    defaults = {
+        'LOSS_PERCENTAGE': sell_config['LOSS_PERCENTAGE'],
+        'RETRACEMENT_LOW_PROFIT': sell_config['RETRACEMENT_LOW_PROFIT'],
+        'PROFIT_RATE_SELL_THRESHOLD': default_profit,
+        'MAX_HOLD_TIME_SECONDS': sell_config['MAX_HOLD_TIME_SECONDS'],
+    }
+    values = [grid.get(key, [defaults[key]]) for key in GRID_KEYS]
+    return [dict(zip(GRID_KEYS, combo)) for combo in itertools.product(*values)]
+
+
+def grid_point_sell_config(sell_config: Dict, point: Dict) -> Dict:
+    """网格点对应的完整卖出配置（用于逐笔回测验证）"""
+    config = dict(sell_config)
+    config['LOSS_PERCENTAGE'] = point['LOSS_PERCENTAGE']
+    config['RETRACEMENT_LOW_PROFIT'] = point['RETRACEMENT_LOW_PROFIT']
+    config['MAX_HOLD_TIME_SECONDS'] = point['MAX_HOLD_TIME_SECONDS']
+    if point['PROFIT_RATE_SELL_THRESHOLD'] is None:
+        config['PROFIT_RATE_SELL_ENABLED'] = False
+    else:
+        config['PROFIT_RATE_SELL_ENABLED'] = True
+        config['PROFIT_RATE_SELL_THRESHOLD'] = point['PROFIT_RATE_SELL_THRESHOLD']
+    return config
+
+
+def _fixed_trigger(trade_data: List[Dict], buy_index: int, buy_price: float, end: int,
+                   sell_config: Dict) -> Tuple[Optional[int], int, str]:
+    """与网格无关的规则（市值止盈、短期暴涨、冷淡期）在 [buy_index, end] 内的首次触发"""
+    max_nowsol_sell = sell_config['MAX_NOWSOL_SELL']
+    spike_sell_enabled = sell_config.get('SPIKE_SELL_ENABLED', False)
+    spike_lookback_ms = sell_config.get('SPIKE_LOOKBACK_MS', 1000)
+    spike_threshold_pct = sell_config.get('SPIKE_THRESHOLD_PCT', 10.0)
+    quiet_period_enabled = sell_config['QUIET_PERIOD_ENABLED']
+    quiet_period_seconds = sell_config['QUIET_PERIOD_SECONDS']
+    quiet_period_min_amount = sell_config['QUIET_PERIOD_MIN_AMOUNT']
+
+    for i in range(buy_index, end + 1):
+        trade = trade_data[i]
+        current_price = trade['price']
+        current_time = trade['tradetime']
+        if float(trade.get('nowsol', 0)) >= max_nowsol_sell:
+            return i, RANK_NOWSOL, "市值止盈"
+
+        current_profit_rate = (current_price - buy_price) / buy_price
+        if spike_sell_enabled and current_profit_rate > 0:
+            spike_start_time = current_time - spike_lookback_ms
+            ref_price = None
+            for j in range(i - 1, buy_index - 1, -1):
+                if trade_data[j]['tradetime'] <= spike_start_time:
+                    ref_price = trade_data[j]['price']
+                    break
+            if ref_price is not None and ref_price > 0:
+                if (current_price - ref_price) / ref_price * 100.0 >= spike_threshold_pct:
+                    return i, RANK_SPIKE, "短期暴涨卖出"
+
+        if quiet_period_enabled and float(trade.get('tradeamount', 0)) < 0:
+            quiet_period_start_time = current_time - quiet_period_seconds * 1000
+            has_large_trade = False
+            for j in range(i - 1, buy_index - 1, -1):
+                prev_trade = trade_data[j]
+                if prev_trade['tradetime'] < quiet_period_start_time:
+                    break
+                if abs(float(prev_trade.get('tradeamount', 0))) >= quiet_period_min_amount:
+                    has_large_trade = True
+                    break
+            if not has_large_trade:
+                return i, RANK_QUIET, "冷淡期卖出"
+    return None, RANK_QUIET, ""
+
+
+def _retracement_trigger(prices: List[float], buy_price: float, retracement_low: float,
+                         sell_config: Dict) -> Tuple[Optional[int], str]:
+    """回撤止损（带拐点计数状态）在价格路径上的首次触发偏移"""
+    retracement_high = sell_config['RETRACEMENT_HIGH_PROFIT']
+    high_profit_threshold = sell_config['HIGH_PROFIT_THRESHOLD']
+    retracement_min_count = sell_config.get('RETRACEMENT_MIN_COUNT', 1)
+
+    max_price = buy_price
+    max_profit_rate = 0.0
+    inflection_count = 0
+    in_retracement = False
+    prev_price = None
+    prev_prev_price = None
+    for offset, current_price in enumerate(prices):
+        if current_price > max_price:
+            max_price = current_price
+            max_profit_rate = (max_price - buy_price) / buy_price
+        if max_price > buy_price:
+            retracement = (max_price - current_price) / max_price
+            threshold = retracement_low if max_profit_rate < high_profit_threshold else retracement_high
+            if retracement >= threshold:
+                if not in_retracement:
+                    in_retracement = True
+                    inflection_count = 0
+                    prev_price = None
+                    prev_prev_price = None
+                if prev_price is not None and prev_prev_price is not None:
+                    if prev_price >= prev_prev_price and current_price < prev_price:
+                        inflection_count += 1
+                if inflection_count >= retracement_min_count:
+                    label = "低" if max_profit_rate < high_profit_threshold else "高"
+                    return offset, f"回撤止损({label})"
+            else:
+                in_retracement = False
+                inflection_count = 0
+        prev_prev_price = prev_price
+        prev_price = current_price
+    return None, ""
+
+
+def _min_price_before(trade_data: List[Dict], buy_index: int, lookback_count: int) -> Optional[float]:
+    prices = []
+    for i in range(max(0, buy_index - lookback_count), buy_index):
+        try:
+            price = float(trade_data[i].get('price', 0))
+            if price > 0:
+                prices.append(price)
+        except (TypeError, ValueError):
+            continue
+    return min(prices) if prices else None
+
+
+def evaluate_entry_grid(trade_data: List[Dict], buy_index: int, buy_price: float, buy_time: int,
+                        points: List[Dict], sell_config: Dict,
+                        forward_index: Optional[ForwardIndex] = None) -> List[Tuple[int, str]]:
+    """对一个入场点（实际买入索引/价格/时间）计算所有网格点的 (卖出信号索引, 卖出原因)
+
+    结果与逐个网格点调用 variant_find_sell_signal 相同。要求 tradetime 非递减。
+    forward_index 为该mint的前向路径索引，同一mint的多个入场点应共用一个。
+    """
+    n = len(trade_data)
+    if forward_index is None:
+        forward_index = ForwardIndex(trade_data)
+
+    # 时间止损: 第一个持有时间 > max_hold 的索引（按成交时间二分，谓词与原循环相同）
+    def time_trigger(max_hold):
+        return forward_index.first_index_where(
+            buy_index, lambda i: (forward_index.times[i] - buy_time) / 1000 > max_hold)
+
+    time_triggers = {h: time_trigger(h) for h in set(p['MAX_HOLD_TIME_SECONDS'] for p in points)}
+    latest_time = [t for t in time_triggers.values() if t is not None]
+    horizon = max(latest_time) if len(latest_time) == len(time_triggers) else n - 1
+
+    fixed_index, fixed_rank, fixed_reason = _fixed_trigger(trade_data, buy_index, buy_price, horizon, sell_config)
+    if fixed_index is not None:
+        horizon = fixed_index
+
+    # 止损/止盈: 前向路径上的首次穿越（谓词与原循环的盈利率表达式逐位一致）
+    min_price_before_buy = _min_price_before(trade_data, buy_index, sell_config['LOOKBACK_TRADES_FOR_MIN_PRICE'])
+
+    def loss_trigger(loss_percentage):
+        if min_price_before_buy is None:
+            return None
+        return forward_index.first_passage_down(
+            buy_index,
+            lambda price: price < min_price_before_buy and (price - buy_price) / buy_price <= -loss_percentage,
+            horizon)
+
+    def profit_trigger(threshold):
+        if threshold is None:
+            return None
+        return forward_index.first_passage_up(
+            buy_index, lambda price: (price - buy_price) / buy_price >= threshold, horizon)
+
+    loss_triggers = {v: loss_trigger(v) for v in set(p['LOSS_PERCENTAGE'] for p in points)}
+    profit_triggers = {v: profit_trigger(v) for v in set(p['PROFIT_RATE_SELL_THRESHOLD'] for p in points)}
+    prices = forward_index.prices[buy_index:horizon + 1]
+    retracement_triggers = {}
+    for v in set(p['RETRACEMENT_LOW_PROFIT'] for p in points):
+        offset, reason = _retracement_trigger(prices, buy_price, v, sell_config)
+        retracement_triggers[v] = (None, "") if offset is None else (buy_index + offset, reason)
+
+    results = []
+    for point in points:
+        retracement_index, retracement_reason = retracement_triggers[point['RETRACEMENT_LOW_PROFIT']]
+        candidates = [
+            (fixed_index, fixed_rank, fixed_reason),
+            (profit_triggers[point['PROFIT_RATE_SELL_THRESHOLD']], RANK_PROFIT, "盈利率止盈"),
+            (loss_triggers[point['LOSS_PERCENTAGE']], RANK_LOSS, "亏损止损"),
+            (retracement_index, RANK_RETRACEMENT, retracement_reason),
+            (time_triggers[point['MAX_HOLD_TIME_SECONDS']], RANK_TIME, "时间止损"),
+        ]
+        best = None  # (索引, 优先级, 原因)
+        for index, rank, reason in candidates:
+            if index is None:
+                continue
+            if best is None or (index, rank) < best[:2]:
+                best = (index, rank, reason)
+        if best is None:
+            results.append((n - 1, "强制卖出"))
+        elif best[1] == RANK_TIME:
+            results.append((best[0] - 1 if best[0] > buy_index else best[0], best[2]))
+        else:
+            results.append((best[0], best[2]))
+    return results
+
+
+def evaluate_sell_grid(mint_info: Dict, entries: Dict[str, List[int]], grid: Dict[str, List],
+                       sell_config: Dict, forward_indexes: Optional[Dict[str, ForwardIndex]] = None
+                       ) -> Tuple[List[Dict], Dict[str, Dict[int, List[Dict]]]]:
+    """对每个mint的入场候选（买入信号索引，升序）在整张网格上计算入场结果
+
+    forward_indexes 为 {mint_name: ForwardIndex} 缓存，传入时复用并补全，多次网格评估之间不必重建索引。
+
+    Returns:
+        (网格点列表, {mint_name: {买入信号索引: [每个网格点的结果字典]}})
+        结果字典含 mint_name / actual_sell_index / sell_reason / profit_sol / profit_rate / is_profitable，
+        再按 last_sell_index 顺序扫描即可得到每个网格点的回测结果。
+    """
+    points = expand_grid(grid, sell_config)
+    outcomes = {}
+    for mint_name, indices in entries.items():
+        trade_data = mint_info[mint_name]['trade_data']
+        forward_index = forward_indexes.get(mint_name) if forward_indexes is not None else None
+        if forward_index is None:
+            forward_index = ForwardIndex(trade_data)
+            if forward_indexes is not None:
+                forward_indexes[mint_name] = forward_index
+        mint_outcomes = {}
+        for buy_signal_index in indices:
+            buy_trigger_time = trade_data[buy_signal_index]['tradetime']
+            actual_buy_time = buy_trigger_time + pump.STRATEGY_CONFIG['BUY_DELAY_MS']
+            buy_price, actual_buy_index = pump.get_price_at_time(trade_data, actual_buy_time, buy_signal_index)
+            exits = evaluate_entry_grid(trade_data, actual_buy_index, buy_price, actual_buy_time, points, sell_config,
+                                        forward_index)
+            settled = {}
+            point_outcomes = []
+            for sell_index, sell_reason in exits:
+                settlement = settled.get(sell_index)
+                if settlement is None:
+                    settlement = pump.settle_exit(trade_data, actual_buy_index, buy_price, sell_index)
+                    settled[sell_index] = settlement
+                point_outcomes.append({
+                    'mint_name': mint_name,
+                    'actual_sell_index': settlement['actual_sell_index'],
+                    'sell_reason': sell_reason,
+                    'profit_sol': settlement['profit'],
+                    'profit_rate': settlement['profit_rate'],
+                    'is_profitable': settlement['profit'] > 0,
+                })
+            mint_outcomes[buy_signal_index] = point_outcomes
+        outcomes[mint_name] = mint_outcomes
+    return points, outcomes
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时引擎状态快照与热重启
+定期把各mint的流式状态（环形缓冲区、滚动窗口、候选信号、持仓）写成带版本号的二进制快照，
+重启时从快照恢复引擎，只重放快照之后的事件。
+
+快照内容:
+    第 seq 笔事件处理完时全部活跃mint的 MintStream.to_dict()、LRU顺序、已落盘mint名单与淘汰时钟。
+    特征计算（feature_registry）不保存状态，恢复后由登记的策略直接在缓冲区上计算；
+    已完成的交易记录不在快照内（它们已作为 trade 事件输出）。
+
+增量:
+    引擎每次改动某个mint的状态前调用 touch，快照器记下脏mint。
+    增量快照（delta）只包含上一次快照之后改动过的mint，全量快照（base）包含全部活跃mint；
+    启动后的第一次快照和每 FULL_EVERY 个增量写一次全量，全量写成功后删除目录中其余的快照文件。
+    恢复时取最新的全量，再按顺序叠加它之后的增量，每个mint取最后一次出现的状态。
+
+不阻塞事件处理:
+    开始快照时只记下待捕获的mint（seq 固定为当前事件数），之后每笔事件捕获 CAPTURE_PER_EVENT 个；
+    某个待捕获的mint在此期间要被改动时先捕获它（写时复制），所以快照仍是第 seq 笔事件时的一致状态。
+    捕获完的字典交给后台线程逐个 pickle、zlib 压缩、写临时文件再 os.replace，
+    每个mint之间 time.sleep(0) 让出GIL（zlib 压缩本身不持有GIL）。
+
+文件格式（FORMAT_VERSION = 1）:
+    MAGIC(8字节) + struct '<HBQIQ' (格式版本, 类型 0全量/1增量, seq, 正文crc32, 正文长度) + 正文
+    正文为 zlib 流，内容是一串记录: struct '<I' 长度 + pickle；第一条记录是元数据，其余每条为 (mint名, 状态)。
+    文件名 {seq:012d}.base.snap / {seq:012d}.delta.snap。
+
+限制:
+    配置了 SPILL_DIR 时已落盘的mint按落盘文件恢复；快照之后才被恢复（文件已删除）或重新落盘的mint
+    在重启后分别从空状态开始 / 重复应用快照之后的事件。
+
+用法:
+    snapshotter = EngineSnapshotter(snapshot_dir)
+    engine = restore_engine(snapshot_dir, clock_fills=True) or StreamEngine(clock_fills=True)
+    engine.snapshotter = snapshotter
+    for mint, trade in itertools.islice(事件流, engine.events_seen, None):   # 只重放快照之后的事件
+        engine.on_trade(mint, trade)
+    snapshotter.close(engine)    # 同步写最后一次增量快照
+    python snapshot.py [mint_log] 回放中途"重启"，与不中断的回放逐笔核对
+"""
+import itertools
+import os
+import pickle
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pump
+from replay import merge_trade_streams
+from stream_engine import MintStream, StreamEngine
+
+SNAPSHOT_CONFIG = {
+    'DIR': None,  # 快照目录
+    'INTERVAL_MS': 60 * 1000,  # 快照间隔（事件时间）
+    'CAPTURE_PER_EVENT': 4,  # 每笔事件之后最多捕获的mint数（每个约20微秒）
+    'FULL_EVERY': 20,  # 每隔多少个增量写一次全量
+    'COMPRESS_LEVEL': 6,  # zlib 压缩级别
+}
+
+MAGIC = b'PUMPSNAP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<HBQIQ')
+RECORD_LENGTH = struct.Struct('<I')
+KIND_BASE, KIND_DELTA = 0, 1
+KIND_NAMES = {KIND_BASE: 'base', KIND_DELTA: 'delta'}
+SEGMENT_RE = re.compile(r'^(\d{12})\.(base|delta)\.snap$')
+
+
+# ---------- 文件读写 ----------
+
+def segment_path(directory: str, seq: int, kind: int) -> str:
+    return os.path.join(directory, f"{seq:012d}.{KIND_NAMES[kind]}.snap")
+
+
+def list_segments(directory: str) -> List[Tuple[int, int, str]]:
+    """目录中的快照文件 [(seq, 类型, 路径)]，按 seq 排序"""
+    segments = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return segments
+    for name in names:
+        match = SEGMENT_RE.match(name)
+        if match:
+            kind = KIND_BASE if match.group(2) == 'base' else KIND_DELTA
+            segments.append((int(match.group(1)), kind, os.path.join(directory, name)))
+    segments.sort()
+    return segments
+
+
+def write_segment(path: str, kind: int, seq: int, meta: Dict, items: List[Tuple[str, Dict]],
+                  level: int = SNAPSHOT_CONFIG['COMPRESS_LEVEL'], yield_fn=lambda: None) -> int:
+    """写一个快照文件（先写临时文件再替换），返回字节数"""
+    compressor = zlib.compressobj(level)
+    chunks = []
+    for record in itertools.chain([meta], items):
+        data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        chunks.append(compressor.compress(RECORD_LENGTH.pack(len(data)) + data))
+        yield_fn()
+    chunks.append(compressor.flush())
+    body = b''.join(chunks)
+    header = MAGIC + HEADER.pack(FORMAT_VERSION, kind, seq, zlib.crc32(body), len(body))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(header) + len(body)
+
+
+def read_segment(path: str) -> Tuple[int, int, Dict, List[Tuple[str, Dict]]]:
+    """读取一个快照文件，返回 (类型, seq, 元数据, [(mint名, 状态)])；格式不符或内容损坏抛 ValueError"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    head_size = len(MAGIC) + HEADER.size
+    if len(data) < head_size or not data.startswith(MAGIC):
+        raise ValueError(f"{path}: 不是快照文件")
+    version, kind, seq, crc, length = HEADER.unpack_from(data, len(MAGIC))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: 不支持的快照格式版本 {version}")
+    body = data[head_size:]
+    if len(body) != length or zlib.crc32(body) != crc:
+        raise ValueError(f"{path}: 快照内容损坏")
+    raw = zlib.decompress(body)
+    records = []
+    offset = 0
+    while offset < len(raw):
+        (size,) = RECORD_LENGTH.unpack_from(raw, offset)
+        offset += RECORD_LENGTH.size
+        records.append(pickle.loads(raw[offset:offset + size]))
+        offset += size
+    if not records:
+        raise ValueError(f"{path}: 快照缺少元数据")
+    return kind, seq, records[0], records[1:]
+
+
+def load_snapshot(directory: str) -> Optional[Dict]:
+    """合并最新的全量快照与之后的增量，返回 {seq, meta, order, states, segments}；没有可用快照返回 None
+
+    全量损坏时退回上一个全量；增量链中某个文件损坏时停在它之前（之后的增量依赖它，不能跳过）。
+    """
+    segments = list_segments(directory)
+    bases = [segment for segment in segments if segment[1] == KIND_BASE]
+    for base_seq, _, base_path in reversed(bases):
+        try:
+            _, seq, meta, items = read_segment(base_path)
+        except (OSError, ValueError, pickle.UnpicklingError, zlib.error):
+            continue
+        states = dict(items)
+        applied = 1
+        for delta_seq, kind, path in segments:
+            if kind != KIND_DELTA or delta_seq <= base_seq:
+                continue
+            try:
+                _, delta_seq, delta_meta, delta_items = read_segment(path)
+            except (OSError, ValueError, pickle.UnpicklingError, zlib.error):
+                break
+            if delta_meta.get('base_seq') != base_seq:
+                break
+            states.update(delta_items)
+            seq, meta = delta_seq, delta_meta
+            applied += 1
+        return {
+            'seq': seq,
+            'meta': meta,
+            'order': meta['order'],
+            'states': states,
+            'segments': applied,
+        }
+    return None
+
+
+# ---------- 恢复 ----------
+
+def restore_into(engine: StreamEngine, snapshot: Dict):
+    """把 load_snapshot 的结果装入一个新建的引擎"""
+    meta = snapshot['meta']
+    if meta['config'] != engine.config:
+        raise ValueError("快照的策略配置与引擎不一致")
+    states = snapshot['states']
+    engine.mints = OrderedDict(
+        (mint_name, MintStream.from_dict(states[mint_name], engine.config)) for mint_name in snapshot['order'])
+    engine.events_seen = snapshot['seq']
+    engine.spilled = set(meta['spilled'])
+    engine._last_eviction_check = meta['last_eviction_check']
+    if engine.history_config:
+        for stream in engine.mints.values():
+            engine._reserve_history(stream)
+    if engine.clock_fills:
+        for stream in engine.mints.values():
+            engine._schedule_fill(stream)
+
+
+def restore_engine(directory: str, **engine_kwargs) -> Optional[StreamEngine]:
+    """从快照目录恢复引擎（参数同 StreamEngine），没有可用快照返回 None"""
+    snapshot = load_snapshot(directory)
+    if snapshot is None:
+        return None
+    engine = StreamEngine(**engine_kwargs)
+    restore_into(engine, snapshot)
+    return engine
+
+
+def events_after(events: Iterator, engine: StreamEngine) -> Iterator:
+    """跳过恢复的引擎已处理过的事件（与快照前相同的事件流）"""
+    return itertools.islice(events, engine.events_seen, None)
+
+
+# ---------- 快照器 ----------
+
+class EngineSnapshotter:
+    """挂在 StreamEngine.snapshotter 上，按事件时间定期写增量/全量快照
+
+    引擎在改动mint状态前调用 touch(mint名)，每笔事件结束时调用 tick(engine, now)。
+    """
+
+    def __init__(self, directory: Optional[str] = None, config: Optional[Dict] = None):
+        self.config = dict(SNAPSHOT_CONFIG, **(config or {}))
+        self.directory = directory or self.config['DIR']
+        os.makedirs(self.directory, exist_ok=True)
+        self.dirty = set()
+        self.last_error: Optional[str] = None
+        self.stats = {'snapshots': 0, 'full': 0, 'failures': 0, 'last_bytes': 0, 'last_write_ms': 0.0,
+                      'last_seq': None, 'captured': 0}
+        self._base_seq = None
+        self._deltas_since_base = 0
+        # 第一次快照、或上次写出失败时写全量
+        self._force_full = True
+        self._last_time = None
+        # 正在进行的快照: 待捕获 {mint名: MintStream} 与已捕获 [(mint名, 状态)]
+        self._job: Optional[Dict] = None
+        self._pending: Dict[str, MintStream] = {}
+        self._writing = threading.Event()
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name='engine-snapshot', daemon=True)
+        self._thread.start()
+
+    def touch(self, mint_name: str):
+        """mint状态即将改动: 待捕获时先捕获（写时复制），并记为脏"""
+        if mint_name in self._pending:
+            self._capture(mint_name)
+        self.dirty.add(mint_name)
+
+    def tick(self, engine: StreamEngine, now: int):
+        if self._job is not None:
+            self._capture_some(self.config['CAPTURE_PER_EVENT'])
+            if not self._pending:
+                self._submit()
+        elif self._last_time is None:
+            self._last_time = now
+        elif now - self._last_time >= self.config['INTERVAL_MS'] and not self._writing.is_set():
+            self._last_time = now
+            self.begin(engine)
+
+    def begin(self, engine: StreamEngine, full: bool = False):
+        """在两笔事件之间开始一次快照，状态以 engine.events_seen 为准"""
+        full = full or self._force_full or self._deltas_since_base + 1 >= self.config['FULL_EVERY']
+        mints = engine.mints
+        if full:
+            pending = dict(mints)
+        else:
+            pending = {name: mints[name] for name in self.dirty if name in mints}
+        self.dirty = set()
+        self._force_full = False
+        self._pending = pending
+        self._job = {
+            'kind': KIND_BASE if full else KIND_DELTA,
+            'seq': engine.events_seen,
+            'meta': {
+                'format_version': FORMAT_VERSION,
+                'seq': engine.events_seen,
+                'base_seq': None if full else self._base_seq,
+                'created_at': time.time(),
+                'config': dict(engine.config),
+                'order': list(mints),
+                'spilled': sorted(engine.spilled),
+                'last_eviction_check': engine._last_eviction_check,
+                'rule_version': engine.rule_book.version if engine.rule_book is not None else None,
+            },
+            'items': [],
+        }
+        if not pending:
+            self._submit()
+
+    def snapshot_now(self, engine: StreamEngine, full: bool = False):
+        """同步写一次快照（停机时用），等待写完"""
+        if self._job is None:
+            self.begin(engine, full)
+        if self._job is not None:
+            self._capture_some(len(self._pending))
+            self._submit()
+        self._queue.join()
+
+    def close(self, engine: Optional[StreamEngine] = None):
+        """给定 engine 时先同步写最后一次快照，然后停止写出线程"""
+        if engine is not None:
+            self.snapshot_now(engine)
+        self._queue.join()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _capture(self, mint_name: str):
+        stream = self._pending.pop(mint_name)
+        self._job['items'].append((mint_name, stream.to_dict()))
+        self.stats['captured'] += 1
+
+    def _capture_some(self, count: int):
+        for _ in range(min(count, len(self._pending))):
+            self._capture(next(iter(self._pending)))
+
+    def _submit(self):
+        job, self._job = self._job, None
+        if job['kind'] == KIND_BASE:
+            self._base_seq = job['seq']
+            self._deltas_since_base = 0
+        else:
+            self._deltas_since_base += 1
+        self._writing.set()
+        self._queue.put(job)
+
+    # ---------- 写出线程 ----------
+
+    def _write_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(job)
+            finally:
+                if self._queue.empty():
+                    self._writing.clear()
+                self._queue.task_done()
+
+    def _write(self, job: Dict):
+        started = time.perf_counter()
+        path = segment_path(self.directory, job['seq'], job['kind'])
+        try:
+            size = write_segment(path, job['kind'], job['seq'], job['meta'], job['items'],
+                                 self.config['COMPRESS_LEVEL'], lambda: time.sleep(0))
+        except (OSError, pickle.PicklingError) as e:
+            # 增量链断开，下一次改写全量
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.stats['failures'] += 1
+            self._force_full = True
+            return
+        if job['kind'] == KIND_BASE:
+            self._remove_others(path)
+            self.stats['full'] += 1
+        self.last_error = None
+        self.stats['snapshots'] += 1
+        self.stats['last_bytes'] = size
+        self.stats['last_seq'] = job['seq']
+        self.stats['last_write_ms'] = (time.perf_counter() - started) * 1000
+
+    def _remove_others(self, keep_path: str):
+        """全量写成功后删除其余快照文件（包括重启前留下的）"""
+        for _, _, path in list_segments(self.directory):
+            if path != keep_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# ---------- 核对 ----------
+
+def verify_restart(mint_info: Dict, directory: str, stop_fraction: float = 0.5,
+                   config: Optional[Dict] = None) -> Dict:
+    """回放到 stop_fraction 处"重启"（丢弃引擎，从快照恢复并重放之后的事件），与不中断的回放对比决策事件"""
+    events = list(merge_trade_streams(mint_info))
+    stop_at = int(len(events) * stop_fraction)
+
+    reference = StreamEngine(clock_fills=True)
+    expected = []
+    for i, (mint_name, trade) in enumerate(events):
+        decisions = reference.on_trade(mint_name, trade)
+        expected.extend((i, event) for event in decisions)
+    expected.extend((len(events), event) for event in reference.finish_all())
+
+    snapshotter = EngineSnapshotter(directory, config)
+    engine = StreamEngine(clock_fills=True)
+    engine.snapshotter = snapshotter
+    for mint_name, trade in events[:stop_at]:
+        engine.on_trade(mint_name, trade)
+    snapshotter.close()  # 模拟崩溃: 只保留已经写出的快照
+
+    started = time.perf_counter()
+    restored = restore_engine(directory, clock_fills=True)
+    restore_ms = (time.perf_counter() - started) * 1000
+    resumed_from = restored.events_seen if restored is not None else 0
+    restored = restored or StreamEngine(clock_fills=True)
+    actual = []
+    for i, (mint_name, trade) in enumerate(events_after(iter(events), restored), start=resumed_from):
+        actual.extend((i, event) for event in restored.on_trade(mint_name, trade))
+    actual.extend((len(events), event) for event in restored.finish_all())
+    expected_after = [item for item in expected if item[0] >= resumed_from]
+    return {
+        'events': len(events),
+        'stopped_at': stop_at,
+        'resumed_from': resumed_from,
+        'restore_ms': restore_ms,
+        'active_mints': len(restored.mints),
+        'decisions': len(actual),
+        'equal': actual == expected_after,
+        'stats': snapshotter.stats,
+    }
+
+
+def main():
+    log_file = sys.argv[1] if len(sys.argv) > 1 else '/Users/xcold/Desktop/mint_temp.log'
+    directory = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                   'snapshots')
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    result = verify_restart(mint_info, directory, config={'INTERVAL_MS': 10 * 1000})
+    print(f"事件 {result['events']}, 中断于 {result['stopped_at']}, 从 {result['resumed_from']} 重放, "
+          f"恢复耗时 {result['restore_ms']:.1f}ms, 活跃mint {result['active_mints']}")
+    print(f"快照 {result['stats']['snapshots']} 次 (全量 {result['stats']['full']}), "
+          f"最近一次 {result['stats']['last_bytes'] / 1024:.1f}KB")
+    print(f"重放后决策 {result['decisions']} 条, 与不中断回放一致: {result['equal']}")
+
+
+if __name__ == "__main__":
+    main()
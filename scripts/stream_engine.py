@@ -0,0 +1,942 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式信号引擎
+逐笔接收交易，按mint维护增量状态，给出与 pump.backtest_mint 完全一致的买入/卖出决策。
+
+每笔交易的更新是 O(1) 的:
+    - 买入条件用到的前N笔窗口: 定长 deque + 卖单计数 + 单调队列维护最高/最低价。
+      净SOL按窗口内从旧到新的顺序求和（窗口长度由配置固定），与批量回测 sum(切片) 的浮点结果逐位相同。
+    - 持仓中的移动止损/止盈/时间止损只依赖上一笔的状态。
+    - 目标用户检查只记录买单序号与目标用户买单序号，候选信号按序号区间判断。
+
+批量回测中有三处用到"未来"数据，流式引擎在它们确定之后才给出决策（决策延后，但结果不变）:
+    1. 信号后5个买单中是否出现目标用户 → 等到5个买单到达（或出现目标用户）
+    2. 买入/卖出延迟成交取"目标时间之前最后一笔"的价格 → 等到第一笔 tradetime >= 目标时间 的交易到达
+    3. 交易数少于20的mint不回测 → 累计满20笔之前不开仓
+数据结束时调用 finish()，按批量回测的规则处理仍未确定的部分（强制卖出等）。
+
+交易历史保存在定长环形缓冲区（ring_buffer.TradeRingBuffer）中，容量由配置的窗口长度推导；
+等待确认的候选信号和持仓仍需要的交易通过 keep_from 保留，交易记录用到的快照在确定时取出。
+
+clock_fills=True 时延迟成交按全局时钟（任意mint的交易时间）推进: 时钟到达目标时间即以该mint
+此前最后一笔价格成交，不必等该mint自己的下一笔交易。只要该mint之后还有交易，结果与批量回测相同；
+该mint在目标时间后再无交易时，成交价取最后一笔（批量回测取触发点）。
+
+用法:
+    engine = StreamEngine()
+    for mint, trade in 按时间排序的交易流:
+        for event in engine.on_trade(mint, trade):
+            ...
+    engine.finish_all()
+    python stream_engine.py [mint_log] 与 pump.backtest_mint 逐笔核对，并核对淘汰与规则热更新
+"""
+import bisect
+import heapq
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+import pump
+from feature_registry import FeatureRegistry, register_rule_set
+from ring_buffer import TradeRingBuffer, capacity_for, history_requirements
+
+# 批量回测要求的最少交易数
+MIN_TRADES_FOR_BACKTEST = 20
+# 目标用户检查的买单数
+TARGET_USER_LOOKAHEAD_BUYS = 5
+
+# 实时模式的mint状态淘汰
+EVICTION_CONFIG = {
+    'ENABLED': False,
+    'IDLE_TIMEOUT_MS': 10 * 60 * 1000,  # 超过此时长没有交易的mint被淘汰
+    'MAX_ACTIVE_MINTS': 20000,  # 活跃mint数上限（内存上限），超出时淘汰最久未交易的，None 为不限
+    'CHECK_INTERVAL_MS': 1000,  # 空闲检查间隔（事件时间）
+    'SPILL_DIR': None,  # 淘汰状态落盘目录，None 为直接丢弃
+}
+
+
+class RollingWindow:
+    """最近 size 个值的窗口: 有序求和、负值计数、单调队列维护的最小/最大值"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque()
+        self.negative_count = 0
+        self._seq = 0
+        self._min = deque()  # (序号, 值)，值递增
+        self._max = deque()  # (序号, 值)，值递减
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def push(self, value: float, key: Optional[float] = None):
+        """加入一个值；key 用于最小/最大值（缺省为 value 本身）"""
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            if old < 0:
+                self.negative_count -= 1
+        self.values.append(value)
+        if value < 0:
+            self.negative_count += 1
+
+        key = value if key is None else key
+        seq = self._seq
+        self._seq += 1
+        while self._min and self._min[-1][1] >= key:
+            self._min.pop()
+        self._min.append((seq, key))
+        while self._max and self._max[-1][1] <= key:
+            self._max.pop()
+        self._max.append((seq, key))
+        oldest = seq - self.size + 1
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+
+    def total(self) -> float:
+        # 与批量回测的 sum(trade['tradeamount'] for trade in window) 保持相同的求和顺序
+        return sum(self.values)
+
+    def min_key(self) -> float:
+        return self._min[0][1]
+
+    def max_key(self) -> float:
+        return self._max[0][1]
+
+    def to_dict(self) -> Dict:
+        return {
+            'size': self.size,
+            'values': list(self.values),
+            'negative_count': self.negative_count,
+            'seq': self._seq,
+            'min': [list(item) for item in self._min],
+            'max': [list(item) for item in self._max],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RollingWindow':
+        window = cls(data['size'])
+        window.values = deque(data['values'])
+        window.negative_count = data['negative_count']
+        window._seq = data['seq']
+        window._min = deque(tuple(item) for item in data['min'])
+        window._max = deque(tuple(item) for item in data['max'])
+        return window
+
+
+class MintStream:
+    """单个mint的流式状态"""
+
+    def __init__(self, mint_name: str, config: Dict, history_config: Optional[Dict] = None):
+        self.mint_name = mint_name
+        self.config = config
+        self.history = TradeRingBuffer.for_configs(config, history_config or {})
+        self.creation_time = None
+
+        self.window_7 = RollingWindow(config['WINDOW_SIZE_7'])
+        self.window_8 = RollingWindow(config['WINDOW_SIZE_8'])
+        self.window_19 = RollingWindow(config['WINDOW_SIZE_19'])
+
+        # 买单序号（从1开始）与目标用户买单的序号
+        self.buy_count = 0
+        self.target_buy_ranks: List[int] = []
+
+        # 通过因果条件的候选信号 [(交易索引, 该笔及之前的买单数)]
+        self.candidates = deque()
+        # 下一次寻找买入信号的起点（= 上一笔的 actual_sell_index + 1）
+        self.next_index = 1
+        self.position: Optional[Dict] = None
+        self.trades: List[Dict] = []
+        self.target_user_count = 0
+        self.finished = False
+        # 已登记到引擎时钟堆的成交目标时间
+        self.scheduled_fill_time = None
+        # 引擎换用 rule.json / sell_rules.json 后由引擎设置（不随状态序列化）:
+        # buy_gate(history, index, creation_time) 代替 pump 的买入条件，sell_config 用于之后开的持仓
+        self.buy_gate = None
+        self.sell_config = None
+
+    # ---------- 买入条件 ----------
+
+    def _passes_buy_filters(self, index: int, trade: Dict) -> bool:
+        """find_buy_signal 中只依赖当前及之前交易的条件，窗口此时尚未包含当前交易"""
+        if self.buy_gate is not None:
+            return self.buy_gate(self.history, index, self.creation_time)
+        config = self.config
+        if index < config['WINDOW_SIZE_19']:
+            return False
+        amount = trade['tradeamount']
+        if amount <= config['BUY_SIGNAL_AMOUNT'] or amount >= 2:
+            return False
+        nowsol = trade.get('nowsol', 100)
+        if nowsol >= config['MIN_NOW_SOL'] or nowsol <= 2.0:
+            return False
+        if (trade['tradetime'] - self.creation_time) / 1000 < config['MIN_TIME_FROM_CREATION']:
+            return False
+        if self.window_7.total() >= config['MIN_NET_SOL_7']:
+            return False
+        if self.window_8.negative_count <= config['MIN_SELL_COUNT']:
+            return False
+        if self.window_19.total() <= config['MIN_NET_SOL']:
+            return False
+        if self.window_19.min_key() > (1 - config['PRICE_INCREASE_THRESHOLD']) * self.window_19.max_key():
+            return False
+        return True
+
+    def _target_user_status(self, buys_before: int, final: bool) -> Optional[bool]:
+        """信号后 TARGET_USER_LOOKAHEAD_BUYS 个买单内是否出现目标用户: True/False，尚未确定时返回 None"""
+        last_rank = buys_before + TARGET_USER_LOOKAHEAD_BUYS
+        pos = bisect.bisect_right(self.target_buy_ranks, buys_before)
+        if pos < len(self.target_buy_ranks) and self.target_buy_ranks[pos] <= last_rank:
+            return True
+        if self.buy_count >= last_rank or final:
+            return False
+        return None
+
+    # ---------- 逐笔处理 ----------
+
+    def _retain_from(self) -> Optional[int]:
+        """仍可能被访问的最早交易索引，更早的交易可以从缓冲区覆盖"""
+        position = self.position
+        # 持仓期间 scan 之前的候选一定不晚于 actual_sell_index，会被跳过
+        skip_before = self.next_index if position is None else max(self.next_index, position['scan'])
+        candidates = self.candidates
+        while candidates and candidates[0][0] < skip_before:
+            candidates.popleft()
+        keep = [candidates[0][0]] if candidates else []
+        if position is not None:
+            stage = position['stage']
+            if stage == 'buy_fill':
+                keep.append(position['signal_index'])
+            elif stage == 'holding':
+                # rule1 卖出规则的暴涨/冷淡期检查向前回看到买入点
+                keep.append(position['actual_buy_index'] if 'rule_sell' in position else position['scan'] - 1)
+            else:
+                keep.append(position['sell_index'])
+        return min(keep) if keep else None
+
+    def on_trade(self, trade: Dict) -> List[Dict]:
+        index = self.history.append(trade, self._retain_from())
+        if index == 0:
+            self.creation_time = trade['tradetime']
+
+        amount = trade['tradeamount']
+        if amount > 0:
+            self.buy_count += 1
+            if trade.get('user') == pump.TARGET_USER:
+                self.target_buy_ranks.append(self.buy_count)
+
+        if self._passes_buy_filters(index, trade):
+            self.candidates.append((index, self.buy_count))
+
+        self.window_7.push(amount)
+        self.window_8.push(amount)
+        self.window_19.push(amount, trade['price'])
+        return self._advance(final=False)
+
+    def last_tradetime(self) -> int:
+        return self.history[len(self.history) - 1]['tradetime']
+
+    def pending_fill_time(self) -> Optional[int]:
+        """等待延迟成交时返回目标时间"""
+        position = self.position
+        if position is None:
+            return None
+        if position['stage'] == 'buy_fill':
+            return position['actual_buy_time']
+        if position['stage'] == 'sell_fill':
+            return position['actual_sell_time']
+        return None
+
+    def on_clock(self, now: int) -> List[Dict]:
+        """全局时钟推进到 now，到期的延迟成交按此前最后一笔价格成交"""
+        return self._advance(final=False, now=now)
+
+    def finish(self) -> List[Dict]:
+        """数据结束: 未确定的候选按无目标用户处理，持仓强制卖出"""
+        if self.finished:
+            return []
+        self.finished = True
+        return self._advance(final=True)
+
+    def to_dict(self) -> Dict:
+        """序列化为可JSON/pickle的字典（不含已完成的交易记录和配置）"""
+        self._retain_from()
+        # 之后的候选只会用到当前买单数之后的目标用户序号
+        min_rank = self.candidates[0][1] if self.candidates else self.buy_count
+        position = None
+        if self.position is not None:
+            position = dict(self.position)
+            position['rows'] = [[index, row] for index, row in self.position['rows'].items()]
+        return {
+            'mint_name': self.mint_name,
+            'creation_time': self.creation_time,
+            'history': self.history.to_dict(),
+            'window_7': self.window_7.to_dict(),
+            'window_8': self.window_8.to_dict(),
+            'window_19': self.window_19.to_dict(),
+            'buy_count': self.buy_count,
+            'target_buy_ranks': [rank for rank in self.target_buy_ranks if rank > min_rank],
+            'candidates': [list(item) for item in self.candidates],
+            'next_index': self.next_index,
+            'position': position,
+            'target_user_count': self.target_user_count,
+            'finished': self.finished,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, config: Dict) -> 'MintStream':
+        stream = cls(data['mint_name'], config)
+        stream.creation_time = data['creation_time']
+        stream.history = TradeRingBuffer.from_dict(data['history'])
+        stream.window_7 = RollingWindow.from_dict(data['window_7'])
+        stream.window_8 = RollingWindow.from_dict(data['window_8'])
+        stream.window_19 = RollingWindow.from_dict(data['window_19'])
+        stream.buy_count = data['buy_count']
+        stream.target_buy_ranks = list(data['target_buy_ranks'])
+        stream.candidates = deque(tuple(item) for item in data['candidates'])
+        stream.next_index = data['next_index']
+        if data['position'] is not None:
+            position = dict(data['position'])
+            position['rows'] = {index: row for index, row in position['rows']}
+            stream.position = position
+        stream.target_user_count = data['target_user_count']
+        stream.finished = data['finished']
+        return stream
+
+    def _resolve_fill(self, trigger_index: int, target_time: int, scan_from: int, final: bool,
+                      now: Optional[int] = None):
+        """get_price_at_time 的流式版本: 返回 ((价格, 索引), 下次扫描起点)，未确定时价格项为 None"""
+        last = len(self.history) - 1
+        for k in range(max(scan_from, trigger_index + 1), last + 1):
+            if self.history[k]['tradetime'] >= target_time:
+                return (self.history[k - 1]['price'], k - 1), k
+        if final:
+            return (self.history[trigger_index]['price'], trigger_index), last + 1
+        if now is not None and now >= target_time:
+            return (self.history[last]['price'], last), last + 1
+        return None, last + 1
+
+    def _advance(self, final: bool, now: Optional[int] = None) -> List[Dict]:
+        events = []
+        while True:
+            position = self.position
+            if position is None:
+                if len(self.history) < MIN_TRADES_FOR_BACKTEST:
+                    if final:
+                        self.candidates.clear()
+                    break
+                while self.candidates and self.candidates[0][0] < self.next_index:
+                    self.candidates.popleft()
+                if not self.candidates:
+                    break
+                signal_index, buys_before = self.candidates[0]
+                found_target = self._target_user_status(buys_before, final)
+                if found_target is None:
+                    break
+                self.candidates.popleft()
+                if found_target:
+                    self.target_user_count += 1
+                    continue
+                trigger_time = self.history[signal_index]['tradetime']
+                self.position = {
+                    'stage': 'buy_fill',
+                    'signal_index': signal_index,
+                    'rows': {signal_index: self.history[signal_index]},
+                    'actual_buy_time': trigger_time + self.config['BUY_DELAY_MS'],
+                    'scan': signal_index + 1,
+                }
+                events.append({'type': 'buy_signal', 'mint': self.mint_name, 'index': signal_index,
+                               'tradetime': trigger_time})
+                continue
+
+            stage = position['stage']
+            if stage == 'buy_fill':
+                fill, position['scan'] = self._resolve_fill(
+                    position['signal_index'], position['actual_buy_time'], position['scan'], final, now)
+                if fill is None:
+                    break
+                position['buy_price'], position['actual_buy_index'] = fill
+                position['rows'][fill[1]] = self.history[fill[1]]
+                position['peak_price'] = position['buy_price']
+                position['scan'] = position['actual_buy_index']
+                if self.sell_config:
+                    position['rule_sell'] = self._rule_sell_state(position)
+                position['stage'] = 'holding'
+                events.append({'type': 'buy_fill', 'mint': self.mint_name, 'index': fill[1],
+                               'price': fill[0], 'nowsol': self.history[fill[1]]['nowsol'],
+                               'tradetime': position['actual_buy_time']})
+            elif stage == 'holding':
+                signal = self._scan_rule_sell(position) if 'rule_sell' in position else self._scan_sell(position)
+                if signal is None:
+                    if not final:
+                        break
+                    signal = (len(self.history) - 1,
+                              "强制卖出" if 'rule_sell' in position else "强制卖出 (到达交易数据末尾)")
+                position['sell_index'], position['sell_reason'] = signal
+                position['rows'][signal[0]] = self.history[signal[0]]
+                sell_time = self.history[signal[0]]['tradetime']
+                position['actual_sell_time'] = sell_time + self.config['SELL_DELAY_MS']
+                position['scan'] = signal[0] + 1
+                position['stage'] = 'sell_fill'
+                events.append({'type': 'sell_signal', 'mint': self.mint_name, 'index': signal[0],
+                               'reason': signal[1], 'tradetime': sell_time})
+            else:
+                fill, position['scan'] = self._resolve_fill(
+                    position['sell_index'], position['actual_sell_time'], position['scan'], final, now)
+                if fill is None:
+                    break
+                record = self._close_position(position, fill)
+                self.trades.append(record)
+                self.next_index = record['actual_sell_index'] + 1
+                self.position = None
+                events.append({'type': 'trade', 'mint': self.mint_name, 'record': record,
+                               'tradetime': position['actual_sell_time']})
+        return events
+
+    def _scan_sell(self, position: Dict):
+        """find_sell_signal 的逐笔版本，从上次停下的索引继续"""
+        config = self.config
+        buy_index = position['actual_buy_index']
+        buy_price = position['buy_price']
+        buy_time = position['actual_buy_time']
+        for i in range(position['scan'], len(self.history)):
+            position['scan'] = i + 1
+            trade = self.history[i]
+            current_price = trade['price']
+            if current_price > position['peak_price']:
+                position['peak_price'] = current_price
+            peak_price = position['peak_price']
+            if current_price < peak_price * (1 - config['STOP_LOSS_PERCENTAGE']):
+                return i, f"止损卖出 (价格从{peak_price:.8f}跌至{current_price:.8f})"
+            profit_rate = (current_price - buy_price) / buy_price
+            if profit_rate > config['TAKE_PROFIT_PERCENTAGE']:
+                return i, f"止盈卖出 (盈利{profit_rate*100:.2f}%)"
+            held = (trade['tradetime'] - buy_time) / 1000
+            if held > config['MAX_HOLD_TIME_SECONDS']:
+                if i > buy_index:
+                    return i - 1, f"时间止损 (持有{held:.1f}秒)"
+                return i, f"时间止损 (持有{held:.1f}秒，价格一致)"
+        return None
+
+    def _rule_sell_state(self, position: Dict) -> Dict:
+        """开仓时按当前 sell_config 建立 rule1 卖出规则的状态（持仓期间规则再更新也不影响这笔持仓）"""
+        buy_index = position['actual_buy_index']
+        config = dict(self.sell_config)
+        start = max(self.history.first_index, buy_index - config['LOOKBACK_TRADES_FOR_MIN_PRICE'])
+        prices = [self.history[i]['price'] for i in range(start, buy_index) if self.history[i]['price'] > 0]
+        return {
+            'config': config,
+            'min_price_before_buy': min(prices) if prices else None,
+            'max_price': position['buy_price'],
+            'max_profit_rate': 0.0,
+            'in_retracement': False,
+            'inflection_count': 0,
+            'prev_price': None,
+            'prev_prev_price': None,
+        }
+
+    def _scan_rule_sell(self, position: Dict):
+        """rule1 卖出规则（rule1_optimize.variant_find_sell_signal）的逐笔版本，从上次停下的索引继续"""
+        state = position['rule_sell']
+        config = state['config']
+        buy_index = position['actual_buy_index']
+        buy_price = position['buy_price']
+        buy_time = position['actual_buy_time']
+        for i in range(position['scan'], len(self.history)):
+            position['scan'] = i + 1
+            trade = self.history[i]
+            current_price = trade['price']
+            current_time = trade['tradetime']
+            if current_price > state['max_price']:
+                state['max_price'] = current_price
+                state['max_profit_rate'] = (current_price - buy_price) / buy_price
+            max_price = state['max_price']
+            profit_rate = (current_price - buy_price) / buy_price
+
+            if float(trade.get('nowsol', 0)) >= config['MAX_NOWSOL_SELL']:
+                return i, "市值止盈"
+            if config.get('PROFIT_RATE_SELL_ENABLED', False) and profit_rate >= config.get('PROFIT_RATE_SELL_THRESHOLD', 0.30):
+                return i, "盈利率止盈"
+            if profit_rate <= -config['LOSS_PERCENTAGE']:
+                min_price = state['min_price_before_buy']
+                if min_price is not None and current_price < min_price:
+                    return i, "亏损止损"
+            if max_price > buy_price:
+                high_profit = state['max_profit_rate'] >= config['HIGH_PROFIT_THRESHOLD']
+                threshold = config['RETRACEMENT_HIGH_PROFIT'] if high_profit else config['RETRACEMENT_LOW_PROFIT']
+                if (max_price - current_price) / max_price >= threshold:
+                    if not state['in_retracement']:
+                        state.update(in_retracement=True, inflection_count=0, prev_price=None, prev_prev_price=None)
+                    prev_price, prev_prev_price = state['prev_price'], state['prev_prev_price']
+                    if (prev_price is not None and prev_prev_price is not None
+                            and prev_price >= prev_prev_price and current_price < prev_price):
+                        state['inflection_count'] += 1
+                    if state['inflection_count'] >= config.get('RETRACEMENT_MIN_COUNT', 1):
+                        return i, f"回撤止损({'高' if high_profit else '低'})"
+                else:
+                    state['in_retracement'] = False
+                    state['inflection_count'] = 0
+            state['prev_prev_price'] = state['prev_price']
+            state['prev_price'] = current_price
+
+            if (current_time - buy_time) / 1000 > config['MAX_HOLD_TIME_SECONDS']:
+                return (i - 1 if i > buy_index else i), "时间止损"
+            if config.get('SPIKE_SELL_ENABLED', False) and profit_rate > 0:
+                spike_start_time = current_time - config.get('SPIKE_LOOKBACK_MS', 1000)
+                ref_price = None
+                for j in range(i - 1, buy_index - 1, -1):
+                    if self.history[j]['tradetime'] <= spike_start_time:
+                        ref_price = self.history[j]['price']
+                        break
+                if ref_price is not None and ref_price > 0:
+                    if (current_price - ref_price) / ref_price * 100.0 >= config.get('SPIKE_THRESHOLD_PCT', 10.0):
+                        return i, "短期暴涨卖出"
+            if config['QUIET_PERIOD_ENABLED'] and float(trade.get('tradeamount', 0)) < 0:
+                quiet_start_time = current_time - config['QUIET_PERIOD_SECONDS'] * 1000
+                has_large_trade = False
+                for j in range(i - 1, buy_index - 1, -1):
+                    prev_trade = self.history[j]
+                    if prev_trade['tradetime'] < quiet_start_time:
+                        break
+                    if abs(float(prev_trade.get('tradeamount', 0))) >= config['QUIET_PERIOD_MIN_AMOUNT']:
+                        has_large_trade = True
+                        break
+                if not has_large_trade:
+                    return i, "冷淡期卖出"
+        return None
+
+    def _close_position(self, position: Dict, fill) -> Dict:
+        sell_price, actual_sell_index = fill
+        buy_index = position['actual_buy_index']
+        rows = position['rows']
+        rows[actual_sell_index] = self.history[actual_sell_index]
+        settlement = {
+            'sell_trigger_time': rows[position['sell_index']]['tradetime'],
+            'actual_sell_time': position['actual_sell_time'],
+            'sell_price': sell_price,
+            'actual_sell_index': actual_sell_index,
+        }
+        settlement.update(pump.calculate_exit_pnl(rows[buy_index]['nowsol'],
+                                                  position['buy_price'], sell_price))
+        return pump.build_trade_record(self.mint_name, rows, position['signal_index'],
+                                       position['actual_buy_time'], position['buy_price'], buy_index,
+                                       position['sell_index'], position['sell_reason'], settlement)
+
+
+class StreamEngine:
+    """多mint流式引擎: 交易按mint分派到各自的 MintStream
+
+    clock_fills=True 时每笔交易先把全局时钟推进到它的 tradetime，
+    到期的延迟成交用 (目标时间, mint) 小顶堆找出。
+
+    eviction（见 EVICTION_CONFIG）启用时，mints 按最近一笔交易的先后排列（LRU）:
+    超过 IDLE_TIMEOUT_MS 没有交易、或活跃mint数超过 MAX_ACTIVE_MINTS 时从最久未交易的一端淘汰，
+    有持仓（含等待成交）的mint和正在处理这笔交易的mint永远不淘汰。配置了 SPILL_DIR 时淘汰的状态写成JSON文件，
+    该mint再有交易时从文件恢复，结果与从未淘汰相同；否则丢弃，再出现时从空状态开始。
+    时间均为事件时间（tradetime）。
+
+    rule_reloader（rule_reload.RuleReloader）给定时，每笔交易处理前检查是否有新发布的规则，
+    有则换用新的 rule_book，各mint的状态保持不变；决策事件带 rule_version。
+    rule_book 生效后买卖决策由它决定:
+        买入 → 候选信号改用 rule.json 的门槛（任一条规则 can_buy 即通过），代替 pump 的买入条件；
+              目标用户检查、延迟成交与之前相同
+        卖出 → 之后开的持仓按 sell_rules.json 的卖出规则（同 rule1 的 variant_find_sell_signal）逐笔判断，
+              规则在开仓时确定，已有持仓按开仓时的规则卖出
+    buy_rules 不是 rule_compiler.CompiledRuleSet（自定义 compile_fn）时买入仍按 pump 的条件。
+
+    features（feature_registry.FeatureRegistry）给定时，每笔交易在该mint的历史上运行登记的全部策略，
+    同一 (特征函数, 参数) 只计算一次，有结果的策略产生 strategy_signal 事件；
+    新规则生效时 rule.json 的各条规则重新登记为策略。环形缓冲区容量包含登记特征的回看需求，
+    登记变化后已有mint的缓冲区随之扩大（之前已覆盖的交易不会恢复）。
+
+    snapshotter（snapshot.EngineSnapshotter）给定时，改动mint状态前调用 snapshotter.touch(mint名)，
+    每笔交易处理完调用 snapshotter.tick(engine, tradetime)，由它定期写快照；events_seen 是已处理的交易数，
+    从快照恢复后只需重放 events_seen 之后的事件。
+
+    改动某个mint状态的中途抛出异常时（如交易字段格式错误），该mint的状态可能只更新了一半:
+    on_trade 丢弃这个mint的状态（reset_mint，已完成的交易记录保留）后重新抛出，出错的事件也计入 events_seen，
+    从快照恢复时不会重放它；其他mint不受影响。
+    """
+
+    def __init__(self, config: Optional[Dict] = None, clock_fills: bool = False,
+                 eviction: Optional[Dict] = None, rule_reloader=None, features=None, snapshotter=None):
+        self.config = dict(pump.STRATEGY_CONFIG if config is None else config)
+        self.clock_fills = clock_fills
+        self.eviction = eviction if eviction is not None and eviction.get('ENABLED') else None
+        self.mints: 'OrderedDict[str, MintStream]' = OrderedDict()
+        self._fill_heap = []
+        # 已淘汰mint的完成交易记录
+        self._evicted_trades: List[Dict] = []
+        self.spilled = set()
+        self._last_eviction_check = None
+        self.eviction_stats = {'evicted': 0, 'spilled': 0, 'restored': 0, 'dropped': 0}
+        # 已淘汰mint的过滤回看截断次数
+        self._evicted_truncated = 0
+        if self.eviction and self.eviction.get('SPILL_DIR'):
+            os.makedirs(self.eviction['SPILL_DIR'], exist_ok=True)
+        self.features = features
+        self.history_config: Optional[Dict] = None
+        self._features_version = None
+        self.rule_reloader = rule_reloader
+        self.rule_book = None
+        self.rule_swaps = 0
+        # rule_book 的买入门槛（每条规则登记为策略）与卖出配置，None 为按 pump 的配置
+        self.rule_features: Optional[FeatureRegistry] = None
+        self.sell_config: Optional[Dict] = None
+        self.snapshotter = snapshotter
+        self.events_seen = 0
+        # 出错后被丢弃状态的mint数，及其中未平仓的持仓数
+        self.reset_stats = {'mints': 0, 'positions': 0}
+        # 正在改动状态的mint，出错时丢弃它的状态
+        self._active_mint: Optional[str] = None
+        if rule_reloader is not None and rule_reloader.published is not None:
+            self.swap_rules(rule_reloader.published)
+
+    def on_trade(self, mint_name: str, trade: Dict) -> List[Dict]:
+        try:
+            events = self._apply_trade(mint_name, trade)
+        except Exception:
+            if self._active_mint is not None:
+                self.reset_mint(self._active_mint)
+                self._active_mint = None
+            self.events_seen += 1
+            raise
+        self.events_seen += 1
+        if self.snapshotter is not None:
+            self.snapshotter.tick(self, trade['tradetime'])
+        return events
+
+    def _apply_trade(self, mint_name: str, trade: Dict) -> List[Dict]:
+        if self.rule_reloader is not None:
+            rule_book = self.rule_reloader.published
+            if rule_book is not self.rule_book:
+                self.swap_rules(rule_book)
+        if self.features is not None and self.features.version != self._features_version:
+            self._update_history_config()
+        now = trade['tradetime']
+        events = self.advance_clock(now) if self.clock_fills else []
+        stream = self.mints.get(mint_name)
+        if stream is None:
+            stream = self._restore(mint_name) if mint_name in self.spilled else None
+            if stream is None:
+                stream = MintStream(mint_name, self.config, self.history_config)
+            self.mints[mint_name] = stream
+            if self.eviction:
+                self._evict_over_capacity(mint_name)
+        elif self.eviction:
+            self.mints.move_to_end(mint_name)
+        if self.snapshotter is not None:
+            self.snapshotter.touch(mint_name)
+        self._bind_rules(stream)
+        self._active_mint = mint_name
+        events.extend(stream.on_trade(trade))
+        self._active_mint = None
+        if self.features is not None and self.features.strategies:
+            index = len(stream.history) - 1
+            for name, result in self.features.evaluate(stream.history, index, stream.creation_time):
+                events.append(dict(result, type='strategy_signal', strategy=name, mint=mint_name,
+                                   index=index, tradetime=now))
+        if self.clock_fills:
+            self._schedule_fill(stream)
+        if self.eviction:
+            self._evict_idle(now, mint_name)
+        if events and self.rule_book is not None:
+            for event in events:
+                event['rule_version'] = self.rule_book.version
+        return events
+
+    def swap_rules(self, rule_book):
+        """在两笔事件之间换用新规则，不触碰各mint状态"""
+        self.rule_book = rule_book
+        self.rule_swaps += 1
+        self.rule_features = None
+        if hasattr(rule_book.buy_rules, 'rules'):
+            self.rule_features = FeatureRegistry()
+            register_rule_set(self.rule_features, rule_book.buy_rules)
+            if self.features is not None:
+                register_rule_set(self.features, rule_book.buy_rules)
+        self.sell_config = dict(rule_book.sell_config) or None
+        self._update_history_config()
+
+    def _passes_rules(self, history, index: int, creation_time: int) -> bool:
+        return bool(self.rule_features.evaluate(history, index, creation_time))
+
+    def _bind_rules(self, stream: MintStream):
+        """处理该mint的事件前设置当前规则"""
+        stream.buy_gate = self._passes_rules if self.rule_features is not None else None
+        stream.sell_config = self.sell_config
+
+    def _update_history_config(self):
+        """登记的特征或规则变化后更新新建mint的缓冲区配置，并扩大已有mint的缓冲区"""
+        configs = []
+        if self.features is not None:
+            self._features_version = self.features.version
+            configs.append(self.features.history_config())
+        if self.rule_features is not None:
+            configs.append(self.rule_features.history_config())
+        if self.sell_config:
+            configs.append(self.sell_config)
+        count, span_ms = history_requirements(*configs)
+        self.history_config = {'FEATURE_LOOKBACK_COUNT': count, 'FEATURE_WINDOW_MS': span_ms} if configs else None
+        for stream in self.mints.values():
+            self._reserve_history(stream)
+
+    def _reserve_history(self, stream: MintStream):
+        count, span_ms = history_requirements(self.config, self.history_config or {})
+        stream.history.reserve(capacity_for(count), span_ms)
+
+    # ---------- 淘汰与恢复 ----------
+
+    def _spill_path(self, mint_name: str) -> str:
+        return os.path.join(self.eviction['SPILL_DIR'], f"{mint_name}.json")
+
+    def _evict(self, mint_name: str):
+        if self.snapshotter is not None:
+            self.snapshotter.touch(mint_name)
+        stream = self.mints.pop(mint_name)
+        self._evicted_trades.extend(stream.trades)
+        self._evicted_truncated += stream.history.truncated_lookbacks
+        stream.history.truncated_lookbacks = 0
+        self.eviction_stats['evicted'] += 1
+        if self.eviction.get('SPILL_DIR'):
+            with open(self._spill_path(mint_name), 'w', encoding='utf-8') as f:
+                json.dump(stream.to_dict(), f, separators=(',', ':'))
+            self.spilled.add(mint_name)
+            self.eviction_stats['spilled'] += 1
+        else:
+            self.eviction_stats['dropped'] += 1
+
+    def _restore(self, mint_name: str) -> Optional[MintStream]:
+        path = self._spill_path(mint_name)
+        self.spilled.discard(mint_name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.remove(path)
+        self.eviction_stats['restored'] += 1
+        stream = MintStream.from_dict(data, self.config)
+        if self.history_config:
+            self._reserve_history(stream)
+        return stream
+
+    def _evict_candidates(self, should_evict, keep: str):
+        """从最久未交易的一端依次检查，有持仓的mint和正在处理的mint（keep）移到队尾；
+        should_evict(stream) 为False时停止"""
+        for _ in range(len(self.mints)):
+            mint_name, stream = next(iter(self.mints.items()))
+            if not should_evict(stream):
+                break
+            if stream.position is not None or mint_name == keep:
+                self.mints.move_to_end(mint_name)
+                continue
+            self._evict(mint_name)
+
+    def _evict_over_capacity(self, keep: str):
+        max_active = self.eviction.get('MAX_ACTIVE_MINTS')
+        if max_active and len(self.mints) > max_active:
+            self._evict_candidates(lambda stream: len(self.mints) > max_active, keep)
+
+    def _evict_idle(self, now: int, keep: str):
+        last_check = self._last_eviction_check
+        if last_check is not None and now - last_check < self.eviction['CHECK_INTERVAL_MS']:
+            return
+        self._last_eviction_check = now
+        idle_before = now - self.eviction['IDLE_TIMEOUT_MS']
+        self._evict_candidates(lambda stream: stream.last_tradetime() < idle_before, keep)
+
+    def advance_clock(self, now: int) -> List[Dict]:
+        """时钟推进到 now，处理所有目标时间 <= now 的延迟成交"""
+        events = []
+        heap = self._fill_heap
+        while heap and heap[0][0] <= now:
+            fill_time, mint_name = heapq.heappop(heap)
+            stream = self.mints.get(mint_name)
+            if stream is None or stream.scheduled_fill_time != fill_time:
+                continue
+            stream.scheduled_fill_time = None
+            if self.snapshotter is not None:
+                self.snapshotter.touch(mint_name)
+            self._bind_rules(stream)
+            self._active_mint = mint_name
+            events.extend(stream.on_clock(now))
+            self._active_mint = None
+            self._schedule_fill(stream)
+        return events
+
+    def _schedule_fill(self, stream: MintStream):
+        fill_time = stream.pending_fill_time()
+        if fill_time is not None and fill_time != stream.scheduled_fill_time:
+            stream.scheduled_fill_time = fill_time
+            heapq.heappush(self._fill_heap, (fill_time, stream.mint_name))
+
+    def reset_mint(self, mint_name: str) -> bool:
+        """丢弃该mint的状态，之后的交易按新mint从头开始（已完成的交易记录保留）；返回是否丢弃了未平仓的持仓"""
+        if self.snapshotter is not None:
+            self.snapshotter.touch(mint_name)
+        stream = self.mints.pop(mint_name, None)
+        if stream is None:
+            return False
+        self._evicted_trades.extend(stream.trades)
+        self._evicted_truncated += stream.history.truncated_lookbacks
+        self.reset_stats['mints'] += 1
+        if stream.position is not None:
+            self.reset_stats['positions'] += 1
+            return True
+        return False
+
+    def finish_mint(self, mint_name: str) -> List[Dict]:
+        stream = self.mints.get(mint_name)
+        if stream is None:
+            return []
+        if self.snapshotter is not None:
+            self.snapshotter.touch(mint_name)
+        self._bind_rules(stream)
+        return stream.finish()
+
+    def finish_all(self) -> List[Dict]:
+        """数据结束: 先恢复所有已落盘的mint，再逐个结束"""
+        for mint_name in list(self.spilled):
+            stream = self._restore(mint_name)
+            if stream is not None:
+                self.mints[mint_name] = stream
+        events = []
+        for mint_name, stream in self.mints.items():
+            if self.snapshotter is not None:
+                self.snapshotter.touch(mint_name)
+            self._bind_rules(stream)
+            events.extend(stream.finish())
+        return events
+
+    def truncated_lookbacks(self) -> int:
+        """过滤回看走到缓冲区起点的累计次数（ring_buffer.note_truncated）"""
+        return self._evicted_truncated + sum(stream.history.truncated_lookbacks for stream in self.mints.values())
+
+    def trades(self) -> List[Dict]:
+        return self._evicted_trades + [record for stream in self.mints.values() for record in stream.trades]
+
+
+def verify_against_backtest(mint_info: Dict) -> List[str]:
+    """逐个mint对比流式引擎与 pump.backtest_mint 的交易记录，返回不一致的mint描述"""
+    mismatches = []
+    for mint_name, mint_data in mint_info.items():
+        engine = StreamEngine()
+        for trade in mint_data['trade_data']:
+            engine.on_trade(mint_name, trade)
+        engine.finish_all()
+        expected = pump.backtest_mint(mint_name, mint_data)
+        actual = engine.trades()
+        if actual != expected:
+            mismatches.append(f"{mint_name}: 流式 {len(actual)} 笔, 批量 {len(expected)} 笔")
+    return mismatches
+
+
+def verify_eviction(mint_info: Dict, max_active: int = 3) -> Dict:
+    """按全局时间顺序回放，对比 MAX_ACTIVE_MINTS=max_active 且落盘的淘汰与不淘汰的交易记录"""
+    from replay import merge_trade_streams
+
+    key = lambda record: (record['mint_name'], record['buy_trigger_index'])
+    results = []
+    with tempfile.TemporaryDirectory() as spill_dir:
+        eviction = dict(EVICTION_CONFIG, ENABLED=True, MAX_ACTIVE_MINTS=max_active, SPILL_DIR=spill_dir)
+        for engine in (StreamEngine(clock_fills=True), StreamEngine(clock_fills=True, eviction=eviction)):
+            for mint_name, trade in merge_trade_streams(mint_info):
+                engine.on_trade(mint_name, trade)
+            engine.finish_all()
+            results.append((sorted(engine.trades(), key=key), engine))
+    (expected, _), (actual, engine) = results
+    return {'equal': actual == expected, 'expected': len(expected), 'actual': len(actual),
+            'eviction_stats': engine.eviction_stats}
+
+
+def verify_rule_reload(mint_info: Dict, rule_path: str, sell_rule_path: str) -> Dict:
+    """按全局时间顺序回放，与不换规则的回放对比，核对热更新确实改变决策:
+    回放到1/3时把 sell_rules.json 的 max_hold_time_seconds 改为1 → 之后开的持仓卖出点改变；
+    回放到2/3时把 rule.json 各条规则的 TIME_FROM_CREATION_MINUTES 改为1e9 → 之后触发的买入全部被挡住；
+    第一次换规则之前给出的决策事件与不换规则时相同。规则文件复制到临时目录后改写，原文件不变。"""
+    from rule_reload import RuleReloader, read_rule_file
+    from replay import merge_trade_streams
+
+    events = list(merge_trade_streams(mint_info))
+    first_swap, second_swap = len(events) // 3, len(events) * 2 // 3
+    t1, t2 = events[first_swap][1]['tradetime'], events[second_swap][1]['tradetime']
+    rules = read_rule_file(rule_path)
+    sell_rules = read_rule_file(sell_rule_path)
+
+    def write_json(path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as rule_dir:
+        paths = (os.path.join(rule_dir, 'rule.json'), os.path.join(rule_dir, 'sell_rules.json'))
+        for swap in (False, True):
+            buy_rules, sell = rules, sell_rules
+            write_json(paths[0], buy_rules)
+            write_json(paths[1], sell)
+            reloader = RuleReloader(*paths)
+            reloader.load_now()
+            engine = StreamEngine(clock_fills=True, rule_reloader=reloader)
+            decisions = []
+            for k, (mint_name, trade) in enumerate(events):
+                if swap and k in (first_swap, second_swap):
+                    if k == first_swap:
+                        sell = dict(sell, sell_conditions=dict(sell['sell_conditions'], max_hold_time_seconds=1))
+                        write_json(paths[1], sell)
+                    else:
+                        buy_rules = [dict(entry, params=dict(entry['params'], TIME_FROM_CREATION_MINUTES=1e9))
+                                     for entry in buy_rules]
+                        write_json(paths[0], buy_rules)
+                    reloader.check()
+                if k == first_swap:
+                    decided_before = len(decisions)
+                decisions.extend(engine.on_trade(mint_name, trade))
+            engine.finish_all()
+            results.append(({(record['mint_name'], record['buy_trigger_index']): record for record in engine.trades()},
+                            decisions))
+    (baseline, baseline_decisions), (reloaded, reloaded_decisions) = results
+
+    def bought_between(trades, start, end):
+        return [key for key, record in trades.items() if start <= record['buy_trigger_snapshot']['tradetime'] < end]
+
+    def exit_of(record):
+        return None if record is None else (record['sell_trigger_index'], record['sell_reason'])
+
+    unchanged_before = baseline_decisions[:decided_before] == reloaded_decisions[:decided_before]
+    changed_sells = sum(exit_of(reloaded[key]) != exit_of(baseline.get(key))
+                        for key in bought_between(reloaded, t1, t2))
+    buys_after = len(bought_between(reloaded, t2, float('inf')))
+    baseline_buys_after = len(bought_between(baseline, t2, float('inf')))
+    return {'unchanged_before': unchanged_before, 'changed_sells': changed_sells, 'buys_after': buys_after,
+            'baseline_buys_after': baseline_buys_after,
+            'changed': unchanged_before and changed_sells > 0 and buys_after == 0 < baseline_buys_after}
+
+
+def main():
+    log_file = sys.argv[1] if len(sys.argv) > 1 else '/Users/xcold/Desktop/mint_temp.log'
+    mint_info = pump.load_mint_info(log_file)
+    if not mint_info:
+        return
+    mismatches = verify_against_backtest(mint_info)
+    print(f"核对 {len(mint_info)} 个mint, 不一致 {len(mismatches)} 个")
+    for line in mismatches[:20]:
+        print(f"  {line}")
+    result = verify_eviction(mint_info)
+    print(f"淘汰核对(上限3个mint, 落盘): 交易 {result['actual']} 笔 / 不淘汰 {result['expected']} 笔, "
+          f"一致: {result['equal']}, {result['eviction_stats']}")
+    from rule_reload import RELOAD_CONFIG
+    result = verify_rule_reload(mint_info, RELOAD_CONFIG['RULE_PATH'], RELOAD_CONFIG['SELL_RULE_PATH'])
+    print(f"规则热更新核对: 换卖出规则后卖出点改变 {result['changed_sells']} 笔, "
+          f"换买入规则后买入 {result['buys_after']} 笔 (不换 {result['baseline_buys_after']} 笔), "
+          f"换规则前一致: {result['unchanged_before']}, 决策随规则改变: {result['changed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+买入特征辅助函数（rule1_optimize、pump_quant_demo、amm_quant_rule2 与 feature_registry 共用的唯一实现）
+trade_data 可以是列表或 ring_buffer.TradeRingBuffer，向前回看到 history_start(trade_data) 为止。
+按金额过滤后计数的回看和连续大单计数没有固定的回看笔数，走到缓冲区起点仍未结束时调用
+note_truncated（计数并扩大该mint的缓冲区）；列表从第一笔开始，不算截断。
+
+本模块没有导入副作用（不导入 pump、不修改全局配置），策略脚本与库模块都可以直接导入。
+"""
+from typing import Dict, List, Optional, Tuple
+
+from ring_buffer import history_start, note_truncated
+
+
+def get_time_diff_from_last_trade(trade_data: List[Dict], current_index: int) -> Optional[int]:
+    """
+    获取当前交易单距离上一个交易单的时间差（毫秒）
+
+    Returns:
+        时间差，没有上一笔交易时返回None
+    """
+    if current_index <= history_start(trade_data):
+        return None
+    return int(trade_data[current_index]['tradetime']) - int(trade_data[current_index - 1]['tradetime'])
+
+
+def is_max_amount_in_recent_trades(trade_data: List[Dict], current_index: int, current_amount: float, min_threshold: float, lookback_count: int) -> bool:
+    """
+    检查当前交易金额绝对值是否为近T单中最大
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        current_amount: 当前交易金额绝对值
+        min_threshold: 过滤掉交易金额绝对值小于此值的交易
+        lookback_count: 向前查看的交易数量
+
+    Returns:
+        True如果当前交易金额是最大的，否则False
+    """
+    filtered_amounts = []
+
+    # 从当前交易的前一笔开始向前遍历
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            amount = abs(float(trade_data[i].get('tradeamount', 0)))
+            # 过滤掉交易金额绝对值小于阈值的交易
+            if amount >= min_threshold:
+                filtered_amounts.append(amount)
+                # 如果已经收集到足够数量的交易，停止遍历
+                if len(filtered_amounts) >= lookback_count:
+                    break
+        except (TypeError, ValueError):
+            continue
+    else:
+        note_truncated(trade_data)
+
+    # 如果没有有效交易，当前交易默认为最大
+    if not filtered_amounts:
+        return True
+
+    # 检查当前交易金额是否大于所有历史交易金额
+    return current_amount > max(filtered_amounts)
+
+
+def get_filtered_trades_sum(trade_data: List[Dict], current_index: int, min_amount: float, count: int) -> Optional[float]:
+    """
+    获取过滤后的前N笔交易的金额总和
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        min_amount: 过滤掉交易金额绝对值小于此值的交易
+        count: 需要取的有效交易数量
+
+    Returns:
+        交易金额总和，如果有效交易数量不足则返回None
+    """
+    filtered_amounts = []
+
+    # 从当前交易的前一笔开始向前遍历
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            amount = float(trade_data[i].get('tradeamount', 0))
+            # 过滤掉交易金额绝对值小于阈值的交易
+            if abs(amount) >= min_amount:
+                filtered_amounts.append(amount)
+                # 如果已经收集到足够数量的交易，停止遍历
+                if len(filtered_amounts) >= count:
+                    break
+        except (TypeError, ValueError):
+            continue
+    else:
+        note_truncated(trade_data)
+
+    # 如果有效交易数量不足，返回None
+    if len(filtered_amounts) < count:
+        return None
+
+    return sum(filtered_amounts)
+
+
+def calculate_volatility(values: List[float]) -> float:
+    """
+    计算波动率（变异系数 = 标准差/均值）
+
+    Args:
+        values: 数值列表
+
+    Returns:
+        波动率值
+    """
+    if len(values) < 2:
+        return 0.0
+
+    mean = sum(values) / len(values)
+    if mean == 0:
+        return 0.0
+
+    variance = sum((x - mean) ** 2 for x in values) / len(values)
+    std_dev = variance ** 0.5
+    return std_dev / abs(mean)  # 变异系数
+
+
+def get_recent_trades_volatility(trade_data: List[Dict], current_index: int, lookback_count: int, min_amount: float, volatility_type: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    获取近N个交易单的价格、时间和金额波动率
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        lookback_count: 向前查看的交易数量
+        min_amount: 过滤掉交易金额绝对值小于此值的交易
+        volatility_type: 波动率类型 ('price', 'time', 'amount', 'all')
+
+    Returns:
+        (价格波动率, 时间波动率, 金额波动率) 元组，如果交易数量不足则返回 (None, None, None)
+    """
+    prices = []
+    time_intervals = []
+    amounts = []
+
+    # 从当前交易的前一笔开始向前遍历，过滤后取N笔有效交易
+    prev_time = None
+    valid_count = 0
+
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        if valid_count >= lookback_count:
+            break
+
+        try:
+            # 过滤交易金额绝对值小于阈值的交易
+            amount = abs(float(trade_data[i].get('tradeamount', 0)))
+            if amount < min_amount:
+                continue
+
+            valid_count += 1
+
+            if volatility_type in ('price', 'all'):
+                price = float(trade_data[i].get('price', 0))
+                if price > 0:
+                    prices.append(price)
+
+            if volatility_type in ('time', 'all'):
+                tradetime = float(trade_data[i].get('tradetime', 0))
+                if tradetime > 0:
+                    if prev_time is not None:
+                        # 计算时间间隔（毫秒）
+                        time_intervals.append(prev_time - tradetime)  # 因为是倒序遍历
+                    prev_time = tradetime
+
+            if volatility_type in ('amount', 'all'):
+                amounts.append(amount)
+        except (TypeError, ValueError):
+            continue
+    if valid_count < lookback_count:
+        note_truncated(trade_data)
+
+    price_volatility = None
+    time_volatility = None
+    amount_volatility = None
+
+    if volatility_type in ('price', 'all') and len(prices) >= 2:
+        price_volatility = calculate_volatility(prices)
+
+    if volatility_type in ('time', 'all') and len(time_intervals) >= 2:
+        time_volatility = calculate_volatility(time_intervals)
+
+    if volatility_type in ('amount', 'all') and len(amounts) >= 2:
+        amount_volatility = calculate_volatility(amounts)
+
+    return price_volatility, time_volatility, amount_volatility
+
+
+def get_price_ratio_to_min(trade_data: List[Dict], current_index: int, current_price: float, lookback_count: int) -> Optional[float]:
+    """
+    获取当前价格相对于近N单最低价的涨幅百分比
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        current_price: 当前交易价格
+        lookback_count: 向前查看的交易数量
+
+    Returns:
+        涨幅百分比 (当前价格/最低价 - 1) * 100，如果数据不足则返回None
+    """
+    prices = []
+    count = 0
+
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        if count >= lookback_count:
+            break
+        try:
+            price = float(trade_data[i].get('price', 0))
+            if price > 0:
+                prices.append(price)
+                count += 1
+        except (TypeError, ValueError):
+            continue
+
+    if not prices:
+        return None
+
+    min_price = min(prices)
+    if min_price <= 0:
+        return None
+
+    return (current_price / min_price - 1) * 100  # 涨幅百分比
+
+
+def get_buy_sell_count(trade_data: List[Dict], current_index: int, lookback_count: int) -> Tuple[int, int]:
+    """
+    获取近N个交易单里的买单和卖单数量
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        lookback_count: 向前查看的交易数量
+
+    Returns:
+        (买单数量, 卖单数量) 元组
+    """
+    buy_count = 0
+    sell_count = 0
+    count = 0
+
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        if count >= lookback_count:
+            break
+        try:
+            tradeamount = float(trade_data[i].get('tradeamount', 0))
+            if tradeamount > 0:
+                buy_count += 1
+            elif tradeamount < 0:
+                sell_count += 1
+            count += 1
+        except (TypeError, ValueError):
+            continue
+
+    return buy_count, sell_count
+
+
+def get_large_small_trade_ratio(trade_data: List[Dict], current_index: int, lookback_count: int, large_threshold: float, small_threshold: float) -> Tuple[float, float]:
+    """
+    获取近N个交易单里大单和小单的占比
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        lookback_count: 向前查看的交易数量
+        large_threshold: 大单阈值(SOL)，交易金额绝对值 >= 此值视为大单
+        small_threshold: 小单阈值(SOL)，交易金额绝对值 < 此值视为小单
+
+    Returns:
+        (大单占比, 小单占比) 元组
+    """
+    large_count = 0
+    small_count = 0
+    total_count = 0
+
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        if total_count >= lookback_count:
+            break
+        try:
+            abs_amount = abs(float(trade_data[i].get('tradeamount', 0)))
+            if abs_amount >= large_threshold:
+                large_count += 1
+            if abs_amount < small_threshold:
+                small_count += 1
+            total_count += 1
+        except (TypeError, ValueError):
+            continue
+
+    if total_count == 0:
+        return 0.0, 0.0
+
+    return large_count / total_count, small_count / total_count
+
+
+def get_consecutive_buy_sell_count(trade_data: List[Dict], current_index: int, buy_threshold: float, sell_threshold: float) -> Tuple[int, int]:
+    """
+    获取从当前位置向前连续大额买单和卖单的数量
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        buy_threshold: 大额买单阈值(SOL)，交易金额绝对值 >= 此值
+        sell_threshold: 大额卖单阈值(SOL)，交易金额绝对值 >= 此值
+
+    Returns:
+        (连续买单数量, 连续卖单数量) 元组
+    """
+    consecutive_buy = 0
+    consecutive_sell = 0
+
+    # 计算连续买单数量
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            tradeamount = float(trade_data[i].get('tradeamount', 0))
+            abs_amount = abs(tradeamount)
+            # 如果是大额买单，继续计数
+            if tradeamount > 0 and abs_amount >= buy_threshold:
+                consecutive_buy += 1
+            else:
+                break  # 遇到非大额买单就停止
+        except (TypeError, ValueError):
+            break
+    else:
+        note_truncated(trade_data)
+
+    # 计算连续卖单数量
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            tradeamount = float(trade_data[i].get('tradeamount', 0))
+            abs_amount = abs(tradeamount)
+            # 如果是大额卖单，继续计数
+            if tradeamount < 0 and abs_amount >= sell_threshold:
+                consecutive_sell += 1
+            else:
+                break  # 遇到非大额卖单就停止
+        except (TypeError, ValueError):
+            break
+    else:
+        note_truncated(trade_data)
+
+    return consecutive_buy, consecutive_sell
+
+
+def get_recent_trade_count(trade_data: List[Dict], current_index: int, window_seconds: int) -> int:
+    """
+    获取近N秒内的交易单数量
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        window_seconds: 时间窗口（秒）
+
+    Returns:
+        时间窗口内的交易单数量
+    """
+    try:
+        current_time = int(trade_data[current_index].get('tradetime', 0))
+    except (TypeError, ValueError):
+        return 0
+
+    window_start = current_time - window_seconds * 1000  # 转换为毫秒
+    count = 0
+
+    for i in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            prev_time = int(trade_data[i].get('tradetime', 0))
+            if prev_time < window_start:
+                break
+            count += 1
+        except (TypeError, ValueError):
+            continue
+
+    return count
+
+
+def get_avg_trade_interval(trade_data: List[Dict], current_index: int, lookback_count: int) -> Optional[float]:
+    """
+    获取近N单的平均交易间隔时间（毫秒）
+
+    Args:
+        trade_data: 交易数据列表
+        current_index: 当前交易索引
+        lookback_count: 向前查看的交易数量
+
+    Returns:
+        平均交易间隔（毫秒），如果交易数量不足则返回None
+    """
+    times = []
+
+    # 收集当前交易和前N笔交易的时间
+    for i in range(current_index, max(current_index - lookback_count - 1, history_start(trade_data) - 1), -1):
+        try:
+            t = int(trade_data[i].get('tradetime', 0))
+            if t > 0:
+                times.append(t)
+        except (TypeError, ValueError):
+            continue
+
+    if len(times) < 2:
+        return None
+
+    # times 是从新到旧排列的，计算相邻时间差
+    intervals = []
+    for i in range(len(times) - 1):
+        intervals.append(times[i] - times[i + 1])
+
+    if not intervals:
+        return None
+
+    return sum(intervals) / len(intervals)
+
+
+def get_window_amount_sum(trade_data: List[Dict], current_index: int, window_ms: int, min_amount: float) -> Optional[float]:
+    """在指定毫秒窗口内，过滤金额绝对值>=阈值的交易，计算金额总和（买为正、卖为负）"""
+    if current_index <= 0 or current_index >= len(trade_data):
+        return None
+    try:
+        current_time = int(trade_data[current_index]['tradetime'])
+    except (TypeError, ValueError, KeyError):
+        return None
+    window_start = current_time - window_ms
+    total_sum = 0.0
+    found_any = False
+    for j in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            t = int(trade_data[j]['tradetime'])
+            if t < window_start:
+                break
+            amt = float(trade_data[j].get('tradeamount', 0))
+            if abs(amt) >= min_amount:
+                total_sum += amt
+                found_any = True
+        except (TypeError, ValueError, KeyError):
+            continue
+    return total_sum if found_any else None
+
+
+def get_window_buy_sell_count(trade_data: List[Dict], current_index: int, window_ms: int, min_amount: float) -> Tuple[Optional[int], Optional[int]]:
+    """在指定毫秒窗口内，过滤金额绝对值>=阈值的交易，分别统计买单和卖单数量"""
+    if current_index <= 0 or current_index >= len(trade_data):
+        return None, None
+    try:
+        current_time = int(trade_data[current_index]['tradetime'])
+    except (TypeError, ValueError, KeyError):
+        return None, None
+    window_start = current_time - window_ms
+    buy_count = 0
+    sell_count = 0
+    found_any = False
+    for j in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            t = int(trade_data[j]['tradetime'])
+            if t < window_start:
+                break
+            amt = float(trade_data[j].get('tradeamount', 0))
+            if abs(amt) >= min_amount:
+                found_any = True
+                if amt > 0:
+                    buy_count += 1
+                else:
+                    sell_count += 1
+        except (TypeError, ValueError, KeyError):
+            continue
+    if not found_any:
+        return None, None
+    return buy_count, sell_count
+
+
+def get_window_price_change_pct(trade_data: List[Dict], current_index: int, window_ms: int) -> Optional[float]:
+    """在指定毫秒窗口内，计算当前价格相对于窗口起始价格的涨跌幅百分比
+
+    返回正数表示涨幅，负数表示跌幅。
+    例如: 5.0 表示涨了5%，-3.0 表示跌了3%
+    """
+    if current_index <= 0 or current_index >= len(trade_data):
+        return None
+    try:
+        current_time = int(trade_data[current_index]['tradetime'])
+        current_price = float(trade_data[current_index].get('price', 0))
+    except (TypeError, ValueError, KeyError):
+        return None
+    if current_price <= 0:
+        return None
+
+    window_start = current_time - window_ms
+    ref_price = None
+
+    # 向前遍历，找到第一笔时间 <= window_start 的交易作为参考价格
+    for j in range(current_index - 1, history_start(trade_data) - 1, -1):
+        try:
+            t = int(trade_data[j]['tradetime'])
+            if t <= window_start:
+                ref_price = float(trade_data[j].get('price', 0))
+                break
+        except (TypeError, ValueError, KeyError):
+            continue
+
+    if ref_price is None or ref_price <= 0:
+        return None
+
+    return (current_price - ref_price) / ref_price * 100.0
+
+
+def get_min_price_before_buy(trade_data: List[Dict], buy_index: int, lookback_count: int) -> Optional[float]:
+    """
+    获取买入点之前N笔交易的最小价格
+
+    Args:
+        trade_data: 交易数据列表
+        buy_index: 买入点索引
+        lookback_count: 向前查看的交易数量
+
+    Returns:
+        最小价格，如果交易数量不足则返回None
+    """
+    prices = []
+    start_index = max(history_start(trade_data), buy_index - lookback_count)
+
+    for i in range(start_index, buy_index):
+        try:
+            price = float(trade_data[i].get('price', 0))
+            if price > 0:
+                prices.append(price)
+        except (TypeError, ValueError):
+            continue
+
+    if not prices:
+        return None
+
+    return min(prices)